@@ -8,6 +8,7 @@ import json
 import os
 import logging
 from datetime import datetime
+from filelock import FileLock
 
 from recursos.constants import ESCOLAS
 
@@ -65,8 +66,12 @@ class AuthManager:
     def save_users(self, users):
         """Salva usuários no arquivo"""
         try:
-            with open(self.users_file, 'w', encoding='utf-8') as f:
-                json.dump(users, f, indent=2, ensure_ascii=False)
+            # Escrita atômica sob lock (consistente com DataManager)
+            with FileLock(self.users_file + ".lock", timeout=10):
+                temp_file = self.users_file + ".tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(users, f, indent=2, ensure_ascii=False)
+                os.replace(temp_file, self.users_file)
         except Exception as e:
             logging.error(f"Erro ao salvar usuários: {e}")
             raise
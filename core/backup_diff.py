@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Comparação de Backups - Sistema DIRENS
+"""
+
+import io
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Any, Optional, Tuple, Iterator
+
+from core.backup_store import BackupReader
+from core.jobs import ProgressTracker
+from core.teacher_manager import MONITORED_FIELDS
+
+# Nome usado para comparar com os dados atuais em vez de um backup
+LIVE_SOURCE = "atual"
+
+# Tamanho dos blocos lidos por JSONStream
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class JSONStream:
+    """Leitura incremental de um JSON: percorre objetos membro a membro
+    
+    Os valores são decodificados um a um (json.JSONDecoder.raw_decode) a
+    partir de um buffer de blocos, sem carregar o arquivo inteiro.
+    """
+    
+    def __init__(self, fileobj, chunk_size: int = STREAM_CHUNK_SIZE):
+        """Inicializa a leitura a partir de um arquivo de texto"""
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+    
+    def fill(self) -> bool:
+        """Acrescenta um bloco ao buffer (False no fim do arquivo)"""
+        chunk = self.fileobj.read(self.chunk_size)
+        if not chunk:
+            return False
+        
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Próximo caractere relevante, ignorando espaços ('' no fim)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+    
+    def expect(self, char: str) -> None:
+        """Consome o caractere esperado"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: esperado '{char}', encontrado '{found}'")
+        self.pos += 1
+    
+    def value(self) -> Any:
+        """Decodifica o próximo valor completo"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Valor incompleto no buffer: lê mais um bloco
+                if not self.fill():
+                    raise
+                continue
+            
+            # Um número pode continuar no próximo bloco
+            if end == len(self.buffer) and isinstance(value, (int, float)) and self.fill():
+                continue
+            
+            self.pos = end
+            return value
+    
+    def members(self) -> Iterator[str]:
+        """Chaves de um objeto; o chamador lê cada valor antes de avançar"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return
+
+
+def iter_teachers_json(fileobj) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """Percorre teachers.json um professor por vez: (escola, siape, registro)"""
+    stream = JSONStream(fileobj)
+    
+    for key in stream.members():
+        if key != "teachers":
+            stream.value()
+            continue
+        
+        for school in stream.members():
+            for siape in stream.members():
+                yield school, siape, stream.value()
+
+
+def field_digests(teacher: Dict[str, Any]) -> Dict[str, bytes]:
+    """Resumo de cada campo monitorado do registro
+    
+    Os valores são normalizados como em TeacherManager.identify_changes
+    (str(), None vira ''), de modo que a comparação aponta as mesmas
+    alterações que a restauração seletiva registraria.
+    """
+    digests = {}
+    for field in MONITORED_FIELDS:
+        value = teacher.get(field)
+        text = str(value) if value is not None else ''
+        digests[field] = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    return digests
+
+
+class BackupDiff:
+    """Compara dois backups, ou um backup com os dados atuais
+    
+    teachers.json é lido em fluxo (iter_teachers_json) e cada professor é
+    reduzido ao nome e a um hash de cada campo monitorado, de modo que
+    nunca há dois teachers.json completos em memória.
+    Os históricos são comparados apenas pelos checksums do catálogo, sem
+    serem lidos.
+    """
+    
+    def __init__(self, backup_manager):
+        """Inicializa o comparador"""
+        self.backup_manager = backup_manager
+        self.teachers_arcname = os.path.join(backup_manager.data_dir, "teachers.json")
+    
+    def compact_teachers(self, fileobj, school: Optional[str] = None) -> Dict[str, Dict[str, tuple]]:
+        """Reduz teachers.json (binário) a {escola: {siape: (nome, hashes dos campos)}}"""
+        compact = {}
+        
+        with io.TextIOWrapper(fileobj, encoding='utf-8') as text:
+            for teacher_school, siape, teacher in iter_teachers_json(text):
+                if school and teacher_school != school:
+                    continue
+                
+                compact.setdefault(teacher_school, {})[siape] = (teacher.get('nome'), field_digests(teacher))
+        
+        return compact
+    
+    def load_side(self, source: str, school: Optional[str] = None) -> Tuple[Dict[str, Dict[str, tuple]], Dict[str, str]]:
+        """Carrega um lado da comparação: (professores reduzidos, checksums de data/)"""
+        data_prefix = self.backup_manager.data_dir + os.sep
+        
+        if source == LIVE_SOURCE:
+            teachers = {}
+            if os.path.exists(self.teachers_arcname):
+                teachers = self.compact_teachers(open(self.teachers_arcname, 'rb'), school)
+            
+            # Hashes dos arquivos atuais, reaproveitando o cache dos backups
+            store = self.backup_manager.store
+            hash_cache = store.load_hash_cache()
+            checksums = {
+                arcname: store.hash_cached(file_path, hash_cache, cache_key=arcname)[0]
+                for file_path, arcname in self.backup_manager.collect_backup_files(include_history=False)
+            }
+            return teachers, checksums
+        
+        backup_info = self.backup_manager.get_backup_info(source)
+        if not backup_info:
+            raise ValueError(f"Backup não encontrado: {source}")
+        
+        with BackupReader(self.backup_manager.store, backup_info) as reader:
+            teachers = {}
+            if self.teachers_arcname in reader.members():
+                teachers = self.compact_teachers(reader.open(self.teachers_arcname), school)
+            
+            checksums = backup_info.get('checksums')
+            if not checksums and reader.manifest is not None:
+                checksums = {arcname: info['sha256'] for arcname, info in reader.manifest['files'].items()}
+        
+        checksums = {
+            arcname: sha256 for arcname, sha256 in (checksums or {}).items()
+            if arcname.startswith(data_prefix)
+        }
+        return teachers, checksums
+    
+    def diff(self, source_a: str, source_b: str, school: Optional[str] = None,
+             progress_callback=None, cancel_event=None) -> Dict[str, Any]:
+        """Diferenças ao passar de source_a para source_b
+        
+        Qualquer lado pode ser LIVE_SOURCE. Para a prévia de uma
+        restauração use diff(LIVE_SOURCE, nome_do_backup). Os alterados
+        trazem a lista dos campos que mudaram.
+        """
+        progress = ProgressTracker(3, 0, progress_callback, cancel_event)
+        
+        teachers_a, checksums_a = self.load_side(source_a, school)
+        progress.advance()
+        teachers_b, checksums_b = self.load_side(source_b, school)
+        progress.advance()
+        
+        result = {
+            'from': source_a,
+            'to': source_b,
+            'schools': {},
+            'totals': {'added': 0, 'removed': 0, 'modified': 0},
+            'files': {'added': [], 'removed': [], 'changed': []}
+        }
+        
+        # Diferenças de arquivos (apenas checksums, sem leitura)
+        if checksums_a and checksums_b:
+            files = result['files']
+            files['added'] = sorted(set(checksums_b) - set(checksums_a))
+            files['removed'] = sorted(set(checksums_a) - set(checksums_b))
+            files['changed'] = sorted(
+                arcname for arcname in set(checksums_a) & set(checksums_b)
+                if checksums_a[arcname] != checksums_b[arcname]
+            )
+            
+            # teachers.json idêntico: nenhum professor mudou
+            if (checksums_a.get(self.teachers_arcname) and
+                    checksums_a.get(self.teachers_arcname) == checksums_b.get(self.teachers_arcname)):
+                progress.advance()
+                return result
+        
+        for teacher_school in sorted(set(teachers_a) | set(teachers_b)):
+            school_a = teachers_a.pop(teacher_school, {})
+            school_b = teachers_b.pop(teacher_school, {})
+            
+            added = {siape: name for siape, (name, digests) in school_b.items() if siape not in school_a}
+            removed = {siape: name for siape, (name, digests) in school_a.items() if siape not in school_b}
+            modified = {}
+            
+            for siape in set(school_a) & set(school_b):
+                digests_a = school_a[siape][1]
+                digests_b = school_b[siape][1]
+                
+                changes = [field for field in MONITORED_FIELDS if digests_a[field] != digests_b[field]]
+                if changes:
+                    modified[siape] = changes
+            
+            if added or removed or modified:
+                result['schools'][teacher_school] = {
+                    'added': added,
+                    'removed': removed,
+                    'modified': modified
+                }
+                result['totals']['added'] += len(added)
+                result['totals']['removed'] += len(removed)
+                result['totals']['modified'] += len(modified)
+        
+        progress.advance()
+        logging.info(
+            f"Comparação {source_a} -> {source_b}: {result['totals']['added']} incluídos, "
+            f"{result['totals']['removed']} removidos, {result['totals']['modified']} alterados"
+        )
+        return result
+
+
+def format_diff_summary(result: Dict[str, Any], max_lines: int = 15) -> str:
+    """Resumo legível de uma comparação"""
+    totals = result['totals']
+    lines = [
+        f"Professores incluídos: {totals['added']}",
+        f"Professores removidos: {totals['removed']}",
+        f"Professores alterados: {totals['modified']}",
+        f"Arquivos alterados: {len(result['files']['changed'])} "
+        f"(+{len(result['files']['added'])}/-{len(result['files']['removed'])})"
+    ]
+    
+    details = []
+    for school, changes in result['schools'].items():
+        for siape, name in changes['added'].items():
+            details.append(f"  + {school} {siape} {name}")
+        for siape, name in changes['removed'].items():
+            details.append(f"  - {school} {siape} {name}")
+        for siape, fields in changes['modified'].items():
+            details.append(f"  ~ {school} {siape}: {', '.join(fields)}")
+    
+    if details:
+        lines.append("")
+        lines.extend(details[:max_lines])
+        if len(details) > max_lines:
+            lines.append(f"  ... e mais {len(details) - max_lines}")
+    
+    return "\n".join(lines)
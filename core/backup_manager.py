@@ -4,13 +4,103 @@ Gerenciador de Backups - Sistema DIRENS
 """
 
 import os
+import copy
 import json
+import time
+import zlib
 import shutil
+import hashlib
 import zipfile
 import logging
+from filelock import FileLock, Timeout
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import tempfile
 
+from core.backup_store import BackupStore, BackupReader, CHUNK_SIZE, hash_file
+from core.jobs import JobCancelled, ProgressTracker, check_cancelled
+
+# Codecs de compressão suportados nos backups ZIP
+BACKUP_CODECS = {
+    'deflate': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA
+}
+
+# Versão do formato das entradas do catálogo (backup_index.json)
+CATALOG_VERSION = 2
+
+# Faixas de retenção avô-pai-filho: chave do período de cada backup
+RETENTION_TIERS = {
+    'hourly': lambda timestamp: timestamp.strftime("%Y%m%d%H"),
+    'daily': lambda timestamp: timestamp.strftime("%Y%m%d"),
+    'weekly': lambda timestamp: "%d-%02d" % timestamp.isocalendar()[:2],
+    'monthly': lambda timestamp: timestamp.strftime("%Y%m")
+}
+
+DEFAULT_RETENTION = {
+    'hourly': 6,
+    'daily': 7,
+    'weekly': 4,
+    'monthly': 12,
+    # Mínimo por tipo: os N mais recentes ficam, além dos escolhidos pelas faixas
+    'type_quotas': {
+        'pre_restore': 5,
+        'manual': 10
+    }
+}
+
+def compress_member(file_path, compress_type, compress_level=None):
+    """Lê e compacta um arquivo (executado nos workers)
+    
+    Retorna (dados compactados, CRC32, tamanho original, SHA-256). O
+    nível é ignorado pelo codec lzma do formato ZIP.
+    """
+    with open(file_path, 'rb') as f:
+        raw_data = f.read()
+    
+    compressor = zipfile._get_compressor(compress_type, compress_level)
+    data = compressor.compress(raw_data) + compressor.flush()
+    
+    return data, zlib.crc32(raw_data), len(raw_data), hashlib.sha256(raw_data).hexdigest()
+
+def parallel_zip_supported(zipf):
+    """Verifica se os internos do zipfile usados por write_compressed_member existem
+    
+    Esses atributos são privados (presentes do CPython 3.8 ao 3.13); sem
+    eles o ZIP é gravado em série pela API pública (ZipFile.write).
+    """
+    return (
+        callable(getattr(zipfile, '_get_compressor', None))
+        and callable(getattr(zipf, '_writecheck', None))
+        and all(hasattr(zipf, name) for name in ('fp', 'start_dir', 'filelist', 'NameToInfo', '_didModify'))
+    )
+
+def write_compressed_member(zipf, zinfo, data, crc, file_size):
+    """Grava no ZIP um membro já compactado (mesmo formato de ZipFile.write)"""
+    zinfo.file_size = file_size
+    zinfo.compress_size = len(data)
+    zinfo.CRC = crc
+    zinfo.flag_bits = 0
+    if zinfo.compress_type == zipfile.ZIP_LZMA:
+        # Dados LZMA incluem marcador de fim de fluxo
+        zinfo.flag_bits |= 0x02
+    
+    zip64 = file_size > zipfile.ZIP64_LIMIT or len(data) > zipfile.ZIP64_LIMIT
+    
+    zipf.fp.seek(zipf.start_dir)
+    zinfo.header_offset = zipf.fp.tell()
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    zipf.fp.write(data)
+    zipf.start_dir = zipf.fp.tell()
+    
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+
 class BackupManager:
     """Gerenciador de backups do sistema"""
     
@@ -21,6 +111,7 @@ class BackupManager:
         self.config_file = os.path.join(self.backup_dir, "backup_config.json")
         self.ensure_backup_directory()
         self.load_config()
+        self.store = BackupStore(self.backup_dir)
     
     def ensure_backup_directory(self):
         """Garante que o diretório de backups existe"""
@@ -32,14 +123,31 @@ class BackupManager:
         default_config = {
             'auto_backup_enabled': True,
             'auto_backup_interval_hours': 24,
-            'max_backups': 30,
-            'last_backup': None
+            'backup_mode': 'incremental',
+            'compression_codec': 'deflate',
+            'compression_level': 6,
+            'compression_workers': None,
+            'verify_interval_hours': 168,
+            'retention': copy.deepcopy(DEFAULT_RETENTION),
+            'last_backup': None,
+            'last_backup_fingerprint': None
         }
         
         try:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     self.config = json.load(f)
+                
+                if 'max_backups' in self.config:
+                    self.migrate_max_backups()
+                
+                # Configurações anteriores ao modo incremental mantêm o ZIP completo;
+                # só instalações novas usam 'incremental'
+                self.config.setdefault('backup_mode', 'full')
+                
+                # Completa configurações adicionadas em versões posteriores
+                for key, value in default_config.items():
+                    self.config.setdefault(key, value)
             else:
                 self.config = default_config
                 self.save_config()
@@ -47,6 +155,23 @@ class BackupManager:
             logging.error(f"Erro ao carregar config de backup: {e}")
             self.config = default_config
     
+    def migrate_max_backups(self):
+        """Converte o antigo limite max_backups na política de retenção
+        
+        max_backups mantinha os N backups mais recentes; com o backup
+        automático diário, o equivalente é manter N backups diários. Só a
+        configuração em memória muda; a próxima gravação a persiste.
+        """
+        max_backups = self.config.pop('max_backups')
+        
+        if 'retention' not in self.config and isinstance(max_backups, int) and max_backups > 0:
+            retention = copy.deepcopy(DEFAULT_RETENTION)
+            retention['daily'] = max_backups
+            self.config['retention'] = retention
+            logging.info(f"max_backups={max_backups} migrado para a retenção: {max_backups} backups diários")
+        else:
+            logging.info(f"max_backups={max_backups} removido: substituído pela política de retenção")
+    
     def save_config(self):
         """Salva configurações de backup"""
         try:
@@ -55,65 +180,336 @@ class BackupManager:
         except Exception as e:
             logging.error(f"Erro ao salvar config de backup: {e}")
     
-    def create_backup(self, description="", backup_type="manual", include_history=True):
-        """Cria um novo backup"""
+    def collect_backup_files(self, include_history=True):
+        """Lista os arquivos incluídos no backup (caminho, nome no backup)"""
+        files = []
+        
+        # Adiciona todos os arquivos de dados
+        if os.path.exists(self.data_dir):
+            for root, dirs, filenames in os.walk(self.data_dir):
+                for file in filenames:
+                    # Locks e temporários de escrita atômica não fazem parte dos dados
+                    if file.endswith(('.lock', '.tmp')):
+                        continue
+                    
+                    file_path = os.path.join(root, file)
+                    # Calcula path relativo
+                    arcname = os.path.relpath(file_path, '.')
+                    files.append((file_path, arcname))
+        
+        # Adiciona logs se solicitado
+        if include_history and os.path.exists("logs"):
+            for root, dirs, filenames in os.walk("logs"):
+                for file in filenames:
+                    if file.endswith('.log'):
+                        file_path = os.path.join(root, file)
+                        arcname = os.path.relpath(file_path, '.')
+                        files.append((file_path, arcname))
+        
+        return files
+    
+    def get_data_fingerprint(self):
+        """Impressão digital barata dos dados (caminho, tamanho e mtime de data/)
+        
+        Logs não entram: mudam a cada execução sem alterar os dados.
+        """
+        digest = hashlib.sha256()
+        
+        for file_path, arcname in sorted(self.collect_backup_files(include_history=False), key=lambda x: x[1]):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            digest.update(f"{arcname}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+        
+        return digest.hexdigest()
+    
+    def get_writer_locks(self):
+        """Arquivos de lock usados pelos gravadores de data/ (em ordem fixa)"""
+        lock_paths = {os.path.join(self.data_dir, "history", "history.lock")}
+        
+        # DataManager e AuthManager usam um lock por arquivo JSON
+        if os.path.exists(self.data_dir):
+            for filename in os.listdir(self.data_dir):
+                if filename.endswith('.json'):
+                    lock_paths.add(os.path.join(self.data_dir, filename) + ".lock")
+        
+        return sorted(lock_paths)
+    
+    def snapshot_files(self, files, staging_dir):
+        """Congela os arquivos do backup em staging_dir
+        
+        Com os locks dos gravadores adquiridos (sempre na mesma ordem),
+        cria hard links dos arquivos na área de preparação e libera os
+        locks em seguida. Como os gravadores substituem os arquivos de
+        forma atômica, os links preservam o conteúdo deste instante. Logs
+        e diários (gravados por acréscimo) e sistemas de arquivos sem
+        suporte a hard link recebem uma cópia.
+        """
+        locks = [FileLock(lock_path, timeout=30) for lock_path in self.get_writer_locks()]
+        staged_files = []
+        acquired = []
+        
         try:
-            timestamp = datetime.now()
-            timestamp_str = timestamp.strftime("%Y%m%d_%H%M%S")
+            for lock in locks:
+                lock.acquire()
+                acquired.append(lock)
             
-            backup_name = f"backup_{timestamp_str}"
-            backup_filename = f"{backup_name}.zip"
-            backup_path = os.path.join(self.backup_dir, backup_filename)
+            start_time = time.perf_counter()
             
-            # Cria arquivo ZIP
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Adiciona todos os arquivos de dados
-                if os.path.exists(self.data_dir):
-                    for root, dirs, files in os.walk(self.data_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            # Calcula path relativo
-                            arcname = os.path.relpath(file_path, '.')
-                            zipf.write(file_path, arcname)
+            for file_path, arcname in files:
+                if not os.path.exists(file_path):
+                    continue
                 
-                # Adiciona logs se solicitado
-                if include_history and os.path.exists("logs"):
-                    for root, dirs, files in os.walk("logs"):
-                        for file in files:
-                            if file.endswith('.log'):
-                                file_path = os.path.join(root, file)
-                                arcname = os.path.relpath(file_path, '.')
-                                zipf.write(file_path, arcname)
-            
-            # Salva metadados do backup
-            backup_info = {
-                'name': backup_name,
-                'filename': backup_filename,
-                'filepath': backup_path,
-                'timestamp': timestamp.isoformat(),
-                'type': backup_type,
-                'description': description or f"Backup {backup_type} - {timestamp.strftime('%d/%m/%Y %H:%M')}",
-                'size': os.path.getsize(backup_path),
-                'status': 'OK',
-                'include_history': include_history
-            }
+                staged_path = os.path.join(staging_dir, arcname)
+                os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+                
+                if file_path.endswith(('.log', '.jsonl')):
+                    shutil.copy2(file_path, staged_path)
+                else:
+                    try:
+                        os.link(file_path, staged_path)
+                    except OSError:
+                        shutil.copy2(file_path, staged_path)
+                
+                staged_files.append((staged_path, arcname))
             
-            # Salva registro do backup
-            self.save_backup_info(backup_info)
+            logging.info(
+                f"Snapshot de {len(staged_files)} arquivos: gravadores bloqueados por "
+                f"{(time.perf_counter() - start_time) * 1000:.1f} ms"
+            )
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+        
+        return staged_files
+    
+    def create_backup(self, description="", backup_type="manual", include_history=True, mode=None,
+                      progress_callback=None, cancel_event=None):
+        """Cria um novo backup
+        
+        mode 'full' gera um ZIP completo; 'incremental' grava apenas os
+        arquivos alterados no repositório de blobs e um manifesto. Se
+        cancelado, nenhum arquivo parcial é mantido. Os arquivos são
+        compactados a partir de um snapshot consistente (snapshot_files).
+        Todo o processo roda com o lock do repositório (BackupStore.locked).
+        """
+        staging_dir = None
+        
+        try:
+            # Serializa com outras criações/exclusões e com a coleta de blobs
+            with self.store.locked(cancel_event):
+                timestamp = datetime.now()
+                timestamp_str = timestamp.strftime("%Y%m%d_%H%M%S")
+                mode = mode or self.config.get('backup_mode', 'full')
+            
+                backup_name = f"backup_{timestamp_str}"
             
-            # Atualiza config
-            self.config['last_backup'] = timestamp.isoformat()
-            self.save_config()
+                # Evita sobrescrever um backup criado no mesmo segundo
+                suffix = 1
+                while (os.path.exists(os.path.join(self.backup_dir, f"{backup_name}.zip")) or
+                       os.path.exists(self.store.get_manifest_path(backup_name))):
+                    backup_name = f"backup_{timestamp_str}_{suffix}"
+                    suffix += 1
+            
+                # Calculada antes do snapshot: uma gravação no meio só causa um
+                # backup a mais, nunca um a menos
+                fingerprint = self.get_data_fingerprint()
+            
+                staging_dir = tempfile.mkdtemp(prefix="snapshot_", dir=self.backup_dir)
+                files = self.snapshot_files(self.collect_backup_files(include_history), staging_dir)
+                progress = ProgressTracker(
+                    len(files), sum(os.path.getsize(file_path) for file_path, arcname in files),
+                    progress_callback, cancel_event
+                )
+            
+                if mode == 'incremental':
+                    manifest = self.store.create_snapshot(backup_name, files, {
+                        'type': backup_type,
+                        'include_history': include_history
+                    }, workers=self.get_compression_settings()[2], progress=progress)
+                    backup_path = self.store.get_manifest_path(backup_name)
+                    backup_filename = os.path.relpath(backup_path, self.backup_dir)
+                    backup_size = manifest['new_bytes']
+                    total_size = manifest['total_size']
+                    checksums = {arcname: info['sha256'] for arcname, info in manifest['files'].items()}
+                else:
+                    mode = 'full'
+                    backup_filename = f"{backup_name}.zip"
+                    backup_path = os.path.join(self.backup_dir, backup_filename)
+                    
+                    # Cria arquivo ZIP
+                    checksums = self.write_backup_zip(backup_path, files, progress=progress)
+                    
+                    backup_size = os.path.getsize(backup_path)
+                    total_size = backup_size
+                
+                record_counts, schema_version = self.get_catalog_data(files)
+                
+                # Salva metadados do backup
+                backup_info = {
+                    'name': backup_name,
+                    'filename': backup_filename,
+                    'filepath': backup_path,
+                    'timestamp': timestamp.isoformat(),
+                    'type': backup_type,
+                    'mode': mode,
+                    'description': description or f"Backup {backup_type} - {timestamp.strftime('%d/%m/%Y %H:%M')}",
+                    'size': backup_size,
+                    'total_size': total_size,
+                    'status': 'OK',
+                    'include_history': include_history,
+                    'catalog_version': CATALOG_VERSION,
+                    'schema_version': schema_version,
+                    'record_counts': record_counts,
+                    'file_count': len(checksums),
+                    'checksums': checksums,
+                    'data_fingerprint': fingerprint,
+                    'verified_at': None
+                }
+                
+                # Salva registro do backup
+                self.save_backup_info(backup_info)
+                
+                # Atualiza config
+                self.config['last_backup'] = timestamp.isoformat()
+                self.config['last_backup_fingerprint'] = fingerprint
+                self.save_config()
             
-            # Limpa backups antigos
-            self.cleanup_old_backups()
+                # Limpa backups antigos
+                self.cleanup_old_backups()
             
-            logging.info(f"Backup criado: {backup_filename}")
-            return backup_info
+                logging.info(f"Backup criado: {backup_filename}")
+                return backup_info
             
+        except JobCancelled:
+            # Blobs gravados antes do cancelamento ficam sem manifesto
+            self.store.collect_garbage()
+            logging.info("Criação de backup cancelada")
+            raise
         except Exception as e:
             logging.error(f"Erro ao criar backup: {e}")
             return None
+        finally:
+            if staging_dir:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+    
+    def get_catalog_data(self, files):
+        """Contagem de professores por escola e versão dos dados do snapshot"""
+        teachers_arcname = os.path.join(self.data_dir, "teachers.json")
+        
+        for file_path, arcname in files:
+            if arcname == teachers_arcname:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    teachers_data = json.load(f)
+                
+                record_counts = {
+                    school: len(teachers)
+                    for school, teachers in teachers_data.get("teachers", {}).items()
+                }
+                return record_counts, teachers_data.get("metadata", {}).get("version")
+        
+        return {}, None
+    
+    def get_compression_settings(self):
+        """Retorna (tipo de compressão ZIP, nível, workers) da configuração"""
+        codec = self.config.get('compression_codec', 'deflate')
+        if codec not in BACKUP_CODECS:
+            logging.warning(f"Codec de backup desconhecido: {codec}, usando deflate")
+            codec = 'deflate'
+        
+        workers = self.config.get('compression_workers') or min(8, os.cpu_count() or 1)
+        return BACKUP_CODECS[codec], self.config.get('compression_level'), workers
+    
+    def write_backup_zip(self, backup_path, files, compress_type=None, compress_level=None, workers=None,
+                         progress=None):
+        """Gera o ZIP do backup compactando os arquivos em paralelo
+        
+        Os workers leem e compactam os arquivos; a thread atual grava os
+        membros no ZIP na ordem original. No máximo 2 arquivos por worker
+        ficam em memória ao mesmo tempo. Se o zipfile não tiver os internos
+        necessários (parallel_zip_supported), grava em série com
+        ZipFile.write. Retorna o SHA-256 de cada membro.
+        """
+        default_type, default_level, default_workers = self.get_compression_settings()
+        compress_type = default_type if compress_type is None else compress_type
+        compress_level = default_level if compress_level is None else compress_level
+        workers = workers or default_workers
+        checksums = {}
+        
+        try:
+            with zipfile.ZipFile(backup_path, 'w', compress_type, compresslevel=compress_level) as zipf:
+                if not parallel_zip_supported(zipf):
+                    logging.warning("zipfile sem suporte à gravação paralela, compactando em série")
+                    for file_path, arcname in files:
+                        zipf.write(file_path, arcname)
+                        checksums[arcname] = hash_file(file_path)
+                        if progress:
+                            progress.advance(1, zipf.getinfo(arcname).file_size)
+                    return checksums
+                
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    pending = deque()
+                    
+                    def write_next():
+                        zinfo, future = pending.popleft()
+                        data, crc, file_size, sha256 = future.result()
+                        write_compressed_member(zipf, zinfo, data, crc, file_size)
+                        checksums[zinfo.filename] = sha256
+                        if progress:
+                            progress.advance(1, zinfo.file_size)
+                    
+                    for file_path, arcname in files:
+                        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                        zinfo.compress_type = compress_type
+                        pending.append((zinfo, executor.submit(compress_member, file_path, compress_type, compress_level)))
+                        
+                        if len(pending) >= workers * 2:
+                            write_next()
+                    
+                    while pending:
+                        write_next()
+        except Exception:
+            # Não deixa ZIP parcial para trás (erro ou cancelamento)
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+            raise
+        
+        return checksums
+    
+    def benchmark_codecs(self, codecs=None, levels=None):
+        """Mede velocidade e taxa de compressão de cada codec nos dados atuais"""
+        files = self.collect_backup_files(include_history=False)
+        results = []
+        
+        for codec in codecs or BACKUP_CODECS:
+            compress_type = BACKUP_CODECS[codec]
+            codec_levels = [None] if codec == 'lzma' else (levels or [1, 6, 9])
+            
+            for level in codec_levels:
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    zip_path = os.path.join(temp_dir, "benchmark.zip")
+                    
+                    start_time = time.perf_counter()
+                    self.write_backup_zip(zip_path, files, compress_type, level)
+                    elapsed = time.perf_counter() - start_time
+                    
+                    with zipfile.ZipFile(zip_path, 'r') as zipf:
+                        original_size = sum(info.file_size for info in zipf.infolist())
+                        compressed_size = sum(info.compress_size for info in zipf.infolist())
+                
+                results.append({
+                    'codec': codec,
+                    'level': level,
+                    'files': len(files),
+                    'original_size': original_size,
+                    'compressed_size': compressed_size,
+                    'ratio': compressed_size / original_size if original_size else 0,
+                    'seconds': elapsed,
+                    'throughput_mb_s': original_size / elapsed / (1024 * 1024) if elapsed else 0
+                })
+        
+        return results
     
     def list_backups(self):
         """Lista todos os backups disponíveis"""
@@ -126,13 +522,16 @@ class BackupManager:
                     backup_index = json.load(f)
                     backups = backup_index.get('backups', [])
             
-            # Verifica se os arquivos ainda existem
+            # Verifica se os arquivos ainda existem (uma leitura por diretório;
+            # o tamanho vem do catálogo)
+            existing_files = set()
+            for directory in (self.backup_dir, self.store.manifests_dir):
+                existing_files.update(entry.path for entry in os.scandir(directory) if entry.is_file())
+            
             valid_backups = []
             for backup in backups:
                 filepath = backup.get('filepath', '')
-                if os.path.exists(filepath):
-                    # Atualiza tamanho se necessário
-                    backup['size'] = os.path.getsize(filepath)
+                if filepath in existing_files:
                     valid_backups.append(backup)
                 else:
                     logging.warning(f"Arquivo de backup não encontrado: {filepath}")
@@ -143,30 +542,183 @@ class BackupManager:
             logging.error(f"Erro ao listar backups: {e}")
             return []
     
-    def save_backup_info(self, backup_info):
-        """Salva informações de um backup no índice"""
-        try:
-            backup_index_file = os.path.join(self.backup_dir, "backup_index.json")
+    def modify_backup_index(self, modify):
+        """Altera o catálogo (backup_index.json) de forma segura
             
-            # Carrega índice atual
+        modify recebe o índice carregado e o altera no lugar. Leitura,
+        alteração e gravação (arquivo temporário + os.replace) ocorrem com
+        o lock do catálogo, compartilhado entre instâncias e processos.
+        """
+        backup_index_file = os.path.join(self.backup_dir, "backup_index.json")
+        
+        with FileLock(backup_index_file + ".lock", timeout=30):
             if os.path.exists(backup_index_file):
                 with open(backup_index_file, 'r', encoding='utf-8') as f:
                     backup_index = json.load(f)
             else:
                 backup_index = {'backups': []}
             
-            # Adiciona novo backup
-            backup_index['backups'].append(backup_info)
+            modify(backup_index)
             
-            # Salva índice atualizado
-            with open(backup_index_file, 'w', encoding='utf-8') as f:
+            temp_file = backup_index_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
                 json.dump(backup_index, f, indent=2, ensure_ascii=False)
-                
+            os.replace(temp_file, backup_index_file)
+            
+    def save_backup_info(self, backup_info):
+        """Salva informações de um backup no índice"""
+        try:
+            self.modify_backup_index(lambda backup_index: backup_index.setdefault('backups', []).append(backup_info))
         except Exception as e:
             logging.error(f"Erro ao salvar info do backup: {e}")
     
-    def restore_backup(self, backup_name):
-        """Restaura um backup específico"""
+    def update_backup_info(self, backup_name, updates):
+        """Atualiza campos de um backup no índice"""
+        def apply_updates(backup_index):
+            for backup in backup_index.get('backups', []):
+                if backup['name'] == backup_name:
+                    backup.update(updates)
+        
+        try:
+            self.modify_backup_index(apply_updates)
+        except Exception as e:
+            logging.error(f"Erro ao atualizar info do backup: {e}")
+    
+    def verify_backup(self, backup_name, progress_callback=None, cancel_event=None):
+        """Verifica se um backup pode ser restaurado, sem extraí-lo
+        
+        Lê cada arquivo do backup em fluxo e confere o SHA-256 com o
+        catálogo (ou o CRC do ZIP, em backups anteriores ao catálogo),
+        além de conferir as contagens de professores por escola. O
+        resultado é registrado no índice (status e verified_at).
+        """
+        result = {'success': False, 'valid': False, 'checked_files': 0, 'errors': []}
+        
+        try:
+            backup_info = self.get_backup_info(backup_name)
+            if not backup_info:
+                logging.error(f"Backup não encontrado: {backup_name}")
+                return result
+            
+            errors = result['errors']
+            checksums = backup_info.get('checksums', {})
+            
+            with BackupReader(self.store, backup_info) as reader:
+                members = reader.members()
+                
+                # No incremental o manifesto tem o hash esperado de cada blob
+                if reader.manifest is not None and not checksums:
+                    checksums = {arcname: info['sha256'] for arcname, info in reader.manifest['files'].items()}
+                
+                for arcname in sorted(set(checksums) - set(members)):
+                    errors.append(f"Arquivo ausente: {arcname}")
+                
+                progress = ProgressTracker(len(members), sum(members.values()), progress_callback, cancel_event)
+                
+                for arcname, size in members.items():
+                    digest = hashlib.sha256()
+                    read_size = 0
+                    
+                    try:
+                        # O ZIP também confere o CRC ao final da leitura
+                        with reader.open(arcname) as f:
+                            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                                digest.update(chunk)
+                                read_size += len(chunk)
+                    except (OSError, EOFError, zipfile.BadZipFile, zlib.error) as e:
+                        errors.append(f"Arquivo ilegível: {arcname} ({e})")
+                        progress.advance(1, size)
+                        continue
+                    
+                    if read_size != size:
+                        errors.append(f"Tamanho divergente: {arcname}")
+                    elif arcname in checksums and digest.hexdigest() != checksums[arcname]:
+                        errors.append(f"Checksum divergente: {arcname}")
+                    
+                    result['checked_files'] += 1
+                    progress.advance(1, size)
+                
+                # Confere se os dados são legíveis e completos
+                if backup_info.get('record_counts'):
+                    teachers_arcname = os.path.join(self.data_dir, "teachers.json")
+                    try:
+                        teachers_data = reader.load_json(teachers_arcname)
+                        record_counts = {
+                            school: len(teachers)
+                            for school, teachers in teachers_data.get("teachers", {}).items()
+                        }
+                        if record_counts != backup_info['record_counts']:
+                            errors.append("Contagem de professores diferente do catálogo")
+                    except ValueError as e:
+                        errors.append(f"teachers.json inválido ({e})")
+            
+            result['valid'] = not errors
+            result['success'] = True
+            
+            self.update_backup_info(backup_name, {
+                'status': 'OK' if result['valid'] else 'CORROMPIDO',
+                'verified_at': datetime.now().isoformat(),
+                'verification_errors': errors[:20]
+            })
+            
+            if errors:
+                logging.error(f"Backup {backup_name} com problemas: {len(errors)} erros")
+            else:
+                logging.info(f"Backup verificado: {backup_name} ({result['checked_files']} arquivos)")
+            return result
+            
+        except JobCancelled:
+            logging.info(f"Verificação de backup cancelada: {backup_name}")
+            raise
+        except Exception as e:
+            logging.error(f"Erro ao verificar backup: {e}")
+            result['errors'].append(str(e))
+            return result
+    
+    def get_backups_to_verify(self):
+        """Backups nunca verificados ou verificados há mais tempo que o intervalo"""
+        interval = timedelta(hours=self.config.get('verify_interval_hours', 168))
+        now = datetime.now()
+        backups_to_verify = []
+        
+        for backup in self.list_backups():
+            verified_at = backup.get('verified_at')
+            if not verified_at or now - datetime.fromisoformat(verified_at) > interval:
+                backups_to_verify.append(backup)
+        
+        return backups_to_verify
+    
+    def verify_backups(self, progress_callback=None, cancel_event=None):
+        """Verifica os backups pendentes (tarefa periódica em segundo plano)
+        
+        Retorna a lista de nomes dos backups com problemas.
+        """
+        corrupted = []
+        
+        try:
+            backups = self.get_backups_to_verify()
+            progress = ProgressTracker(len(backups), 0, progress_callback, cancel_event)
+            
+            for backup in backups:
+                result = self.verify_backup(backup['name'], cancel_event=cancel_event)
+                if result['success'] and not result['valid']:
+                    corrupted.append(backup['name'])
+                progress.advance()
+            
+        except JobCancelled:
+            logging.info("Verificação periódica de backups cancelada")
+            raise
+        except Exception as e:
+            logging.error(f"Erro na verificação periódica de backups: {e}")
+        
+        return corrupted
+    
+    def restore_backup(self, backup_name, progress_callback=None, cancel_event=None):
+        """Restaura um backup específico
+        
+        O cancelamento é aceito até o fim da extração; a troca dos dados
+        atuais pelos do backup não é interrompida.
+        """
         try:
             # Encontra o backup
             backups = self.list_backups()
@@ -189,14 +741,32 @@ class BackupManager:
             # Cria backup da situação atual antes da restauração
             self.create_backup(
                 description="Backup automático antes da restauração",
-                backup_type="pre_restore"
+                backup_type="pre_restore",
+                cancel_event=cancel_event
             )
+            check_cancelled(cancel_event)
             
             # Cria diretório temporário
             with tempfile.TemporaryDirectory() as temp_dir:
-                # Extrai backup
-                with zipfile.ZipFile(backup_file, 'r') as zipf:
-                    zipf.extractall(temp_dir)
+                # Extrai backup (ou reconstrói a partir do manifesto)
+                if backup_info.get('mode') == 'incremental':
+                    manifest = self.store.load_manifest(backup_name)
+                    progress = ProgressTracker(
+                        len(manifest.get('files', {})),
+                        sum(info['size'] for info in manifest.get('files', {}).values()),
+                        progress_callback, cancel_event
+                    )
+                    self.store.restore_manifest(manifest, temp_dir, progress=progress)
+                else:
+                    with zipfile.ZipFile(backup_file, 'r') as zipf:
+                        members = zipf.infolist()
+                        progress = ProgressTracker(
+                            len(members), sum(info.file_size for info in members),
+                            progress_callback, cancel_event
+                        )
+                        for info in members:
+                            zipf.extract(info, temp_dir)
+                            progress.advance(1, info.file_size)
                 
                 # Remove dados atuais (backup já foi feito)
                 if os.path.exists(self.data_dir):
@@ -221,12 +791,178 @@ class BackupManager:
             logging.info(f"Backup restaurado: {backup_name}")
             return True
             
+        except JobCancelled:
+            logging.info(f"Restauração cancelada: {backup_name}")
+            raise
         except Exception as e:
             logging.error(f"Erro ao restaurar backup: {e}")
             return False
     
-    def delete_backup(self, backup_name):
-        """Exclui um backup específico"""
+    def get_backup_info(self, backup_name):
+        """Retorna as informações de um backup do índice"""
+        for backup in self.list_backups():
+            if backup['name'] == backup_name:
+                return backup
+        return None
+    
+    def restore_selective(self, backup_name, school, siape=None, include_history=True, dry_run=False,
+                          user="sistema", progress_callback=None, cancel_event=None):
+        """Restaura uma escola (ou um professor) a partir de um backup
+        
+        Lê do backup apenas teachers.json e os históricos envolvidos, sem
+        extrair o arquivo, e mescla nos dados atuais pelas APIs normais:
+        professores do backup substituem os atuais, os que não estão no
+        backup são mantidos e entradas de histórico ausentes são
+        acrescentadas. Cada campo restaurado é registrado no histórico
+        (ação RESTORE), por isso não é feito backup pre_restore. Com
+        dry_run=True apenas calcula as diferenças.
+        """
+        from core.teacher_manager import TeacherManager
+        
+        result = {
+            'success': False,
+            'dry_run': dry_run,
+            'school': school,
+            'siape': siape,
+            'added': [],
+            'modified': {},
+            'unchanged': [],
+            'history_entries': 0
+        }
+        
+        try:
+            backup_info = self.get_backup_info(backup_name)
+            if not backup_info:
+                logging.error(f"Backup não encontrado: {backup_name}")
+                return result
+            
+            teacher_manager = TeacherManager()
+            data_manager = teacher_manager.data_manager
+            history_manager = teacher_manager.history_manager
+            
+            current_teachers = data_manager.load_json(data_manager.teachers_file).get("teachers", {}).get(school, {})
+            history_to_merge = []
+            
+            with BackupReader(self.store, backup_info) as reader:
+                members = reader.members()
+                teachers_arcname = os.path.relpath(data_manager.teachers_file, '.')
+                backup_teachers = reader.load_json(teachers_arcname).get("teachers", {}).get(school, {})
+                
+                if siape:
+                    backup_teachers = {siape: backup_teachers[siape]} if siape in backup_teachers else {}
+                
+                history_members = []
+                if include_history:
+                    for teacher_siape in (backup_teachers or ([siape] if siape else [])):
+                        arcname = os.path.relpath(history_manager.get_teacher_history_file(teacher_siape, school), '.')
+                        if arcname in members:
+                            history_members.append((teacher_siape, arcname))
+                
+                progress = ProgressTracker(len(backup_teachers) + len(history_members), 0,
+                                           progress_callback, cancel_event)
+                
+                # Diferenças campo a campo (mesma regra do histórico de alterações)
+                for teacher_siape, backup_teacher in backup_teachers.items():
+                    current_teacher = current_teachers.get(teacher_siape)
+                    
+                    if current_teacher is None:
+                        result['added'].append(teacher_siape)
+                    else:
+                        changes = teacher_manager.identify_changes(current_teacher, backup_teacher)
+                        if changes:
+                            result['modified'][teacher_siape] = changes
+                        else:
+                            result['unchanged'].append(teacher_siape)
+                    progress.advance()
+                
+                for teacher_siape, arcname in history_members:
+                    history_to_merge.append((teacher_siape, reader.load_json(arcname).get("entries", [])))
+                    progress.advance()
+            
+            if dry_run:
+                # Conta as entradas de histórico que seriam acrescentadas
+                from dados.history_search import entry_identity
+                
+                for teacher_siape, entries in history_to_merge:
+                    history_file = history_manager.get_teacher_history_file(teacher_siape, school)
+                    existing = {entry_identity(entry) for entry in history_manager.load_json(history_file).get("entries", [])}
+                    result['history_entries'] += len([entry for entry in entries if entry_identity(entry) not in existing])
+                
+                result['success'] = True
+                return result
+            
+            # A partir daqui a restauração não é mais interrompida
+            check_cancelled(cancel_event)
+            
+            restored_siapes = result['added'] + list(result['modified'])
+            if restored_siapes and not data_manager.save_teachers([backup_teachers[s] for s in restored_siapes]):
+                logging.error(f"Restauração seletiva de {backup_name}: falha ao gravar os professores")
+                return result
+            
+            # O histórico só é mesclado depois que os professores foram gravados
+            for teacher_siape, entries in history_to_merge:
+                result['history_entries'] += history_manager.merge_teacher_history(teacher_siape, school, entries)
+            
+            # Registra a restauração no histórico
+            now = datetime.now().isoformat()
+            for teacher_siape in result['added']:
+                history_manager.add_history_entry({
+                    'siape': teacher_siape,
+                    'escola': school,
+                    'action': 'RESTORE',
+                    'user': user,
+                    'timestamp': now,
+                    'field': 'professor',
+                    'old_value': None,
+                    'new_value': 'Professor restaurado',
+                    'notes': f"Professor restaurado do backup {backup_name}"
+                })
+            
+            for teacher_siape, changes in result['modified'].items():
+                for field, (old_value, new_value) in changes.items():
+                    history_manager.add_history_entry({
+                        'siape': teacher_siape,
+                        'escola': school,
+                        'action': 'RESTORE',
+                        'user': user,
+                        'timestamp': now,
+                        'field': field,
+                        'old_value': str(old_value) if old_value is not None else '',
+                        'new_value': str(new_value) if new_value is not None else '',
+                        'notes': f"Campo {field} restaurado do backup {backup_name}"
+                    })
+            
+            result['success'] = True
+            logging.info(
+                f"Restauração seletiva de {backup_name} ({school} {siape or ''}): "
+                f"{len(result['added'])} incluídos, {len(result['modified'])} alterados, "
+                f"{result['history_entries']} entradas de histórico"
+            )
+            return result
+            
+        except JobCancelled:
+            logging.info(f"Restauração seletiva cancelada: {backup_name}")
+            raise
+        except Exception as e:
+            logging.error(f"Erro na restauração seletiva: {e}")
+            result['error'] = str(e)
+            return result
+    
+    def delete_backup(self, backup_name, collect_garbage=True, lock_timeout=None):
+        """Exclui um backup específico
+        
+        Roda com o lock do repositório; lock_timeout limita a espera por um
+        backup em andamento (usado pela interface).
+        """
+        try:
+            with self.store.locked(timeout=lock_timeout):
+                return self.delete_backup_locked(backup_name, collect_garbage)
+        except Timeout:
+            logging.error(f"Backup {backup_name} não excluído: há um backup em andamento")
+            return False
+    
+    def delete_backup_locked(self, backup_name, collect_garbage=True):
+        """Exclui um backup (o lock do repositório já deve estar adquirido)"""
         try:
             # Encontra o backup
             backups = self.list_backups()
@@ -246,21 +982,18 @@ class BackupManager:
             if os.path.exists(backup_file):
                 os.remove(backup_file)
             
+            # Remove blobs que ficaram sem referência
+            if backup_to_delete.get('mode') == 'incremental' and collect_garbage:
+                self.store.collect_garbage()
+            
             # Remove do índice
-            backup_index_file = os.path.join(self.backup_dir, "backup_index.json")
-            if os.path.exists(backup_index_file):
-                with open(backup_index_file, 'r', encoding='utf-8') as f:
-                    backup_index = json.load(f)
-                
-                # Remove backup do índice
+            def remove_entry(backup_index):
                 backup_index['backups'] = [
-                    b for b in backup_index['backups'] 
+                    b for b in backup_index.get('backups', [])
                     if b['name'] != backup_name
                 ]
                 
-                # Salva índice atualizado
-                with open(backup_index_file, 'w', encoding='utf-8') as f:
-                    json.dump(backup_index, f, indent=2, ensure_ascii=False)
+            self.modify_backup_index(remove_entry)
             
             logging.info(f"Backup excluído: {backup_name}")
             return True
@@ -269,7 +1002,7 @@ class BackupManager:
             logging.error(f"Erro ao excluir backup: {e}")
             return False
     
-    def export_backup(self, backup_name, destination_path):
+    def export_backup(self, backup_name, destination_path, progress_callback=None, cancel_event=None):
         """Exporta backup para local específico"""
         try:
             # Encontra o backup
@@ -290,37 +1023,131 @@ class BackupManager:
                 logging.error(f"Arquivo de backup não existe: {source_file}")
                 return False
             
-            # Copia arquivo
-            shutil.copy2(source_file, destination_path)
+            # Copia arquivo (incrementais são montados em um ZIP completo)
+            try:
+                if backup_info.get('mode') == 'incremental':
+                    manifest = self.store.load_manifest(backup_name)
+                    progress = ProgressTracker(
+                        len(manifest.get('files', {})),
+                        sum(info['size'] for info in manifest.get('files', {}).values()),
+                        progress_callback, cancel_event
+                    )
+                    self.store.export_manifest(manifest, destination_path, progress=progress)
+                else:
+                    progress = ProgressTracker(1, os.path.getsize(source_file), progress_callback, cancel_event)
+                    with open(source_file, 'rb') as src, open(destination_path, 'wb') as dst:
+                        for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                            dst.write(chunk)
+                            progress.advance(0, len(chunk))
+                    shutil.copystat(source_file, destination_path)
+                    progress.advance(1, 0)
+            except BaseException:
+                # Não deixa cópia parcial no destino
+                if os.path.exists(destination_path):
+                    os.remove(destination_path)
+                raise
             
             logging.info(f"Backup exportado: {backup_name} -> {destination_path}")
             return True
             
+        except JobCancelled:
+            logging.info(f"Exportação de backup cancelada: {backup_name}")
+            raise
         except Exception as e:
             logging.error(f"Erro ao exportar backup: {e}")
             return False
     
-    def cleanup_old_backups(self):
-        """Remove backups antigos baseado na configuração"""
-        try:
-            max_backups = self.config.get('max_backups', 30)
-            backups = self.list_backups()
+    def get_retention_policy(self):
+        """Política de retenção da configuração, completada com os padrões"""
+        policy = dict(DEFAULT_RETENTION)
+        policy.update(self.config.get('retention') or {})
+        policy['type_quotas'] = dict(DEFAULT_RETENTION['type_quotas'], **(policy.get('type_quotas') or {}))
+        return policy
+    
+    def plan_retention(self, backups=None):
+        """Decide quais backups manter, em uma única passada pelo catálogo
+        
+        Do mais novo para o mais antigo: backups fixados são sempre
+        mantidos; qualquer backup fica se for o mais novo de uma
+        hora/dia/semana/mês ainda dentro da quantidade configurada para a
+        faixa; tipos com cota mantêm ainda os N mais recentes, mesmo fora
+        das faixas. Retorna (manter, remover), com o motivo de cada backup
+        mantido em 'retention_reasons'.
+        """
+        policy = self.get_retention_policy()
+        type_quotas = policy['type_quotas']
+        backups = sorted(backups if backups is not None else self.list_backups(),
+                         key=lambda x: x.get('timestamp', ''), reverse=True)
+        
+        seen_periods = {tier: set() for tier in RETENTION_TIERS}
+        type_counts = {}
+        keep = []
+        remove = []
+        
+        for backup in backups:
+            reasons = []
+            backup_type = backup.get('type', 'manual')
             
-            if len(backups) <= max_backups:
-                return
+            if backup.get('pinned'):
+                reasons.append('pinned')
             
-            # Ordena por data (mais antigo primeiro)
-            backups.sort(key=lambda x: x.get('timestamp', ''))
+            timestamp = datetime.fromisoformat(backup['timestamp'])
+            for tier, period_key in RETENTION_TIERS.items():
+                period = period_key(timestamp)
+                if period not in seen_periods[tier] and len(seen_periods[tier]) < policy.get(tier, 0):
+                    seen_periods[tier].add(period)
+                    reasons.append(tier)
             
-            # Remove os mais antigos
-            backups_to_remove = backups[:-max_backups]
+            if backup_type in type_quotas:
+                type_counts[backup_type] = type_counts.get(backup_type, 0) + 1
+                if type_counts[backup_type] <= type_quotas[backup_type]:
+                    reasons.append(backup_type)
             
-            for backup in backups_to_remove:
-                # Não remove backups de restauração
-                if backup.get('type') != 'pre_restore':
-                    self.delete_backup(backup['name'])
-                    logging.info(f"Backup antigo removido: {backup['name']}")
+            if reasons:
+                keep.append(dict(backup, retention_reasons=reasons))
+            else:
+                remove.append(backup)
+        
+        return keep, remove
+    
+    def set_backup_pinned(self, backup_name, pinned=True):
+        """Fixa (ou libera) um backup, protegendo-o da limpeza automática"""
+        if not self.get_backup_info(backup_name):
+            logging.error(f"Backup não encontrado: {backup_name}")
+            return False
+        
+        self.update_backup_info(backup_name, {'pinned': pinned})
+        logging.info(f"Backup {backup_name} {'fixado' if pinned else 'liberado'}")
+        return True
+    
+    def cleanup_old_backups(self, progress_callback=None, cancel_event=None):
+        """Remove os backups fora da política de retenção (plan_retention)
+        
+        Os blobs dos incrementais removidos são liberados por uma única
+        coleta ao final.
+        """
+        try:
+            with self.store.locked(cancel_event):
+                keep, backups_to_remove = self.plan_retention()
+            
+                if not backups_to_remove:
+                    return
+            
+                progress = ProgressTracker(len(backups_to_remove), 0, progress_callback, cancel_event)
+            
+                try:
+                    for backup in backups_to_remove:
+                        self.delete_backup_locked(backup['name'], collect_garbage=False)
+                        logging.info(f"Backup antigo removido: {backup['name']}")
+                        progress.advance()
+                finally:
+                    # Uma única coleta de blobs após remover os manifestos
+                    # (também quando a limpeza é cancelada no meio)
+                    self.store.collect_garbage()
             
+        except JobCancelled:
+            logging.info("Limpeza de backups cancelada")
+            raise
         except Exception as e:
             logging.error(f"Erro na limpeza de backups: {e}")
     
@@ -348,21 +1175,36 @@ class BackupManager:
             interval_hours = self.config.get('auto_backup_interval_hours', 24)
             
             time_diff = datetime.now() - last_backup_time
-            return time_diff.total_seconds() > (interval_hours * 3600)
+            if time_diff.total_seconds() <= (interval_hours * 3600):
+                return False
+            
+            # Sem alterações desde o último backup: não gera uma cópia idêntica
+            if self.get_data_fingerprint() == self.config.get('last_backup_fingerprint'):
+                logging.info("Backup automático ignorado: dados sem alterações")
+                return False
+            
+            return True
             
         except Exception:
             return True
     
-    def create_auto_backup_if_needed(self):
+    def create_auto_backup_if_needed(self, progress_callback=None, cancel_event=None):
         """Cria backup automático se necessário"""
         if self.should_create_auto_backup():
             try:
-                self.create_backup(
+                backup_info = self.create_backup(
                     description="Backup automático",
-                    backup_type="auto"
+                    backup_type="auto",
+                    progress_callback=progress_callback,
+                    cancel_event=cancel_event
                 )
+                if not backup_info:
+                    return False
+                
                 logging.info("Backup automático criado")
                 return True
+            except JobCancelled:
+                raise
             except Exception as e:
                 logging.error(f"Erro no backup automático: {e}")
                 return False
@@ -402,3 +1244,74 @@ class BackupManager:
         except Exception as e:
             logging.error(f"Erro ao gerar estatísticas de backup: {e}")
             return {}
+
+def main(argv=None):
+    """Comandos de backup (python -m core.backup_manager)"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Backups - Sistema DIRENS")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    benchmark_parser = subparsers.add_parser("benchmark", help="Compara os codecs de compressão nos dados atuais")
+    benchmark_parser.add_argument("--codec", action="append", choices=sorted(BACKUP_CODECS), default=None)
+    benchmark_parser.add_argument("--level", action="append", type=int, default=None)
+    
+    verify_parser = subparsers.add_parser("verify", help="Verifica a integridade dos backups")
+    verify_parser.add_argument("name", nargs="*", help="Backups a verificar (padrão: todos)")
+    
+    retention_parser = subparsers.add_parser("retention", help="Mostra quais backups a política de retenção mantém")
+    retention_parser.add_argument("--apply", action="store_true", help="Remove os backups fora da política")
+    
+    diff_parser = subparsers.add_parser("diff", help="Compara dois backups (use 'atual' para os dados atuais)")
+    diff_parser.add_argument("source_a")
+    diff_parser.add_argument("source_b")
+    diff_parser.add_argument("--escola", default=None)
+    
+    args = parser.parse_args(argv)
+    backup_manager = BackupManager()
+    
+    if args.command == "benchmark":
+        print(f"{'codec':<8} {'nível':>5} {'original':>12} {'compactado':>12} {'taxa':>7} {'tempo':>8} {'MB/s':>8}")
+        for result in backup_manager.benchmark_codecs(args.codec, args.level):
+            level = '-' if result['level'] is None else result['level']
+            print(f"{result['codec']:<8} {level:>5} {result['original_size']:>12} "
+                  f"{result['compressed_size']:>12} {result['ratio']:>7.1%} "
+                  f"{result['seconds']:>7.2f}s {result['throughput_mb_s']:>8.1f}")
+        return 0
+    
+    if args.command == "verify":
+        names = args.name or [backup['name'] for backup in backup_manager.list_backups()]
+        failures = 0
+        
+        for name in names:
+            result = backup_manager.verify_backup(name)
+            status = "OK" if result['valid'] else "FALHA"
+            print(f"{status:<6} {name} ({result['checked_files']} arquivos)")
+            for error in result['errors']:
+                print(f"       {error}")
+            failures += not result['valid']
+        return 1 if failures else 0
+    
+    if args.command == "retention":
+        keep, remove = backup_manager.plan_retention()
+        for backup in keep:
+            print(f"manter  {backup['name']} ({', '.join(backup['retention_reasons'])})")
+        for backup in remove:
+            print(f"remover {backup['name']}")
+        
+        if args.apply:
+            backup_manager.cleanup_old_backups()
+        return 0
+    
+    if args.command == "diff":
+        from core.backup_diff import BackupDiff, format_diff_summary
+        
+        result = BackupDiff(backup_manager).diff(args.source_a, args.source_b, args.escola)
+        print(format_diff_summary(result, max_lines=1000))
+        return 0
+    
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento Incremental de Backups - Sistema DIRENS
+"""
+
+import os
+import json
+import time
+import gzip
+import shutil
+import hashlib
+import zipfile
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from filelock import FileLock, Timeout
+
+from core.jobs import check_cancelled
+
+# Tamanho dos blocos lidos ao calcular hashes e copiar conteúdo
+CHUNK_SIZE = 1024 * 1024
+
+# Temporários de blobs mais antigos que isto são restos de uma gravação interrompida
+STALE_TEMP_SECONDS = 24 * 3600
+
+
+def hash_file(file_path: str) -> str:
+    """Calcula o SHA-256 de um arquivo lendo em blocos"""
+    digest = hashlib.sha256()
+    
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    
+    return digest.hexdigest()
+
+
+class BackupStore:
+    """Repositório de blobs endereçados por conteúdo e manifestos de backup
+    
+    Cada arquivo é armazenado uma única vez em blobs/<xx>/<sha256>.gz; um
+    backup incremental é apenas um manifesto (manifests/<nome>.json) que
+    associa cada caminho ao hash do seu conteúdo.
+    
+    Criação e exclusão de backups e a coleta de blobs são serializadas
+    pelo lock do repositório (locked), inclusive entre processos.
+    """
+    
+    def __init__(self, backup_dir: str = "backups"):
+        """Inicializa o repositório"""
+        self.backup_dir = backup_dir
+        self.blobs_dir = os.path.join(backup_dir, "blobs")
+        self.manifests_dir = os.path.join(backup_dir, "manifests")
+        self.hash_cache_file = os.path.join(self.blobs_dir, "hash_cache.json")
+        
+        for directory in (self.blobs_dir, self.manifests_dir):
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+        
+        self.lock = FileLock(os.path.join(backup_dir, "store.lock"))
+    
+    @contextmanager
+    def locked(self, cancel_event=None, timeout: Optional[float] = None):
+        """Mantém o lock do repositório (reentrante na mesma thread)
+        
+        A espera verifica o cancelamento a cada segundo; com timeout,
+        desiste após esse tempo levantando filelock.Timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        while True:
+            try:
+                self.lock.acquire(timeout=1)
+                break
+            except Timeout:
+                check_cancelled(cancel_event)
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+        
+        try:
+            yield
+        finally:
+            self.lock.release()
+    
+    def get_blob_path(self, sha256: str) -> str:
+        """Caminho do blob de um hash"""
+        return os.path.join(self.blobs_dir, sha256[:2], f"{sha256}.gz")
+    
+    def get_manifest_path(self, name: str) -> str:
+        """Caminho do manifesto de um backup"""
+        return os.path.join(self.manifests_dir, f"{name}.json")
+    
+    def load_hash_cache(self) -> Dict[str, Any]:
+        """Carrega o cache de hashes (caminho -> tamanho, mtime e hash)"""
+        try:
+            if os.path.exists(self.hash_cache_file):
+                with open(self.hash_cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"Erro ao carregar cache de hashes: {e}")
+        return {}
+    
+    def save_hash_cache(self, hash_cache: Dict[str, Any]) -> None:
+        """Salva o cache de hashes"""
+        try:
+            temp_file = self.hash_cache_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(hash_cache, f, ensure_ascii=False)
+            os.replace(temp_file, self.hash_cache_file)
+        except Exception as e:
+            logging.error(f"Erro ao salvar cache de hashes: {e}")
+    
+    def hash_cached(self, file_path: str, hash_cache: Dict[str, Any],
+                    cache_key: Optional[str] = None) -> Tuple[str, int]:
+        """Retorna (sha256, tamanho) de um arquivo
+        
+        Arquivos cujo tamanho e mtime não mudaram reaproveitam o hash do
+        cache (chave cache_key, por padrão o próprio caminho).
+        """
+        cache_key = cache_key or file_path
+        stat = os.stat(file_path)
+        cached = hash_cache.get(cache_key)
+        
+        if cached and cached.get('size') == stat.st_size and cached.get('mtime_ns') == stat.st_mtime_ns:
+            return cached['sha256'], stat.st_size
+        
+        sha256 = hash_file(file_path)
+        hash_cache[cache_key] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256
+        }
+        return sha256, stat.st_size
+    
+    def store_file(self, file_path: str, hash_cache: Dict[str, Any],
+                   cache_key: Optional[str] = None) -> Tuple[str, int, int]:
+        """Armazena um arquivo no repositório
+        
+        Retorna (sha256, tamanho, bytes novos gravados); o hash vem do
+        cache quando possível (hash_cached).
+        """
+        sha256, size = self.hash_cached(file_path, hash_cache, cache_key)
+        
+        blob_path = self.get_blob_path(sha256)
+        if os.path.exists(blob_path):
+            return sha256, size, 0
+        
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        temp_file = f"{blob_path}.{threading.get_ident()}.tmp"
+        
+        try:
+            with open(file_path, 'rb') as src, gzip.open(temp_file, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(temp_file, blob_path)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        
+        return sha256, size, os.path.getsize(blob_path)
+    
+    def create_snapshot(self, name: str, files: List[Tuple[str, str]],
+                        metadata: Optional[Dict[str, Any]] = None, workers: Optional[int] = None,
+                        progress=None) -> Dict[str, Any]:
+        """Armazena os arquivos alterados e grava o manifesto do backup
+        
+        files é uma lista de (caminho no disco, nome no backup). Hash e
+        compressão dos arquivos são feitos em paralelo.
+        """
+        hash_cache = self.load_hash_cache()
+        manifest_files = {}
+        total_size = 0
+        new_bytes = 0
+        
+        def store(item):
+            if progress:
+                check_cancelled(progress.cancel_event)
+            result = self.store_file(item[0], hash_cache, cache_key=item[1])
+            if progress:
+                progress.advance(1, result[1])
+            return result
+        
+        with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as executor:
+            stored_files = list(executor.map(store, files))
+        
+        for (file_path, arcname), (sha256, size, stored) in zip(files, stored_files):
+            manifest_files[arcname] = {
+                'sha256': sha256,
+                'size': size
+            }
+            total_size += size
+            new_bytes += stored
+        
+        # Remove do cache arquivos que não fazem mais parte do backup
+        for cache_key in list(hash_cache):
+            if cache_key not in manifest_files:
+                del hash_cache[cache_key]
+        self.save_hash_cache(hash_cache)
+        
+        manifest = {
+            'name': name,
+            'created_at': datetime.now().isoformat(),
+            'metadata': metadata or {},
+            'total_size': total_size,
+            'new_bytes': new_bytes,
+            'files': manifest_files
+        }
+        
+        manifest_path = self.get_manifest_path(name)
+        temp_file = manifest_path + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, manifest_path)
+        
+        return manifest
+    
+    def load_manifest(self, name: str) -> Dict[str, Any]:
+        """Carrega o manifesto de um backup"""
+        manifest_path = self.get_manifest_path(name)
+        
+        if not os.path.exists(manifest_path):
+            return {}
+        
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def open_blob(self, sha256: str):
+        """Abre o conteúdo de um blob para leitura (binário)"""
+        return gzip.open(self.get_blob_path(sha256), 'rb')
+    
+    def restore_manifest(self, manifest: Dict[str, Any], target_dir: str,
+                         prefixes: Optional[Tuple[str, ...]] = None, progress=None) -> int:
+        """Reconstrói os arquivos de um manifesto em target_dir"""
+        restored = 0
+        
+        for arcname, info in manifest.get('files', {}).items():
+            if prefixes and not arcname.startswith(prefixes):
+                continue
+            
+            target_path = os.path.join(target_dir, arcname)
+            os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+            
+            with self.open_blob(info['sha256']) as src, open(target_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            restored += 1
+        
+            if progress:
+                progress.advance(1, info['size'])
+        
+        return restored
+    
+    def export_manifest(self, manifest: Dict[str, Any], destination_path: str, progress=None) -> None:
+        """Gera um arquivo ZIP completo a partir de um manifesto"""
+        with zipfile.ZipFile(destination_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for arcname, info in manifest.get('files', {}).items():
+                with self.open_blob(info['sha256']) as src, zipf.open(arcname, 'w') as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                
+                if progress:
+                    progress.advance(1, info['size'])
+    
+    def delete_manifest(self, name: str) -> bool:
+        """Remove o manifesto de um backup (os blobs ficam para a coleta)"""
+        manifest_path = self.get_manifest_path(name)
+        
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+            return True
+        return False
+    
+    def collect_garbage(self) -> Dict[str, int]:
+        """Remove blobs que não são referenciados por nenhum manifesto
+        
+        Executada com o lock do repositório. Blobs gravados depois do
+        início da coleta e temporários recentes (.tmp) nunca são removidos:
+        podem pertencer a um backup cujo manifesto ainda não foi gravado.
+        """
+        start_time = time.time()
+        removed_blobs = 0
+        freed_bytes = 0
+        
+        with self.locked():
+            referenced = set()
+            
+            for filename in os.listdir(self.manifests_dir):
+                if not filename.endswith('.json'):
+                    continue
+                
+                with open(os.path.join(self.manifests_dir, filename), 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                referenced.update(info['sha256'] for info in manifest.get('files', {}).values())
+            
+            for entry in os.scandir(self.blobs_dir):
+                if not entry.is_dir():
+                    continue
+                
+                for blob in os.scandir(entry.path):
+                    stat = blob.stat()
+                    
+                    if blob.name.endswith('.tmp'):
+                        if start_time - stat.st_mtime < STALE_TEMP_SECONDS:
+                            continue
+                    elif blob.name.split('.', 1)[0] in referenced or stat.st_mtime >= start_time:
+                        continue
+                    
+                    freed_bytes += stat.st_size
+                    os.remove(blob.path)
+                    removed_blobs += 1
+        
+        if removed_blobs:
+            logging.info(f"Coleta de blobs: {removed_blobs} removidos ({freed_bytes} bytes)")
+        
+        return {'removed_blobs': removed_blobs, 'freed_bytes': freed_bytes}
+    
+    def get_store_size(self) -> int:
+        """Tamanho total ocupado pelos blobs"""
+        total_size = 0
+        
+        for entry in os.scandir(self.blobs_dir):
+            if entry.is_dir():
+                total_size += sum(blob.stat().st_size for blob in os.scandir(entry.path))
+        
+        return total_size
+
+
+class BackupReader:
+    """Leitura em fluxo dos arquivos de um backup (ZIP completo ou manifesto)
+    
+    Nada é extraído para o disco: cada arquivo é lido diretamente do ZIP
+    ou do blob correspondente.
+    """
+    
+    def __init__(self, store: BackupStore, backup_info: Dict[str, Any]):
+        """Abre o backup para leitura"""
+        self.store = store
+        self.backup_info = backup_info
+        self.manifest = None
+        self.zipf = None
+        
+        if backup_info.get('mode') == 'incremental':
+            self.manifest = store.load_manifest(backup_info['name'])
+        else:
+            self.zipf = zipfile.ZipFile(backup_info['filepath'], 'r')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self) -> None:
+        """Fecha o arquivo ZIP, se aberto"""
+        if self.zipf:
+            self.zipf.close()
+            self.zipf = None
+    
+    def members(self) -> Dict[str, int]:
+        """Arquivos do backup (nome -> tamanho original)"""
+        if self.manifest is not None:
+            return {arcname: info['size'] for arcname, info in self.manifest.get('files', {}).items()}
+        return {info.filename: info.file_size for info in self.zipf.infolist()}
+    
+    def open(self, arcname: str):
+        """Abre um arquivo do backup para leitura binária"""
+        if self.manifest is not None:
+            return self.store.open_blob(self.manifest['files'][arcname]['sha256'])
+        return self.zipf.open(arcname, 'r')
+    
+    def load_json(self, arcname: str) -> Dict[str, Any]:
+        """Carrega um arquivo JSON do backup ({} se não existir)"""
+        if arcname not in self.members():
+            return {}
+        
+        with self.open(arcname) as f:
+            return json.load(f)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação em Lote por Escola - Sistema DIRENS
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Sequence
+
+from core.jobs import JobCancelled, ProgressTracker, check_cancelled
+from recursos.constants import ESCOLAS
+from recursos.utils import get_brazilian_datetime
+
+# Formatos disponíveis: método do ExportManager usado em cada um
+BATCH_FORMATS = {
+    'pdf': 'export_pdf',
+    'excel': 'export_excel',
+    'csv': 'export_csv'
+}
+
+
+def render_school_reports(school: str, formats: Sequence[str], output_dir: str) -> Dict[str, Any]:
+    """Gera os relatórios de uma escola (executado em um processo do pool)
+    
+    Cada processo percorre apenas os professores da sua escola.
+    """
+    from core.export_manager import ExportManager
+    from core.teacher_manager import TeacherManager
+    
+    teacher_manager = TeacherManager()
+    export_manager = ExportManager(exports_dir=os.path.join(output_dir, school))
+    
+    teachers = list(teacher_manager.iter_teachers(school))
+    files = []
+    
+    if teachers:
+        for export_format in formats:
+            export_method = getattr(export_manager, BATCH_FORMATS[export_format])
+            files.append(export_method(teachers, school))
+    
+    return {'school': school, 'teachers': len(teachers), 'files': files}
+
+
+class BatchExporter:
+    """Gera relatórios de várias escolas em paralelo e os reúne em um ZIP
+    
+    Os relatórios são renderizados em um ProcessPoolExecutor (um processo
+    por núcleo) e entram no ZIP à medida que cada escola termina.
+    """
+    
+    def __init__(self, exports_dir: str = "exports"):
+        """Inicializa o exportador"""
+        self.exports_dir = exports_dir
+        if not os.path.exists(self.exports_dir):
+            os.makedirs(self.exports_dir)
+    
+    def get_schools(self) -> List[str]:
+        """Escolas incluídas no lote (a própria DIRENS não tem relatório)"""
+        return [school for school in ESCOLAS if school != "DIRENS"]
+    
+    def export_all(self, formats: Sequence[str] = ('pdf',), schools: Optional[Sequence[str]] = None,
+                   workers: Optional[int] = None, progress_callback=None, cancel_event=None) -> Optional[Dict[str, Any]]:
+        """Gera os relatórios de cada escola e o ZIP combinado
+        
+        Retorna {'filepath', 'schools': {escola: professores}, 'errors':
+        {escola: mensagem}} ou None se cancelado. Se cancelado, o ZIP
+        parcial é removido.
+        """
+        schools = list(schools or self.get_schools())
+        formats = [export_format for export_format in formats if export_format in BATCH_FORMATS]
+        
+        timestamp = get_brazilian_datetime().strftime("%Y%m%d_%H%M%S")
+        zip_path = os.path.join(self.exports_dir, f"relatorios_escolas_{timestamp}.zip")
+        
+        # Evita sobrescrever um lote gerado no mesmo segundo
+        suffix = 1
+        while os.path.exists(zip_path):
+            zip_path = os.path.join(self.exports_dir, f"relatorios_escolas_{timestamp}_{suffix}.zip")
+            suffix += 1
+        temp_dir = tempfile.mkdtemp(prefix="lote_", dir=self.exports_dir)
+        
+        result = {'filepath': zip_path, 'schools': {}, 'errors': {}}
+        progress = ProgressTracker(len(schools), 0, progress_callback, cancel_event)
+        
+        # spawn: o processo principal tem Tk e threads, fork não é seguro
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=workers or min(len(schools), os.cpu_count() or 1) or 1,
+                                       mp_context=context)
+        
+        try:
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                futures = {
+                    executor.submit(render_school_reports, school, formats, temp_dir): school
+                    for school in schools
+                }
+                
+                for future in as_completed(futures):
+                    school = futures[future]
+                    
+                    try:
+                        school_result = future.result()
+                    except Exception as e:
+                        logging.error(f"Erro ao gerar relatórios da escola {school}: {e}")
+                        result['errors'][school] = str(e)
+                        progress.advance()
+                        continue
+                    
+                    for filepath in school_result['files']:
+                        zipf.write(filepath, os.path.join(school, os.path.basename(filepath)))
+                    
+                    result['schools'][school] = school_result['teachers']
+                    logging.info(f"Relatórios da escola {school}: {school_result['teachers']} professores")
+                    progress.advance()
+            
+            check_cancelled(cancel_event)
+            logging.info(f"Exportação em lote concluída: {zip_path}")
+            return result
+            
+        except JobCancelled:
+            logging.info("Exportação em lote cancelada")
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+            raise
+        except Exception:
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            shutil.rmtree(temp_dir, ignore_errors=True)
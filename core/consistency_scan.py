@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Verificação de Consistência de Todas as Escolas - Sistema DIRENS
+"""
+
+import os
+import json
+import time
+import logging
+import multiprocessing
+from collections import defaultdict
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Sequence
+
+from core.jobs import ProgressTracker, check_cancelled
+from core.validation_cache import ValidationCache, validate_with_cache
+from core.validators import consistency_context
+from recursos.constants import ESCOLAS
+from recursos.utils import get_brazilian_datetime
+
+# Exemplos guardados por tipo de problema no relatório
+ISSUE_SAMPLE_SIZE = 20
+
+# Tipos de problema verificados, na ordem do relatório
+ISSUE_TYPES = {
+    'campos': "Campos inválidos ou ausentes",
+    'siape_duplicado': "SIAPE em mais de uma escola",
+    'siape_divergente': "SIAPE do registro diferente da chave",
+    'datas': "Datas de cadastro inconsistentes",
+    'historico_ausente': "Professor sem histórico",
+    'historico_orfao': "Histórico de professor inexistente"
+}
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Converte um timestamp ISO do cadastro (None se vazio ou inválido)"""
+    try:
+        return datetime.fromisoformat(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+def check_record_dates(teacher: Dict[str, Any], now: datetime) -> List[str]:
+    """Problemas nas datas de criação, atualização e exclusão do registro"""
+    issues = []
+    timestamps = {}
+    
+    for field in ('data_criacao', 'data_atualizacao', 'data_exclusao'):
+        value = teacher.get(field)
+        timestamps[field] = parse_timestamp(value)
+        if value and timestamps[field] is None:
+            issues.append(f"{field} inválida: {value}")
+        elif timestamps[field] and timestamps[field].replace(tzinfo=None) > now:
+            issues.append(f"{field} no futuro: {value}")
+    
+    created = timestamps['data_criacao']
+    updated = timestamps['data_atualizacao']
+    if created and updated and updated.replace(tzinfo=None) < created.replace(tzinfo=None):
+        issues.append("data_atualizacao anterior à data_criacao")
+    
+    if timestamps['data_exclusao'] and teacher.get('status') != 'Excluído':
+        issues.append("data_exclusao preenchida em professor não excluído")
+    
+    return issues
+
+
+class IssueCollector:
+    """Conta os problemas por tipo e guarda alguns exemplos de cada"""
+    
+    def __init__(self, sample_size: int = ISSUE_SAMPLE_SIZE):
+        """Inicializa a contagem"""
+        self.sample_size = sample_size
+        self.counts = defaultdict(int)
+        self.samples = defaultdict(list)
+    
+    def add(self, issue_type: str, school: str, siape: Any, nome: Any = None, details: Any = None) -> None:
+        """Registra um problema"""
+        self.counts[issue_type] += 1
+        if len(self.samples[issue_type]) < self.sample_size:
+            self.samples[issue_type].append({
+                'escola': school,
+                'siape': siape,
+                'nome': nome or 'N/A',
+                'detalhes': details
+            })
+    
+    def merge(self, counts: Dict[str, int], samples: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Acrescenta a contagem de outra escola"""
+        for issue_type, count in counts.items():
+            self.counts[issue_type] += count
+            room = self.sample_size - len(self.samples[issue_type])
+            self.samples[issue_type].extend(samples.get(issue_type, [])[:max(room, 0)])
+    
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Problemas por tipo: {tipo: {descricao, total, exemplos}}"""
+        return {
+            issue_type: {
+                'descricao': label,
+                'total': self.counts.get(issue_type, 0),
+                'exemplos': self.samples.get(issue_type, [])
+            }
+            for issue_type, label in ISSUE_TYPES.items()
+        }
+
+
+def scan_school(school: str, school_teachers: Dict[str, Dict[str, Any]],
+                history_siapes: Sequence[str], cache_entries: Dict[str, Any]) -> Dict[str, Any]:
+    """Verifica os professores de uma escola (executado em um processo do pool)
+    
+    school_teachers é o trecho da escola em teachers.json (SIAPE ->
+    registro), history_siapes os SIAPEs da escola no índice do histórico e
+    cache_entries os resultados guardados da validação dos campos (só os
+    registros alterados são revalidados). Retorna a contagem e os exemplos
+    de cada tipo de problema, os SIAPEs ativos (busca de duplicados entre
+    escolas) e as novas entradas do cache, se mudaram.
+    """
+    from core.validators import ValidatorManager, CONSISTENCY_FIELDS
+    
+    validator = ValidatorManager()
+    collector = IssueCollector()
+    now = datetime.now()
+    history_siapes = set(history_siapes)
+    active = []
+    
+    for key, teacher in school_teachers.items():
+        siape = str(teacher.get('siape', ''))
+        
+        if siape != str(key):
+            collector.add('siape_divergente', school, key, teacher.get('nome'), f"Registro com SIAPE {siape or 'vazio'}")
+        
+        date_issues = check_record_dates(teacher, now)
+        if date_issues:
+            collector.add('datas', school, key, teacher.get('nome'), date_issues)
+        
+        if str(key) not in history_siapes:
+            collector.add('historico_ausente', school, key, teacher.get('nome'))
+        
+        if teacher.get('status') != 'Excluído':
+            active.append((str(key), teacher))
+    
+    for siape in sorted(history_siapes - {str(key) for key in school_teachers}):
+        collector.add('historico_orfao', school, siape)
+    
+    records = [teacher for key, teacher in active]
+    results, entries, revalidated = validate_with_cache(
+        records, [f"{school}_{key}" for key, teacher in active], cache_entries,
+        CONSISTENCY_FIELDS, validator.check_consistency_batch
+    )
+    for (key, teacher), teacher_issues in zip(active, results):
+        if teacher_issues:
+            collector.add('campos', school, key, teacher.get('nome'), teacher_issues)
+    
+    return {
+        'school': school,
+        'teachers': len(school_teachers),
+        'counts': dict(collector.counts),
+        'samples': dict(collector.samples),
+        'siapes': [key for key, teacher in active],
+        'revalidated': revalidated,
+        'cache_entries': entries if revalidated or len(entries) != len(cache_entries) else None
+    }
+
+
+class ConsistencyScanner:
+    """Verifica a consistência dos dados de várias escolas em paralelo
+    
+    teachers.json é lido uma única vez e cada escola é verificada em um
+    processo do pool (validação dos campos, SIAPE, datas do cadastro e
+    cruzamento com o índice do histórico); a busca de SIAPEs duplicados
+    entre escolas é feita ao reunir os resultados. O relatório traz a
+    contagem e exemplos de cada problema.
+    """
+    
+    def __init__(self, teacher_manager=None, reports_dir: str = "exports"):
+        """Inicializa a verificação"""
+        self.teacher_manager = teacher_manager
+        self.reports_dir = reports_dir
+    
+    def get_teacher_manager(self):
+        """TeacherManager usado para ler os dados e o índice do histórico (criado sob demanda)"""
+        if self.teacher_manager is None:
+            from core.teacher_manager import TeacherManager
+            self.teacher_manager = TeacherManager()
+        return self.teacher_manager
+    
+    def get_schools(self) -> List[str]:
+        """Escolas verificadas (a própria DIRENS não tem professores)"""
+        return [school for school in ESCOLAS if school != "DIRENS"]
+    
+    def get_history_siapes(self) -> Dict[str, List[str]]:
+        """SIAPEs com histórico, por escola, segundo o índice do histórico"""
+        history_manager = self.get_teacher_manager().history_manager
+        index_data = history_manager.load_history_index()
+        history_siapes = defaultdict(list)
+        
+        for teacher_info in index_data.get("teachers", {}).values():
+            history_siapes[teacher_info.get("escola")].append(str(teacher_info.get("siape")))
+        
+        return history_siapes
+    
+    def scan(self, schools: Optional[Sequence[str]] = None, workers: Optional[int] = None,
+             progress_callback=None, cancel_event=None) -> Dict[str, Any]:
+        """Verifica as escolas (padrão: todas) e grava o relatório
+        
+        Retorna {filepath, total_teachers, total_issues, revalidated,
+        schools: {escola: professores}, issues: {tipo: {descricao, total,
+        exemplos}}, errors: {escola: mensagem}, elapsed_seconds}. Só os
+        registros alterados desde a última verificação têm os campos
+        revalidados (ValidationCache).
+        """
+        start_time = time.time()
+        schools = list(schools or self.get_schools())
+        history_siapes = self.get_history_siapes()
+        data_manager = self.get_teacher_manager().data_manager
+        teachers_data = data_manager.load_json(data_manager.teachers_file).get("teachers", {})
+        
+        cache = ValidationCache('consistencia', consistency_context())
+        cache_entries = cache.load_entries(schools)
+        updated_entries = {}
+        
+        collector = IssueCollector()
+        siape_schools = defaultdict(list)
+        result = {'schools': {}, 'errors': {}, 'revalidated': 0}
+        progress = ProgressTracker(len(schools), 0, progress_callback, cancel_event)
+        
+        # spawn: o processo principal tem Tk e threads, fork não é seguro
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=workers or min(len(schools), os.cpu_count() or 1) or 1,
+                                       mp_context=context)
+        
+        try:
+            futures = {
+                executor.submit(scan_school, school, teachers_data.get(school, {}),
+                                history_siapes.get(school, []), cache_entries[school]): school
+                for school in schools
+            }
+            
+            for future in as_completed(futures):
+                school = futures[future]
+                
+                try:
+                    school_result = future.result()
+                except Exception as e:
+                    logging.error(f"Erro ao verificar a escola {school}: {e}")
+                    result['errors'][school] = str(e)
+                    progress.advance()
+                    continue
+                
+                collector.merge(school_result['counts'], school_result['samples'])
+                for siape in school_result['siapes']:
+                    siape_schools[siape].append(school)
+                
+                if school_result['cache_entries'] is not None:
+                    updated_entries[school] = school_result['cache_entries']
+                
+                result['schools'][school] = school_result['teachers']
+                result['revalidated'] += school_result['revalidated']
+                progress.advance()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        
+        check_cancelled(cancel_event)
+        
+        if updated_entries:
+            cache.save_entries(updated_entries)
+        
+        for siape, siape_school_list in sorted(siape_schools.items()):
+            if len(siape_school_list) > 1:
+                for school in sorted(siape_school_list):
+                    collector.add('siape_duplicado', school, siape, details=sorted(siape_school_list))
+        
+        result['issues'] = collector.to_dict()
+        result['total_teachers'] = sum(result['schools'].values())
+        result['total_issues'] = sum(collector.counts.values())
+        result['elapsed_seconds'] = time.time() - start_time
+        result['filepath'] = self.write_report(result)
+        
+        logging.info(f"Verificação de consistência: {result['total_teachers']} professores "
+                     f"({result['revalidated']} revalidados), {result['total_issues']} problemas "
+                     f"em {result['elapsed_seconds']:.2f}s")
+        return result
+    
+    def write_report(self, result: Dict[str, Any]) -> str:
+        """Grava o relatório da verificação em JSON"""
+        if not os.path.exists(self.reports_dir):
+            os.makedirs(self.reports_dir)
+        
+        generated_at = get_brazilian_datetime()
+        filepath = os.path.join(self.reports_dir, f"consistencia_{generated_at.strftime('%Y%m%d_%H%M%S')}.json")
+        
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(dict(result, generated_at=generated_at.isoformat()), f, indent=2, ensure_ascii=False, default=str)
+        
+        return filepath
+
+
+def main(argv=None):
+    """Linha de comando para a verificação noturna"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Verificação de consistência - Sistema DIRENS")
+    parser.add_argument("--escola", action="append", default=None, help="Escola (pode repetir; padrão: todas)")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos paralelos")
+    
+    args = parser.parse_args(argv)
+    result = ConsistencyScanner().scan(args.escola, args.workers)
+    
+    print(f"{result['total_teachers']} professores verificados ({result['revalidated']} revalidados) "
+          f"em {result['elapsed_seconds']:.2f}s")
+    for issue in result['issues'].values():
+        print(f"  {issue['descricao']}: {issue['total']}")
+    for school, error in result['errors'].items():
+        print(f"  Erro na escola {school}: {error}")
+    print(result['filepath'])
+    return 1 if result['errors'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
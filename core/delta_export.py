@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação de Alterações (Delta) - Sistema DIRENS
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from core.export_manager import ExportManager, CSV_COLUMNS, EXPORT_BUFFER_SIZE, iter_chunks
+from core.jobs import JobCancelled
+from recursos.utils import get_brazilian_datetime
+
+# Colunas do CSV de alterações: tipo da alteração e escola antes dos dados
+DELTA_COLUMNS = [('Alteração', 'alteracao', ''), ('Escola', 'escola', '')] + CSV_COLUMNS
+
+DELTA_FORMATS = ('csv', 'jsonl')
+
+
+class DeltaExporter:
+    """Exporta apenas os professores alterados desde a última exportação
+    
+    A marca d'água de cada escola (delta_watermarks.json em exports/)
+    guarda o momento da última exportação de alterações; a próxima
+    exportação parte dela e, ao terminar, grava a nova marca.
+    """
+    
+    def __init__(self, exports_dir: str = "exports", teacher_manager=None):
+        """Inicializa o exportador"""
+        self.export_manager = ExportManager(exports_dir)
+        self.exports_dir = exports_dir
+        self.watermark_file = os.path.join(exports_dir, "delta_watermarks.json")
+        self.teacher_manager = teacher_manager
+    
+    def get_teacher_manager(self):
+        """TeacherManager usado para ler histórico e dados (criado sob demanda)"""
+        if self.teacher_manager is None:
+            from core.teacher_manager import TeacherManager
+            self.teacher_manager = TeacherManager()
+        return self.teacher_manager
+    
+    def load_watermarks(self) -> Dict[str, Any]:
+        """Carrega as marcas d'água por escola"""
+        try:
+            if os.path.exists(self.watermark_file):
+                with open(self.watermark_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"Erro ao carregar marcas d'água: {e}")
+        return {}
+    
+    def get_watermark(self, school: str) -> Optional[str]:
+        """Momento da última exportação de alterações da escola (None se nunca houve)"""
+        return self.load_watermarks().get(school, {}).get('watermark')
+    
+    def save_watermark(self, school: str, watermark: str, filepath: str, total: int) -> None:
+        """Registra a nova marca d'água da escola"""
+        watermarks = self.load_watermarks()
+        watermarks[school] = {
+            'watermark': watermark,
+            'filepath': filepath,
+            'total': total,
+            'exported_at': datetime.now().isoformat()
+        }
+        
+        temp_file = self.watermark_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(watermarks, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, self.watermark_file)
+    
+    def export(self, school: str, export_format: str = 'csv', since: Optional[str] = None,
+               progress_callback=None, cancel_event=None) -> Dict[str, Any]:
+        """Exporta as alterações da escola desde since (padrão: a marca d'água)
+        
+        Retorna {filepath, since, watermark, total}. A nova marca é o
+        momento anterior à leitura do histórico, para que alterações feitas
+        durante a exportação entrem na próxima.
+        """
+        if export_format not in DELTA_FORMATS:
+            raise ValueError(f"Formato inválido: {export_format}")
+        
+        since = since or self.get_watermark(school)
+        watermark = datetime.now().isoformat()
+        filepath = None
+        
+        try:
+            changes = self.get_teacher_manager().get_changes_since(since, school)
+            changes = self.export_manager.track_rows(changes, progress_callback, cancel_event)
+            
+            timestamp = get_brazilian_datetime().strftime("%Y%m%d_%H%M%S")
+            filename = f"alteracoes_{school.replace(' ', '_')}_{timestamp}.{export_format}"
+            filepath = os.path.join(self.exports_dir, filename)
+            
+            if export_format == 'csv':
+                with open(filepath, 'w', newline='', encoding='utf-8-sig', buffering=EXPORT_BUFFER_SIZE) as csvfile:
+                    total = self.export_manager.write_csv_rows(csvfile, changes, DELTA_COLUMNS)
+            else:
+                total = 0
+                with open(filepath, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as jsonlfile:
+                    for chunk in iter_chunks(changes):
+                        jsonlfile.writelines(
+                            json.dumps(teacher, ensure_ascii=False, default=str) + "\n" for teacher in chunk
+                        )
+                        total += len(chunk)
+            
+            self.save_watermark(school, watermark, filepath, total)
+            logging.info(f"Alterações exportadas: {filepath} ({total} professores desde {since or 'o início'})")
+            
+            return {'filepath': filepath, 'since': since, 'watermark': watermark, 'total': total}
+            
+        except JobCancelled:
+            self.export_manager.discard_partial_file(filepath)
+            logging.info("Exportação de alterações cancelada")
+            raise
+        except Exception as e:
+            self.export_manager.discard_partial_file(filepath)
+            logging.error(f"Erro ao exportar alterações: {e}")
+            raise
+
+
+def main(argv=None):
+    """Linha de comando para a sincronização noturna"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Exportação de alterações - Sistema DIRENS")
+    parser.add_argument("--escola", default="DIRENS", help="Escola (padrão: DIRENS, todas)")
+    parser.add_argument("--formato", choices=DELTA_FORMATS, default="csv")
+    parser.add_argument("--desde", default=None, help="Timestamp ISO inicial (padrão: marca d'água)")
+    
+    args = parser.parse_args(argv)
+    result = DeltaExporter().export(args.escola, args.formato, args.desde)
+    
+    print(f"{result['total']} professores alterados desde {result['since'] or 'o início'}")
+    print(result['filepath'])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
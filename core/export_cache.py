@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de Exportações - Sistema DIRENS
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+# Espaço máximo ocupado por exports/ antes de descartar exportações em cache
+EXPORT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+
+def make_cache_key(data_version: str, school: str, export_format: str, params: Any = None,
+                   filters: Optional[Dict[str, Any]] = None) -> str:
+    """Chave de uma exportação: versão dos dados, escola, formato, parâmetros e filtros"""
+    key_data = {
+        'data_version': data_version,
+        'school': school,
+        'format': export_format,
+        'params': params,
+        'filters': filters or {}
+    }
+    encoded = json.dumps(key_data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ExportCache:
+    """Arquivos já exportados, reaproveitados enquanto os dados não mudam
+    
+    O índice (exports/export_cache.json) associa cada chave ao arquivo
+    gerado. Quando exports/ passa de max_bytes, as exportações em cache
+    usadas há mais tempo são removidas; os demais arquivos da pasta
+    entram na conta, mas nunca são apagados.
+    """
+    
+    # Exportações rodam em threads de tarefas: o índice é protegido por um lock único
+    _lock = threading.Lock()
+    
+    def __init__(self, exports_dir: str = "exports", max_bytes: int = EXPORT_CACHE_MAX_BYTES):
+        """Inicializa o cache"""
+        self.exports_dir = exports_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(exports_dir, "export_cache.json")
+    
+    def load_index(self) -> Dict[str, Any]:
+        """Carrega o índice do cache"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"Erro ao carregar cache de exportações: {e}")
+        return {}
+    
+    def save_index(self, index: Dict[str, Any]) -> None:
+        """Salva o índice do cache"""
+        try:
+            temp_file = self.index_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=2, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+        except Exception as e:
+            logging.error(f"Erro ao salvar cache de exportações: {e}")
+    
+    def get(self, key: str) -> Optional[str]:
+        """Arquivo já exportado para a chave (None se não houver ou mudou)"""
+        with self._lock:
+            index = self.load_index()
+            entry = index.get(key)
+            if not entry:
+                return None
+            
+            filepath = entry['filepath']
+            try:
+                valid = os.path.getsize(filepath) == entry['size']
+            except OSError:
+                valid = False
+            
+            if valid:
+                entry['last_used'] = datetime.now().isoformat()
+            else:
+                del index[key]
+            
+            self.save_index(index)
+            return filepath if valid else None
+    
+    def put(self, key: str, filepath: str) -> None:
+        """Registra um arquivo exportado e aplica o limite de espaço"""
+        try:
+            with self._lock:
+                index = self.load_index()
+                now = datetime.now().isoformat()
+                
+                # Exportações no mesmo segundo podem ter gerado o mesmo nome de arquivo
+                for other_key in [k for k, entry in index.items() if entry['filepath'] == filepath]:
+                    del index[other_key]
+                
+                index[key] = {
+                    'filepath': filepath,
+                    'size': os.path.getsize(filepath),
+                    'created_at': now,
+                    'last_used': now
+                }
+                self.evict(index, keep=key)
+                self.save_index(index)
+        except Exception as e:
+            logging.error(f"Erro ao registrar exportação no cache: {e}")
+    
+    def get_exports_size(self) -> int:
+        """Tamanho total dos arquivos em exports/"""
+        total_size = 0
+        
+        for entry in os.scandir(self.exports_dir):
+            if entry.is_file():
+                total_size += entry.stat().st_size
+        
+        return total_size
+    
+    def evict(self, index: Dict[str, Any], keep: Optional[str] = None) -> int:
+        """Remove exportações em cache (menos usadas primeiro) até caber em max_bytes"""
+        total_size = self.get_exports_size()
+        removed = 0
+        
+        for key in sorted(index, key=lambda k: index[k]['last_used']):
+            if total_size <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            
+            filepath = index.pop(key)['filepath']
+            try:
+                if os.path.exists(filepath):
+                    total_size -= os.path.getsize(filepath)
+                    os.remove(filepath)
+                    removed += 1
+            except OSError as e:
+                logging.error(f"Erro ao remover exportação em cache {filepath}: {e}")
+        
+        if removed:
+            logging.info(f"Cache de exportações: {removed} arquivos removidos")
+        
+        return removed
@@ -5,21 +5,164 @@ Gerenciador de Exportações - Sistema DIRENS
 
 import csv
 import os
+import json
 import logging
+from itertools import islice
 from recursos.utils import get_brazilian_datetime, format_brazilian_datetime
 from reportlab.lib.pagesizes import A4, letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+from core.export_cache import ExportCache, make_cache_key
+from core.jobs import JobCancelled, iter_with_progress
+from core.pdf_engine import (
+    PdfReport, fit_column_widths, get_list_table_style, get_stats_table_style, get_record_table_style
+)
+
+# Colunas da exportação CSV: (cabeçalho, campo, valor padrão)
+CSV_COLUMNS = [
+    ('SIAPE', 'siape', ''),
+    ('Nome', 'nome', ''),
+    ('CPF', 'cpf', ''),
+    ('Data Nascimento', 'data_nascimento', ''),
+    ('Sexo', 'sexo', ''),
+    ('Estado Civil', 'estado_civil', ''),
+    ('Carga Horária', 'carga_horaria', ''),
+    ('Carreira', 'carreira', ''),
+    ('Data Ingresso', 'data_ingresso', ''),
+    ('Status', 'status', 'Ativo'),
+    ('Área Atuação', 'area_atuacao', ''),
+    ('Pós-graduação', 'pos_graduacao', ''),
+    ('Graduação', 'graduacao', ''),
+    ('Instituição Graduação', 'instituicao_graduacao', ''),
+    ('Curso Pós', 'curso_pos', ''),
+    ('Instituição Pós', 'instituicao_pos', ''),
+    ('Email', 'email', ''),
+    ('Telefone', 'telefone', '')
+]
+
+# Linhas gravadas por bloco nas exportações em fluxo
+EXPORT_CHUNK_ROWS = 1000
+
+# Buffer de escrita dos arquivos exportados
+EXPORT_BUFFER_SIZE = 1024 * 1024
+
+# Linhas iniciais usadas para calcular a largura das colunas no Excel
+EXCEL_WIDTH_SAMPLE_ROWS = 500
+
+def iter_chunks(iterable, size=EXPORT_CHUNK_ROWS):
+    """Divide um iterável em listas de até size itens"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+class TeacherStatistics:
+    """Estatísticas resumidas dos relatórios, acumuladas professor a professor"""
+    
+    def __init__(self):
+        """Zera os contadores"""
+        self.total = 0
+        self.ativos = 0
+        self.de_40h = 0
+        self.doutorado = 0
+        self.mestrado = 0
+        self.ebtt = 0
+    
+    def add(self, teacher):
+        """Contabiliza um professor"""
+        self.total += 1
+        self.ativos += teacher.get('status', 'Ativo') == 'Ativo'
+        self.de_40h += teacher.get('carga_horaria') == '40H_DE'
+        self.doutorado += teacher.get('pos_graduacao') == 'DOUTORADO'
+        self.mestrado += teacher.get('pos_graduacao') == 'MESTRADO'
+        self.ebtt += teacher.get('carreira') == 'EBTT'
+    
+    def result(self):
+        """Estatísticas no formato de generate_statistics (None se vazio)"""
+        if not self.total:
+            return None
+        
+        return {
+            'total': self.total,
+            'ativos': self.ativos,
+            'de_40h': self.de_40h,
+            'doutorado': self.doutorado,
+            'mestrado': self.mestrado,
+            'ebtt': self.ebtt
+        }
+
+class ExcelSheetWriter:
+    """Planilha do openpyxl em modo write-only
+    
+    No modo write-only as larguras das colunas são gravadas antes da
+    primeira linha; por isso só as EXCEL_WIDTH_SAMPLE_ROWS primeiras linhas
+    ficam em memória para calculá-las, e as demais vão direto para o
+    arquivo.
+    """
+    
+    def __init__(self, workbook, title, columns, header_style):
+        """Cria a planilha"""
+        self.ws = workbook.create_sheet(title=title)
+        self.columns = columns
+        self.header_style = header_style
+        self.projection = [(field, default) for header, field, default in columns]
+        self.widths = [len(header) for header, field, default in columns]
+        self.head = []
+        self.started = False
+    
+    def append(self, teacher):
+        """Acrescenta a linha de um professor"""
+        # Células vazias (None) não são gravadas no XML da planilha
+        row = [teacher.get(field, default) for field, default in self.projection]
+        row = [None if value == '' else value for value in row]
+        
+        if self.started:
+            self.ws.append(row)
+            return
+        
+        self.head.append(row)
+        for index, value in enumerate(row):
+            if value is not None:
+                self.widths[index] = max(self.widths[index], len(str(value)))
+        
+        if len(self.head) >= EXCEL_WIDTH_SAMPLE_ROWS:
+            self.flush_head()
+    
+    def flush_head(self):
+        """Define as larguras e grava cabeçalho e linhas acumuladas"""
+        if self.started:
+            return
+        
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+        
+        for index, width in enumerate(self.widths, 1):
+            self.ws.column_dimensions[get_column_letter(index)].width = min(width + 2, 50)
+        
+        header_cells = []
+        for header, field, default in self.columns:
+            cell = WriteOnlyCell(self.ws, value=header)
+            cell.font = self.header_style['font']
+            cell.fill = self.header_style['fill']
+            cell.alignment = self.header_style['alignment']
+            header_cells.append(cell)
+        self.ws.append(header_cells)
+        
+        for row in self.head:
+            self.ws.append(row)
+        
+        self.head = []
+        self.started = True
 
 class ExportManager:
     """Gerenciador de exportações para CSV e PDF"""
     
-    def __init__(self):
+    def __init__(self, exports_dir="exports"):
         """Inicializa o gerenciador de exportações"""
-        self.exports_dir = "exports"
+        self.exports_dir = exports_dir
+        self.cache = ExportCache(exports_dir)
         self.ensure_exports_directory()
     
     def ensure_exports_directory(self):
@@ -27,289 +170,302 @@ class ExportManager:
         if not os.path.exists(self.exports_dir):
             os.makedirs(self.exports_dir)
     
-    def export_csv(self, teachers, school):
-        """Exporta professores para CSV"""
+    def track_rows(self, teachers, progress_callback=None, cancel_event=None):
+        """Envolve teachers para contar as linhas processadas e permitir cancelamento"""
+        if progress_callback is None and cancel_event is None:
+            return teachers
+        
+        total = len(teachers) if hasattr(teachers, '__len__') else None
+        return iter_with_progress(teachers, progress_callback, cancel_event, total)
+    
+    def export_cached(self, export_method, teachers, school, *args, data_version=None, filters=None,
+                      progress_callback=None, cancel_event=None, **kwargs):
+        """Executa export_method reaproveitando o arquivo de uma exportação idêntica
+        
+        A chave combina data_version, escola, método, demais argumentos
+        (campos, opções) e filters. Sem data_version a exportação é
+        sempre refeita.
+        """
+        if data_version is None:
+            return export_method(teachers, school, *args, progress_callback=progress_callback,
+                                 cancel_event=cancel_event, **kwargs)
+        
+        key = make_cache_key(data_version, school, export_method.__name__, [args, kwargs], filters)
+        filepath = self.cache.get(key)
+        if filepath:
+            logging.info(f"Exportação reaproveitada do cache: {filepath}")
+            return filepath
+        
+        filepath = export_method(teachers, school, *args, progress_callback=progress_callback,
+                                 cancel_event=cancel_event, **kwargs)
+        self.cache.put(key, filepath)
+        return filepath
+    
+    def discard_partial_file(self, filepath):
+        """Remove o arquivo de uma exportação que falhou ou foi cancelada"""
+        try:
+            if filepath and os.path.exists(filepath):
+                os.remove(filepath)
+        except OSError as e:
+            logging.error(f"Erro ao remover exportação parcial {filepath}: {e}")
+    
+    def export_csv(self, teachers, school, progress_callback=None, cancel_event=None):
+        """Exporta professores para CSV
+        
+        teachers pode ser qualquer iterável, inclusive um gerador (por
+        exemplo TeacherManager.iter_teachers): as linhas são gravadas em
+        blocos à medida que são lidas.
+        """
+        filepath = None
+        
         try:
             timestamp = get_brazilian_datetime().strftime("%Y%m%d_%H%M%S")
             filename = f"professores_{school.replace(' ', '_')}_{timestamp}.csv"
             filepath = os.path.join(self.exports_dir, filename)
             
-            with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                fieldnames = [
-                    'SIAPE', 'Nome', 'CPF', 'Data Nascimento', 'Sexo', 'Estado Civil',
-                    'Carga Horária', 'Carreira', 'Data Ingresso', 'Status', 'Área Atuação',
-                    'Pós-graduação', 'Graduação', 'Instituição Graduação',
-                    'Curso Pós', 'Instituição Pós', 'Email', 'Telefone'
-                ]
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
+            with open(filepath, 'w', newline='', encoding='utf-8-sig', buffering=EXPORT_BUFFER_SIZE) as csvfile:
+                total = self.write_csv_rows(csvfile, self.track_rows(teachers, progress_callback, cancel_event))
                 
-                for teacher in teachers:
-                    writer.writerow({
-                        'SIAPE': teacher.get('siape', ''),
-                        'Nome': teacher.get('nome', ''),
-                        'CPF': teacher.get('cpf', ''),
-                        'Data Nascimento': teacher.get('data_nascimento', ''),
-                        'Sexo': teacher.get('sexo', ''),
-                        'Estado Civil': teacher.get('estado_civil', ''),
-                        'Carga Horária': teacher.get('carga_horaria', ''),
-                        'Carreira': teacher.get('carreira', ''),
-                        'Data Ingresso': teacher.get('data_ingresso', ''),
-                        'Status': teacher.get('status', 'Ativo'),
-                        'Área Atuação': teacher.get('area_atuacao', ''),
-                        'Pós-graduação': teacher.get('pos_graduacao', ''),
-                        'Graduação': teacher.get('graduacao', ''),
-                        'Instituição Graduação': teacher.get('instituicao_graduacao', ''),
-                        'Curso Pós': teacher.get('curso_pos', ''),
-                        'Instituição Pós': teacher.get('instituicao_pos', ''),
-                        'Email': teacher.get('email', ''),
-                        'Telefone': teacher.get('telefone', '')
-                    })
-            
-            logging.info(f"CSV exportado: {filepath}")
+            logging.info(f"CSV exportado: {filepath} ({total} professores)")
             return filepath
             
+        except JobCancelled:
+            self.discard_partial_file(filepath)
+            logging.info("Exportação CSV cancelada")
+            raise
         except Exception as e:
+            self.discard_partial_file(filepath)
             logging.error(f"Erro ao exportar CSV: {e}")
             raise
     
-    def export_pdf(self, teachers, school):
-        """Exporta professores para PDF"""
+    def write_csv_rows(self, csvfile, teachers, columns=None):
+        """Grava cabeçalho e linhas CSV em blocos; retorna o número de linhas"""
+        columns = columns or CSV_COLUMNS
+        projection = [(field, default) for header, field, default in columns]
+        
+        writer = csv.writer(csvfile)
+        writer.writerow([header for header, field, default in columns])
+        
+        total = 0
+        for chunk in iter_chunks(teachers):
+            writer.writerows([teacher.get(field, default) for field, default in projection] for teacher in chunk)
+            total += len(chunk)
+        
+        return total
+    
+    def export_jsonl(self, teachers, school, fields=None, progress_callback=None, cancel_event=None):
+        """Exporta professores em JSON Lines (um registro por linha)
+        
+        Mesmo fluxo em blocos do CSV; fields limita os campos gravados.
+        """
+        filepath = None
+        
         try:
             timestamp = get_brazilian_datetime().strftime("%Y%m%d_%H%M%S")
-            filename = f"relatorio_professores_{school.replace(' ', '_')}_{timestamp}.pdf"
+            filename = f"professores_{school.replace(' ', '_')}_{timestamp}.jsonl"
             filepath = os.path.join(self.exports_dir, filename)
             
-            # Cria documento PDF em orientação paisagem para acomodar mais campos
-            from reportlab.lib.pagesizes import landscape
-            doc = SimpleDocTemplate(
-                filepath,
-                pagesize=landscape(A4),
-                rightMargin=20,
-                leftMargin=20,
-                topMargin=30,
-                bottomMargin=30
-            )
+            total = 0
+            with open(filepath, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as jsonlfile:
+                for chunk in iter_chunks(self.track_rows(teachers, progress_callback, cancel_event)):
+                    if fields:
+                        chunk = [{field: teacher.get(field) for field in fields} for teacher in chunk]
+                    
+                    jsonlfile.write("".join(
+                        json.dumps(teacher, ensure_ascii=False, default=str) + "\n" for teacher in chunk
+                    ))
+                    total += len(chunk)
             
-            # Estilos
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=30,
-                alignment=TA_CENTER
-            )
+            logging.info(f"JSON Lines exportado: {filepath} ({total} professores)")
+            return filepath
             
-            subtitle_style = ParagraphStyle(
-                'CustomSubtitle',
-                parent=styles['Heading2'],
-                fontSize=12,
-                spaceAfter=20,
-                alignment=TA_LEFT
-            )
+        except JobCancelled:
+            self.discard_partial_file(filepath)
+            logging.info("Exportação JSON Lines cancelada")
+            raise
+        except Exception as e:
+            self.discard_partial_file(filepath)
+            logging.error(f"Erro ao exportar JSON Lines: {e}")
+            raise
+    
+    def export_pdf(self, teachers, school, progress_callback=None, cancel_event=None):
+        """Exporta professores para PDF
+        
+        teachers pode ser qualquer iterável: as linhas e as estatísticas são
+        calculadas em uma única passada, e a listagem é dividida em blocos
+        de uma página (core.pdf_engine).
+        """
+        filepath = None
+        
+        try:
+            timestamp = get_brazilian_datetime().strftime("%Y%m%d_%H%M%S")
+            filename = f"relatorio_professores_{school.replace(' ', '_')}_{timestamp}.pdf"
+            filepath = os.path.join(self.exports_dir, filename)
             
-            # Elementos do documento
-            elements = []
+            # Campos da listagem: (cabeçalho, campo, padrão, tamanho máximo)
+            columns = [
+                ('SIAPE', 'siape', '', 7), ('Nome', 'nome', '', 25), ('Nasc.', 'data_nascimento', '', 10),
+                ('Sexo', 'sexo', '', 1), ('C.H.', 'carga_horaria', '', 6), ('Carreira', 'carreira', '', 6),
+                ('Ingresso', 'data_ingresso', '', 10), ('Status', 'status', 'Ativo', 8),
+                ('Área', 'area_atuacao', '', 15), ('Pós-grad.', 'pos_graduacao', '', 10),
+                ('Graduação', 'graduacao', '', 15), ('Inst.Grad', 'instituicao_graduacao', '', 12),
+                ('Curso Pós', 'curso_pos', '', 12), ('Inst.Pós', 'instituicao_pos', '', 12)
+            ]
+            
+            # Uma passada: linhas já truncadas e estatísticas
+            stats_counter = TeacherStatistics()
+            rows = []
+            for teacher in self.track_rows(teachers, None, cancel_event):
+                stats_counter.add(teacher)
+                rows.append((
+                    teacher.get('nome', ''),
+                    [str(teacher.get(field, default))[:size] for header, field, default, size in columns]
+                ))
+            rows.sort(key=lambda x: x[0])
+            total = len(rows)
+            
+            # Cria documento PDF em orientação paisagem para acomodar mais campos
+            from reportlab.lib.pagesizes import landscape
+            report = PdfReport(filepath, pagesize=landscape(A4),
+                               progress_callback=progress_callback, cancel_event=cancel_event)
             
             # Título
-            title = Paragraph(f"RELATÓRIO DE PROFESSORES<br/>{school}", title_style)
-            elements.append(title)
+            report.add_paragraph(f"RELATÓRIO DE PROFESSORES<br/>{school}", 'title')
             
             # Informações gerais
             info_text = f"""
             <b>Data de Geração:</b> {format_brazilian_datetime()}<br/>
-            <b>Total de Professores:</b> {len(teachers)}<br/>
+            <b>Total de Professores:</b> {total}<br/>
             <b>Sistema:</b> DIRENS - Controle de Professores v1.0
             """
             
-            info_para = Paragraph(info_text, styles['Normal'])
-            elements.append(info_para)
-            elements.append(Spacer(1, 20))
+            report.add_paragraph(info_text)
+            report.add_spacer(20)
             
             # Estatísticas resumidas
-            stats = self.generate_statistics(teachers)
+            stats = stats_counter.result()
             if stats:
-                elements.append(Paragraph("ESTATÍSTICAS RESUMIDAS", subtitle_style))
+                report.add_paragraph("ESTATÍSTICAS RESUMIDAS", 'subtitle')
+                
+                def percent(value):
+                    return f"{(value/total*100):.1f}%"
                 
                 stats_data = [
                     ['Categoria', 'Quantidade', 'Percentual'],
-                    ['Professores Ativos', str(stats['ativos']), f"{(stats['ativos']/len(teachers)*100):.1f}%" if teachers else "0%"],
-                    ['40H Dedicação Exclusiva', str(stats['de_40h']), f"{(stats['de_40h']/len(teachers)*100):.1f}%" if teachers else "0%"],
-                    ['Com Doutorado', str(stats['doutorado']), f"{(stats['doutorado']/len(teachers)*100):.1f}%" if teachers else "0%"],
-                    ['Com Mestrado', str(stats['mestrado']), f"{(stats['mestrado']/len(teachers)*100):.1f}%" if teachers else "0%"],
-                    ['Carreira EBTT', str(stats['ebtt']), f"{(stats['ebtt']/len(teachers)*100):.1f}%" if teachers else "0%"]
+                    ['Professores Ativos', str(stats['ativos']), percent(stats['ativos'])],
+                    ['40H Dedicação Exclusiva', str(stats['de_40h']), percent(stats['de_40h'])],
+                    ['Com Doutorado', str(stats['doutorado']), percent(stats['doutorado'])],
+                    ['Com Mestrado', str(stats['mestrado']), percent(stats['mestrado'])],
+                    ['Carreira EBTT', str(stats['ebtt']), percent(stats['ebtt'])]
                 ]
                 
-                stats_table = Table(stats_data)
-                stats_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                
-                elements.append(stats_table)
-                elements.append(Spacer(1, 20))
+                report.add_table(stats_data, get_stats_table_style())
+                report.add_spacer(20)
             
             # Lista de professores
-            if teachers:
-                elements.append(PageBreak())
-                elements.append(Paragraph("LISTA COMPLETA DE PROFESSORES", subtitle_style))
-                
-                # Cabeçalho da tabela com todos os campos
-                table_data = [
-                    ['SIAPE', 'Nome', 'Nasc.', 'Sexo', 'C.H.', 'Carreira', 'Ingresso', 'Status', 'Área', 'Pós-grad.', 'Graduação', 'Inst.Grad', 'Curso Pós', 'Inst.Pós']
-                ]
-                
-                # Dados dos professores
-                for teacher in sorted(teachers, key=lambda x: x.get('nome', '')):
-                    table_data.append([
-                        teacher.get('siape', '')[:7],  
-                        teacher.get('nome', '')[:25],  
-                        teacher.get('data_nascimento', '')[:10],
-                        teacher.get('sexo', '')[:1],
-                        teacher.get('carga_horaria', '')[:6],
-                        teacher.get('carreira', '')[:6],
-                        teacher.get('data_ingresso', '')[:10],
-                        teacher.get('status', 'Ativo')[:8],
-                        teacher.get('area_atuacao', '')[:15],
-                        teacher.get('pos_graduacao', '')[:10],
-                        teacher.get('graduacao', '')[:15],
-                        teacher.get('instituicao_graduacao', '')[:12],
-                        teacher.get('curso_pos', '')[:12],
-                        teacher.get('instituicao_pos', '')[:12]
-                    ])
+            if rows:
+                report.add_page_break()
+                report.add_paragraph("LISTA COMPLETA DE PROFESSORES", 'subtitle')
                 
-                # Cria tabela
-                teachers_table = Table(table_data, repeatRows=1)
-                teachers_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 7),
-                    ('FONTSIZE', (0, 1), (-1, -1), 6),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-                ]))
-                
-                elements.append(teachers_table)
+                col_widths = fit_column_widths(
+                    [max(size, len(header)) for header, field, default, size in columns],
+                    report.available_width
+                )
+                report.add_long_table(
+                    [header for header, field, default, size in columns],
+                    (row for name, row in rows),
+                    get_list_table_style(7, 6),
+                    col_widths
+                )
             
             # Rodapé
-            elements.append(Spacer(1, 30))
-            footer_text = f"Relatório gerado pelo Sistema DIRENS - {format_brazilian_datetime(format_str='%d/%m/%Y %H:%M')}"
-            footer = Paragraph(footer_text, styles['Normal'])
-            elements.append(footer)
+            report.add_spacer(30)
+            report.add_paragraph(
+                f"Relatório gerado pelo Sistema DIRENS - {format_brazilian_datetime(format_str='%d/%m/%Y %H:%M')}"
+            )
             
             # Gera o PDF
-            doc.build(elements)
+            report.build()
             
             logging.info(f"PDF exportado: {filepath}")
             return filepath
             
+        except JobCancelled:
+            self.discard_partial_file(filepath)
+            logging.info("Exportação PDF cancelada")
+            raise
         except Exception as e:
+            self.discard_partial_file(filepath)
             logging.error(f"Erro ao exportar PDF: {e}")
             raise
     
-    def export_pdf_with_fields(self, teachers, school, selected_fields):
+    def export_pdf_with_fields(self, teachers, school, selected_fields, progress_callback=None,
+                               cancel_event=None):
         """Exporta professores para PDF com campos selecionados"""
+        filepath = None
+        
         try:
             timestamp = get_brazilian_datetime().strftime("%Y%m%d_%H%M%S")
             filename = f"relatorio_personalizado_{school.replace(' ', '_')}_{timestamp}.pdf"
             filepath = os.path.join(self.exports_dir, filename)
             
-            # Cria documento PDF em orientação paisagem
-            from reportlab.lib.pagesizes import landscape
-            doc = SimpleDocTemplate(
-                filepath,
-                pagesize=landscape(A4),
-                rightMargin=20,
-                leftMargin=20,
-                topMargin=30,
-                bottomMargin=30
-            )
+            # Limita tamanho do texto baseado no tipo de campo
+            sizes = []
+            for field in selected_fields:
+                field_key = field['key']
+                if field_key == 'nome':
+                    sizes.append(25)
+                elif field_key in ['data_nascimento', 'data_ingresso']:
+                    sizes.append(10)
+                elif field_key == 'siape':
+                    sizes.append(7)
+                elif field_key == 'sexo':
+                    sizes.append(1)
+                elif field_key in ['carga_horaria', 'carreira', 'status']:
+                    sizes.append(8)
+                elif field_key in ['pos_graduacao']:
+                    sizes.append(12)
+                else:
+                    sizes.append(15)
             
-            # Estilos
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=30,
-                alignment=TA_CENTER
-            )
+            projection = [(field['key'], size) for field, size in zip(selected_fields, sizes)]
             
-            subtitle_style = ParagraphStyle(
-                'CustomSubtitle',
-                parent=styles['Heading2'],
-                fontSize=12,
-                spaceAfter=20,
-                alignment=TA_LEFT
+            # Linhas truncadas em uma passada (os registros completos não ficam em memória)
+            rows = sorted(
+                (
+                    (teacher.get('nome', ''), [str(teacher.get(key, ''))[:size] for key, size in projection])
+                    for teacher in self.track_rows(teachers, None, cancel_event)
+                ),
+                key=lambda x: x[0]
             )
             
-            # Elementos do documento
-            elements = []
+            # Cria documento PDF em orientação paisagem
+            from reportlab.lib.pagesizes import landscape
+            report = PdfReport(filepath, pagesize=landscape(A4),
+                               progress_callback=progress_callback, cancel_event=cancel_event)
             
             # Título
-            title = Paragraph(f"RELATÓRIO PERSONALIZADO DE PROFESSORES<br/>{school}", title_style)
-            elements.append(title)
+            report.add_paragraph(f"RELATÓRIO PERSONALIZADO DE PROFESSORES<br/>{school}", 'title')
             
             # Informações gerais
             info_text = f"""
             <b>Data de Geração:</b> {format_brazilian_datetime()}<br/>
-            <b>Total de Professores:</b> {len(teachers)}<br/>
+            <b>Total de Professores:</b> {len(rows)}<br/>
             <b>Campos Incluídos:</b> {len(selected_fields)}<br/>
             <b>Sistema:</b> DIRENS - Controle de Professores v1.0
             """
             
-            info_para = Paragraph(info_text, styles['Normal'])
-            elements.append(info_para)
-            elements.append(Spacer(1, 20))
+            report.add_paragraph(info_text)
+            report.add_spacer(20)
             
             # Lista de professores
-            if teachers:
-                elements.append(Paragraph("LISTA DE PROFESSORES", subtitle_style))
+            if rows:
+                report.add_paragraph("LISTA DE PROFESSORES", 'subtitle')
                 
                 # Cabeçalho da tabela com campos selecionados
                 headers = [field['label'] for field in selected_fields]
-                table_data = [headers]
                 
-                # Dados dos professores
-                for teacher in sorted(teachers, key=lambda x: x.get('nome', '')):
-                    row = []
-                    for field in selected_fields:
-                        field_key = field['key']
-                        value = teacher.get(field_key, '')
-                        
-                        # Limita tamanho do texto baseado no tipo de campo
-                        if field_key == 'nome':
-                            value = str(value)[:25]
-                        elif field_key in ['data_nascimento', 'data_ingresso']:
-                            value = str(value)[:10]
-                        elif field_key == 'siape':
-                            value = str(value)[:7]
-                        elif field_key == 'sexo':
-                            value = str(value)[:1]
-                        elif field_key in ['carga_horaria', 'carreira', 'status']:
-                            value = str(value)[:8]
-                        elif field_key in ['pos_graduacao']:
-                            value = str(value)[:12]
-                        else:
-                            value = str(value)[:15]
-                        
-                        row.append(value)
-                    
-                    table_data.append(row)
-                
-                # Calcula larguras das colunas baseado no número de campos
+                # Tamanho da fonte baseado no número de campos
                 num_fields = len(selected_fields)
                 if num_fields <= 6:
                     font_size_header = 9
@@ -321,107 +477,69 @@ class ExportManager:
                     font_size_header = 7
                     font_size_data = 6
                 
-                # Cria tabela
-                teachers_table = Table(table_data, repeatRows=1)
-                teachers_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), font_size_header),
-                    ('FONTSIZE', (0, 1), (-1, -1), font_size_data),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-                ]))
-                
-                elements.append(teachers_table)
+                col_widths = fit_column_widths(
+                    [max(size, len(header)) for header, size in zip(headers, sizes)],
+                    report.available_width
+                )
+                report.add_long_table(
+                    headers,
+                    (row for name, row in rows),
+                    get_list_table_style(font_size_header, font_size_data),
+                    col_widths
+                )
             
             # Rodapé
-            elements.append(Spacer(1, 30))
-            footer_text = f"Relatório personalizado gerado pelo Sistema DIRENS - {format_brazilian_datetime(format_str='%d/%m/%Y %H:%M')}"
-            footer = Paragraph(footer_text, styles['Normal'])
-            elements.append(footer)
+            report.add_spacer(30)
+            report.add_paragraph(
+                f"Relatório personalizado gerado pelo Sistema DIRENS - {format_brazilian_datetime(format_str='%d/%m/%Y %H:%M')}"
+            )
             
             # Gera o PDF
-            doc.build(elements)
+            report.build()
             
             logging.info(f"PDF personalizado exportado: {filepath}")
             return filepath
             
+        except JobCancelled:
+            self.discard_partial_file(filepath)
+            logging.info("Exportação PDF personalizado cancelada")
+            raise
         except Exception as e:
+            self.discard_partial_file(filepath)
             logging.error(f"Erro ao exportar PDF personalizado: {e}")
             raise
     
     def generate_statistics(self, teachers):
-        """Gera estatísticas para o relatório"""
-        if not teachers:
-            return None
-        
-        total = len(teachers)
-        ativos = len([t for t in teachers if t.get('status', 'Ativo') == 'Ativo'])
-        de_40h = len([t for t in teachers if t.get('carga_horaria') == '40H_DE'])
-        doutorado = len([t for t in teachers if t.get('pos_graduacao') == 'DOUTORADO'])
-        mestrado = len([t for t in teachers if t.get('pos_graduacao') == 'MESTRADO'])
-        ebtt = len([t for t in teachers if t.get('carreira') == 'EBTT'])
-        
-        return {
-            'total': total,
-            'ativos': ativos,
-            'de_40h': de_40h,
-            'doutorado': doutorado,
-            'mestrado': mestrado,
-            'ebtt': ebtt
-        }
+        """Gera estatísticas para o relatório (uma passada por teachers)"""
+        stats = TeacherStatistics()
+        for teacher in teachers:
+            stats.add(teacher)
+        return stats.result()
     
-    def export_detailed_pdf(self, teachers, school):
+    def export_detailed_pdf(self, teachers, school, progress_callback=None, cancel_event=None):
         """Exporta relatório PDF detalhado com todos os campos"""
+        filepath = None
+        
         try:
             timestamp = get_brazilian_datetime().strftime("%Y%m%d_%H%M%S")
             filename = f"relatorio_detalhado_{school.replace(' ', '_')}_{timestamp}.pdf"
             filepath = os.path.join(self.exports_dir, filename)
             
-            doc = SimpleDocTemplate(
-                filepath,
-                pagesize=letter,
-                rightMargin=20,
-                leftMargin=20,
-                topMargin=30,
-                bottomMargin=30
-            )
-            
-            elements = []
-            styles = getSampleStyleSheet()
+            report = PdfReport(filepath, pagesize=letter,
+                               progress_callback=progress_callback, cancel_event=cancel_event)
             
             # Título
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=14,
-                spaceAfter=20,
-                alignment=TA_CENTER
-            )
+            report.add_paragraph(f"RELATÓRIO DETALHADO DE PROFESSORES - {school}", 'title_small')
             
-            title = Paragraph(f"RELATÓRIO DETALHADO DE PROFESSORES - {school}", title_style)
-            elements.append(title)
+            record_style = get_record_table_style()
             
             # Para cada professor, criar uma página ou seção
             for i, teacher in enumerate(sorted(teachers, key=lambda x: x.get('nome', ''))):
                 if i > 0:
-                    elements.append(PageBreak())
+                    report.add_page_break()
                 
                 # Nome do professor
-                name_style = ParagraphStyle(
-                    'TeacherName',
-                    parent=styles['Heading2'],
-                    fontSize=12,
-                    spaceAfter=15,
-                    alignment=TA_LEFT
-                )
-                
-                name = Paragraph(f"{i+1:03d}. {teacher.get('nome', 'N/A')}", name_style)
-                elements.append(name)
+                report.add_paragraph(f"{i+1:03d}. {teacher.get('nome', 'N/A')}", 'teacher_name')
                 
                 # Dados em tabela
                 teacher_data = [
@@ -445,34 +563,32 @@ class ExportManager:
                     ['Telefone', teacher.get('telefone', '')]
                 ]
                 
-                teacher_table = Table(teacher_data, colWidths=[2*inch, 4*inch])
-                teacher_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 9),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
+                report.add_table(teacher_data, record_style, col_widths=[2*inch, 4*inch], progress_rows=1)
+                report.add_spacer(20)
                 
-                elements.append(teacher_table)
-                elements.append(Spacer(1, 20))
-            
-            doc.build(elements)
+            report.build()
             
             logging.info(f"PDF detalhado exportado: {filepath}")
             return filepath
             
+        except JobCancelled:
+            self.discard_partial_file(filepath)
+            logging.info("Exportação PDF detalhado cancelada")
+            raise
         except Exception as e:
+            self.discard_partial_file(filepath)
             logging.error(f"Erro ao exportar PDF detalhado: {e}")
             raise
     
-    def export_excel(self, teachers, school):
-        """Exporta para Excel usando openpyxl"""
+    def export_excel(self, teachers, school, split_by_school=False, progress_callback=None, cancel_event=None):
+        """Exporta para Excel usando openpyxl em modo write-only
+        
+        As linhas são gravadas à medida que teachers (qualquer iterável)
+        é percorrido. Com split_by_school=True (visão DIRENS) cada escola
+        vai para uma planilha própria.
+        """
+        filepath = None
+        
         try:
             from openpyxl import Workbook
             from openpyxl.styles import Font, PatternFill, Alignment
@@ -481,75 +597,49 @@ class ExportManager:
             filename = f"professores_{school.replace(' ', '_')}_{timestamp}.xlsx"
             filepath = os.path.join(self.exports_dir, filename)
             
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Professores"
-            
-            # Cabeçalhos
-            headers = [
-                'SIAPE', 'Nome', 'CPF', 'Data Nascimento', 'Sexo', 'Estado Civil',
-                'Carga Horária', 'Carreira', 'Data Ingresso', 'Status', 'Área Atuação',
-                'Pós-graduação', 'Graduação', 'Instituição Graduação',
-                'Curso Pós', 'Instituição Pós', 'Email', 'Telefone'
-            ]
+            wb = Workbook(write_only=True)
             
             # Estilo do cabeçalho
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_alignment = Alignment(horizontal="center", vertical="center")
-            
-            # Adiciona cabeçalhos
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-            
-            # Adiciona dados
-            for row, teacher in enumerate(teachers, 2):
-                ws.cell(row=row, column=1, value=teacher.get('siape', ''))
-                ws.cell(row=row, column=2, value=teacher.get('nome', ''))
-                ws.cell(row=row, column=3, value=teacher.get('cpf', ''))
-                ws.cell(row=row, column=4, value=teacher.get('data_nascimento', ''))
-                ws.cell(row=row, column=5, value=teacher.get('sexo', ''))
-                ws.cell(row=row, column=6, value=teacher.get('estado_civil', ''))
-                ws.cell(row=row, column=7, value=teacher.get('carga_horaria', ''))
-                ws.cell(row=row, column=8, value=teacher.get('carreira', ''))
-                ws.cell(row=row, column=9, value=teacher.get('data_ingresso', ''))
-                ws.cell(row=row, column=10, value=teacher.get('status', 'Ativo'))
-                ws.cell(row=row, column=11, value=teacher.get('area_atuacao', ''))
-                ws.cell(row=row, column=12, value=teacher.get('pos_graduacao', ''))
-                ws.cell(row=row, column=13, value=teacher.get('graduacao', ''))
-                ws.cell(row=row, column=14, value=teacher.get('instituicao_graduacao', ''))
-                ws.cell(row=row, column=15, value=teacher.get('curso_pos', ''))
-                ws.cell(row=row, column=16, value=teacher.get('instituicao_pos', ''))
-                ws.cell(row=row, column=17, value=teacher.get('email', ''))
-                ws.cell(row=row, column=18, value=teacher.get('telefone', ''))
-            
-            # Ajusta largura das colunas
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
+            header_style = {
+                'font': Font(bold=True, color="FFFFFF"),
+                'fill': PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+                'alignment': Alignment(horizontal="center", vertical="center")
+            }
+            
+            sheets = {}
+            total = 0
+            
+            for teacher in self.track_rows(teachers, progress_callback, cancel_event):
+                title = str(teacher.get('escola') or school)[:31] if split_by_school else "Professores"
+            
+                sheet = sheets.get(title)
+                if sheet is None:
+                    sheet = sheets[title] = ExcelSheetWriter(wb, title, CSV_COLUMNS, header_style)
                 
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
+                sheet.append(teacher)
+                total += 1
                 
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+            if not sheets:
+                sheets["Professores"] = ExcelSheetWriter(wb, "Professores", CSV_COLUMNS, header_style)
+            
+            # Planilhas com poucas linhas ainda não foram gravadas
+            for sheet in sheets.values():
+                sheet.flush_head()
             
             # Salva arquivo
             wb.save(filepath)
             
-            logging.info(f"Excel exportado: {filepath}")
+            logging.info(f"Excel exportado: {filepath} ({total} professores)")
             return filepath
             
         except ImportError:
             logging.warning("openpyxl não disponível, usando CSV como alternativa")
-            return self.export_csv(teachers, school)
+            return self.export_csv(teachers, school, progress_callback, cancel_event)
+        except JobCancelled:
+            self.discard_partial_file(filepath)
+            logging.info("Exportação Excel cancelada")
+            raise
         except Exception as e:
+            self.discard_partial_file(filepath)
             logging.error(f"Erro ao exportar Excel: {e}")
             raise
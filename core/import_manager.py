@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Importação de Professores em Lote - Sistema DIRENS
+"""
+
+import os
+import csv
+import logging
+import unicodedata
+import multiprocessing
+from collections import deque
+from datetime import datetime, date
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+from core.export_manager import CSV_COLUMNS
+from core.jobs import ProgressTracker, check_cancelled
+from recursos.constants import ESCOLAS
+from recursos.utils import get_brazilian_datetime
+
+# Linhas validadas por tarefa do pool
+IMPORT_CHUNK_ROWS = 500
+
+# Bytes lidos do início do CSV para detectar codificação e separador
+CSV_SNIFF_BYTES = 64 * 1024
+
+IMPORT_FORMATS = ('.csv', '.xlsx')
+
+# Nomes de coluna aceitos além dos cabeçalhos da exportação CSV
+EXTRA_HEADER_ALIASES = {
+    'nascimento': 'data_nascimento',
+    'ingresso': 'data_ingresso',
+    'celular': 'telefone_celular',
+    'telefone': 'telefone_celular',
+    'telefone celular': 'telefone_celular',
+    'telefone fixo': 'telefone_fixo',
+    'pos graduacao': 'pos_graduacao',
+    'disciplina': 'disciplina',
+    'escola': 'escola',
+    'e-mail': 'email'
+}
+
+# Validador por processo do pool (criado na primeira chamada)
+_validator = None
+
+
+def normalize_header(header: Any) -> str:
+    """Normaliza um cabeçalho (minúsculas, sem acentos, '_' como espaço)"""
+    text = unicodedata.normalize('NFD', str(header or ''))
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    return ' '.join(text.lower().replace('_', ' ').split())
+
+
+def build_header_aliases() -> Dict[str, str]:
+    """Cabeçalho normalizado -> campo do professor"""
+    aliases = {}
+    
+    for header, field, default in CSV_COLUMNS:
+        aliases[normalize_header(header)] = field
+        aliases[normalize_header(field)] = field
+    
+    aliases.update({normalize_header(alias): field for alias, field in EXTRA_HEADER_ALIASES.items()})
+    return aliases
+
+
+HEADER_ALIASES = build_header_aliases()
+
+
+def map_columns(headers: List[Any]) -> Tuple[Dict[int, str], List[str]]:
+    """Associa cada coluna a um campo; retorna (posição -> campo, colunas ignoradas)"""
+    mapping = {}
+    unknown = []
+    
+    for position, header in enumerate(headers):
+        field = HEADER_ALIASES.get(normalize_header(header))
+        if field and field not in mapping.values():
+            mapping[position] = field
+        elif str(header or '').strip():
+            unknown.append(str(header))
+    
+    return mapping, unknown
+
+
+def cell_to_text(value: Any) -> str:
+    """Converte uma célula (CSV ou Excel) para o texto usado no cadastro"""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%d-%m-%Y")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def detect_csv_format(filepath: str) -> Tuple[str, str]:
+    """Detecta (codificação, separador) pelo início do arquivo"""
+    with open(filepath, 'rb') as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+    
+    try:
+        text = sample.decode('utf-8-sig')
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        text = sample.decode('cp1252', errors='replace')
+        encoding = 'cp1252'
+    
+    try:
+        delimiter = csv.Sniffer().sniff(text.split('\n', 1)[0], delimiters=',;\t').delimiter
+    except csv.Error:
+        delimiter = ','
+    
+    return encoding, delimiter
+
+
+def iter_csv_rows(filepath: str) -> Iterator[List[Any]]:
+    """Percorre as linhas de um CSV sem carregá-lo inteiro"""
+    encoding, delimiter = detect_csv_format(filepath)
+    
+    with open(filepath, 'r', newline='', encoding=encoding) as csvfile:
+        for row in csv.reader(csvfile, delimiter=delimiter):
+            yield row
+
+
+def iter_xlsx_rows(filepath: str) -> Iterator[Tuple[Any, ...]]:
+    """Percorre as linhas da primeira planilha de um XLSX (modo somente leitura)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImportError("Importação de XLSX requer o pacote openpyxl (pip install openpyxl)") from e
+    
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def validate_rows(rows: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any], List[str]]]:
+    """Padroniza e valida um bloco de linhas (executado em um processo do pool)
+    
+    Retorna (linha, registro padronizado, erros) para cada linha.
+    """
+    global _validator
+    if _validator is None:
+        from core.validators import ValidatorManager
+        _validator = ValidatorManager()
+    
+    records = []
+    for line_number, record in rows:
+        record = _validator.sanitize_teacher_data(record)
+        record['nome'] = record.get('nome', '').upper()
+        record['sexo'] = record.get('sexo', '').upper()
+        records.append(record)
+    
+    return [
+        (line_number, record, [message for messages in field_errors.values() for message in messages])
+        for (line_number, _), record, field_errors in zip(rows, records, _validator.validate_batch(records))
+    ]
+
+
+class ImportManager:
+    """Importa professores de arquivos CSV/XLSX
+    
+    As linhas são lidas em fluxo, validadas em blocos por um pool de
+    processos (ValidatorManager.validate_batch) e as válidas são
+    gravadas com uma única escrita do arquivo de professores e um único
+    lote de histórico. As linhas rejeitadas vão para um relatório CSV.
+    """
+    
+    def __init__(self, teacher_manager=None, reports_dir: str = "exports"):
+        """Inicializa o importador"""
+        self.teacher_manager = teacher_manager
+        self.reports_dir = reports_dir
+    
+    def get_teacher_manager(self):
+        """TeacherManager usado para gravar dados e histórico (criado sob demanda)"""
+        if self.teacher_manager is None:
+            from core.teacher_manager import TeacherManager
+            self.teacher_manager = TeacherManager()
+        return self.teacher_manager
+    
+    def iter_records(self, filepath: str, result: Dict[str, Any]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Lê o arquivo e entrega (linha, registro) com os campos mapeados"""
+        extension = os.path.splitext(filepath)[1].lower()
+        if extension not in IMPORT_FORMATS:
+            raise ValueError(f"Formato não suportado: {extension}")
+        
+        rows = iter_xlsx_rows(filepath) if extension == '.xlsx' else iter_csv_rows(filepath)
+        
+        header = next(rows, None)
+        if header is None:
+            return
+        
+        mapping, result['unknown_columns'] = map_columns(list(header))
+        if 'siape' not in mapping.values():
+            raise ValueError("Coluna SIAPE não encontrada no arquivo")
+        
+        for line_number, row in enumerate(rows, 2):
+            if not any(cell_to_text(value) for value in row):
+                continue
+            
+            yield line_number, {
+                field: cell_to_text(row[position]) if position < len(row) else ''
+                for position, field in mapping.items()
+            }
+    
+    def check_school(self, record: Dict[str, Any], school: str) -> Optional[str]:
+        """Define a escola do registro; retorna um erro se não for permitida"""
+        record_school = record.get('escola') or ''
+        
+        if school == "DIRENS":
+            if not record_school:
+                return "Escola obrigatória na importação pela DIRENS"
+            if record_school not in ESCOLAS or record_school == "DIRENS":
+                return f"Escola inválida: {record_school}"
+        elif record_school and record_school != school:
+            return f"Escola {record_school} diferente da escola atual ({school})"
+        
+        record['escola'] = record_school or school
+        return None
+    
+    def import_file(self, filepath: str, school: str, user: str, dry_run: bool = False,
+                    workers: Optional[int] = None, progress_callback=None, cancel_event=None) -> Dict[str, Any]:
+        """Importa os professores de filepath para school (DIRENS: coluna Escola)
+        
+        Retorna {success, dry_run, total, imported, rejected, error_report,
+        unknown_columns}. Nada é gravado se a importação for cancelada.
+        """
+        result = {
+            'success': False,
+            'dry_run': dry_run,
+            'total': 0,
+            'imported': 0,
+            'rejected': 0,
+            'error_report': None,
+            'unknown_columns': []
+        }
+        
+        teacher_manager = self.get_teacher_manager()
+        existing = {
+            (teacher.get('escola'), str(teacher.get('siape')))
+            for teacher in teacher_manager.data_manager.iter_teachers()
+        }
+        
+        progress = ProgressTracker(0, 0, progress_callback, cancel_event)
+        records = self.iter_records(filepath, result)
+        valid_records = []
+        errors = []
+        seen = set()
+        
+        workers = workers or os.cpu_count() or 1
+        chunks = iter(lambda: list(islice(records, IMPORT_CHUNK_ROWS)), [])
+        pending = deque()
+        
+        # spawn: o processo principal tem Tk e threads, fork não é seguro
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            try:
+                while True:
+                    # Poucos blocos em andamento por vez: o arquivo é lido conforme a validação avança
+                    while len(pending) < workers * 2:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            break
+                        pending.append(executor.submit(validate_rows, chunk))
+                    
+                    if not pending:
+                        break
+                    
+                    chunk_results = pending.popleft().result()
+                    for line_number, record, row_errors in chunk_results:
+                        school_error = self.check_school(record, school)
+                        if school_error:
+                            # Sem escola válida não há como procurar duplicados
+                            row_errors.append(school_error)
+                        else:
+                            key = (record['escola'], record.get('siape', ''))
+                            if key in existing:
+                                row_errors.append("SIAPE já cadastrado nesta escola")
+                            elif key in seen:
+                                row_errors.append("SIAPE repetido no arquivo")
+                            seen.add(key)
+                        
+                        if row_errors:
+                            errors.append((line_number, record, row_errors))
+                        else:
+                            valid_records.append(record)
+                    
+                    progress.advance(len(chunk_results))
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+        
+        check_cancelled(cancel_event)
+        
+        result['total'] = len(valid_records) + len(errors)
+        result['rejected'] = len(errors)
+        if errors:
+            result['error_report'] = self.write_error_report(errors)
+        
+        if dry_run or not valid_records:
+            result['success'] = True
+            return result
+        
+        now = datetime.now().isoformat()
+        history_entries = []
+        for record in valid_records:
+            record.setdefault('status', 'Ativo')
+            record['status'] = record['status'] or 'Ativo'
+            record['data_criacao'] = now
+            record['data_atualizacao'] = now
+            record['criado_por'] = user
+            
+            history_entries.append({
+                'siape': record['siape'],
+                'escola': record['escola'],
+                'action': 'CREATE',
+                'user': user,
+                'timestamp': now,
+                'field': 'professor',
+                'old_value': None,
+                'new_value': 'Novo professor criado',
+                'notes': f"Professor {record['nome']} importado de {os.path.basename(filepath)}"
+            })
+        
+        if not teacher_manager.data_manager.save_teachers(valid_records):
+            raise RuntimeError("Falha ao gravar os professores importados")
+        
+        teacher_manager.history_manager.add_history_entries(history_entries)
+        
+        result['imported'] = len(valid_records)
+        result['success'] = True
+        logging.info(f"Importação concluída: {result['imported']} professores, {result['rejected']} rejeitados")
+        return result
+    
+    def write_error_report(self, errors: List[Tuple[int, Dict[str, Any], List[str]]]) -> str:
+        """Grava o relatório de linhas rejeitadas (linha, SIAPE, nome e erros)"""
+        if not os.path.exists(self.reports_dir):
+            os.makedirs(self.reports_dir)
+        
+        timestamp = get_brazilian_datetime().strftime("%Y%m%d_%H%M%S")
+        filepath = os.path.join(self.reports_dir, f"erros_importacao_{timestamp}.csv")
+        
+        with open(filepath, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['Linha', 'SIAPE', 'Nome', 'Erros'])
+            for line_number, record, row_errors in sorted(errors, key=lambda x: x[0]):
+                writer.writerow([line_number, record.get('siape', ''), record.get('nome', ''), "; ".join(row_errors)])
+        
+        return filepath
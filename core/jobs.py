@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Tarefas em Segundo Plano - Sistema DIRENS
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+# Intervalo (ms) entre verificações de progresso na interface
+POLL_INTERVAL_MS = 100
+
+
+class JobCancelled(Exception):
+    """Operação interrompida pelo usuário"""
+    pass
+
+
+def check_cancelled(cancel_event: Optional[threading.Event]) -> None:
+    """Interrompe a operação se o cancelamento foi solicitado"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled("Operação cancelada")
+
+
+class ProgressTracker:
+    """Acumula o progresso de uma operação (pode ser usado por várias threads)"""
+    
+    def __init__(self, total_files: int = 0, total_bytes: int = 0,
+                 callback: Optional[Callable] = None, cancel_event: Optional[threading.Event] = None):
+        """Inicializa o acompanhamento"""
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.done_files = 0
+        self.done_bytes = 0
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.lock = threading.Lock()
+        self.report()
+    
+    def advance(self, files: int = 1, bytes_done: int = 0) -> None:
+        """Registra arquivos/bytes concluídos e verifica cancelamento"""
+        with self.lock:
+            self.done_files += files
+            self.done_bytes += bytes_done
+        self.report()
+        check_cancelled(self.cancel_event)
+    
+    def report(self) -> None:
+        """Envia o progresso atual ao callback"""
+        if self.callback:
+            self.callback(self.done_files, self.total_files, self.done_bytes, self.total_bytes)
+
+
+def iter_with_progress(iterable, progress_callback: Optional[Callable] = None,
+                       cancel_event: Optional[threading.Event] = None, total: Optional[int] = None,
+                       step: int = 100):
+    """Percorre um iterável informando o progresso a cada step itens
+    
+    Usado pelas exportações para contar as linhas processadas; total pode
+    ficar em aberto quando o iterável é um gerador.
+    """
+    progress = ProgressTracker(total or 0, 0, progress_callback, cancel_event)
+    pending = 0
+    
+    for item in iterable:
+        yield item
+        pending += 1
+        if pending >= step:
+            progress.advance(pending)
+            pending = 0
+    
+    progress.advance(pending)
+
+
+class Job:
+    """Tarefa executada em uma thread separada com progresso e cancelamento
+    
+    A função recebe os argumentos informados mais progress_callback e
+    cancel_event; ela deve chamar progress_callback(arquivos feitos,
+    total de arquivos, bytes feitos, total de bytes) e respeitar o
+    cancel_event. O status final vem de como a função terminou: só
+    'cancelled' se ela levantar JobCancelled; se retornar, 'done' com o
+    resultado, mesmo que o cancelamento tenha sido pedido tarde demais.
+    """
+    
+    def __init__(self, name: str, func: Callable, args: tuple = (), kwargs: Optional[Dict[str, Any]] = None,
+                 unit: str = "arquivos"):
+        """Inicializa a tarefa (unit: nome dos itens contados no progresso)"""
+        self.name = name
+        self.unit = unit
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.cancel_event = threading.Event()
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.done_files = 0
+        self.total_files = 0
+        self.done_bytes = 0
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.thread = None
+    
+    def start(self) -> None:
+        """Inicia a tarefa em uma thread daemon"""
+        self.thread = threading.Thread(target=self.run, name=f"job-{self.name}", daemon=True)
+        self.thread.start()
+    
+    def run(self) -> None:
+        """Executa a função da tarefa"""
+        self.status = 'running'
+        self.started_at = time.monotonic()
+        
+        try:
+            self.result = self.func(*self.args, progress_callback=self.update_progress,
+                                    cancel_event=self.cancel_event, **self.kwargs)
+            self.status = 'done'
+        except JobCancelled:
+            self.status = 'cancelled'
+        except Exception as e:
+            logging.error(f"Erro na tarefa {self.name}: {e}")
+            self.error = e
+            self.status = 'failed'
+        finally:
+            self.finished_at = time.monotonic()
+    
+    def update_progress(self, done_files: int, total_files: int, done_bytes: int = 0, total_bytes: int = 0) -> None:
+        """Atualiza o progresso (chamado pela função da tarefa)"""
+        with self.lock:
+            self.done_files = done_files
+            self.total_files = total_files
+            self.done_bytes = done_bytes
+            self.total_bytes = total_bytes
+    
+    def cancel(self) -> None:
+        """Solicita o cancelamento da tarefa"""
+        self.cancel_event.set()
+    
+    def is_finished(self) -> bool:
+        """Verifica se a tarefa terminou (com sucesso ou não)"""
+        return self.status in ('done', 'failed', 'cancelled')
+    
+    def get_fraction(self) -> float:
+        """Fração concluída (por bytes quando conhecidos, senão por arquivos)"""
+        with self.lock:
+            if self.total_bytes:
+                return min(1.0, self.done_bytes / self.total_bytes)
+            if self.total_files:
+                return min(1.0, self.done_files / self.total_files)
+        return 1.0 if self.status == 'done' else 0.0
+    
+    def get_eta(self) -> Optional[float]:
+        """Tempo restante estimado em segundos"""
+        if self.started_at is None or self.is_finished():
+            return None
+        
+        fraction = self.get_fraction()
+        if fraction <= 0:
+            return None
+        
+        elapsed = time.monotonic() - self.started_at
+        return elapsed * (1 - fraction) / fraction
+    
+    def get_progress_text(self) -> str:
+        """Resumo do progresso para exibição"""
+        if self.status == 'done':
+            return f"{self.name}: concluído"
+        if self.status == 'failed':
+            return f"{self.name}: erro - {self.error}"
+        if self.status == 'cancelled':
+            return f"{self.name}: cancelado"
+        
+        if self.total_files:
+            text = f"{self.name}: {self.get_fraction():.0%} ({self.done_files}/{self.total_files} {self.unit})"
+        elif self.done_files:
+            text = f"{self.name}: {self.done_files} {self.unit}"
+        else:
+            text = f"{self.name}: {self.get_fraction():.0%}"
+        
+        eta = self.get_eta()
+        if eta is not None:
+            text += f" - restam ~{int(eta)}s"
+        
+        return text
+
+
+class JobManager:
+    """Registra as tarefas em segundo plano e repassa eventos à interface Tk
+    
+    Os callbacks on_progress e on_complete são sempre chamados na thread
+    do Tk (via widget.after), nunca na thread da tarefa.
+    """
+    
+    def __init__(self):
+        """Inicializa o gerenciador de tarefas"""
+        self.jobs = []
+        self.lock = threading.Lock()
+    
+    def submit(self, name: str, func: Callable, *args, widget=None, on_progress: Optional[Callable] = None,
+               on_complete: Optional[Callable] = None, unit: str = "arquivos", **kwargs) -> Job:
+        """Cria e inicia uma tarefa
+        
+        widget é qualquer widget Tk usado para agendar os callbacks.
+        """
+        job = Job(name, func, args, kwargs, unit=unit)
+        
+        with self.lock:
+            self.jobs.append(job)
+        
+        job.start()
+        
+        if widget is not None:
+            self.poll(job, widget, on_progress, on_complete)
+        
+        return job
+    
+    def poll(self, job: Job, widget, on_progress: Optional[Callable], on_complete: Optional[Callable]) -> None:
+        """Verifica a tarefa e chama os callbacks na thread do Tk"""
+        try:
+            if on_progress:
+                on_progress(job)
+            
+            if job.is_finished():
+                if on_complete:
+                    on_complete(job)
+                return
+            
+            widget.after(POLL_INTERVAL_MS, lambda: self.poll(job, widget, on_progress, on_complete))
+        except Exception as e:
+            # Janela destruída: a tarefa continua, só a interface deixa de ser atualizada
+            logging.warning(f"Acompanhamento da tarefa {job.name} interrompido: {e}")
+    
+    def get_jobs(self, include_finished: bool = True) -> List[Job]:
+        """Lista as tarefas registradas"""
+        with self.lock:
+            return [job for job in self.jobs if include_finished or not job.is_finished()]
+    
+    def get_running_jobs(self) -> List[Job]:
+        """Lista as tarefas em execução"""
+        return self.get_jobs(include_finished=False)
+    
+    def clear_finished(self) -> None:
+        """Remove do registro as tarefas já terminadas"""
+        with self.lock:
+            self.jobs = [job for job in self.jobs if not job.is_finished()]
+
+
+# Gerenciador compartilhado pela aplicação
+job_manager = JobManager()
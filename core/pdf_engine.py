@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de Relatórios PDF - Sistema DIRENS
+"""
+
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Iterable, Sequence
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+from core.jobs import ProgressTracker
+
+
+@lru_cache(maxsize=1)
+def get_styles() -> Dict[str, ParagraphStyle]:
+    """Estilos de parágrafo dos relatórios (criados uma única vez)"""
+    styles = getSampleStyleSheet()
+    
+    return {
+        'normal': styles['Normal'],
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            spaceAfter=30,
+            alignment=TA_CENTER
+        ),
+        'title_small': ParagraphStyle(
+            'CustomTitleSmall',
+            parent=styles['Heading1'],
+            fontSize=14,
+            spaceAfter=20,
+            alignment=TA_CENTER
+        ),
+        'subtitle': ParagraphStyle(
+            'CustomSubtitle',
+            parent=styles['Heading2'],
+            fontSize=12,
+            spaceAfter=20,
+            alignment=TA_LEFT
+        ),
+        'teacher_name': ParagraphStyle(
+            'TeacherName',
+            parent=styles['Heading2'],
+            fontSize=12,
+            spaceAfter=15,
+            alignment=TA_LEFT
+        )
+    }
+
+
+@lru_cache(maxsize=None)
+def get_list_table_style(header_font_size: int = 7, data_font_size: int = 6) -> TableStyle:
+    """Estilo das tabelas de listagem (cabeçalho cinza e grade)"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('FONTSIZE', (0, 1), (-1, -1), data_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+    ])
+
+
+@lru_cache(maxsize=1)
+def get_stats_table_style() -> TableStyle:
+    """Estilo da tabela de estatísticas resumidas"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+@lru_cache(maxsize=1)
+def get_record_table_style() -> TableStyle:
+    """Estilo da ficha (campo/valor) de um professor"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+def fit_column_widths(max_chars: Sequence[int], available_width: float) -> List[float]:
+    """Divide a largura disponível proporcionalmente ao tamanho máximo de cada coluna
+    
+    Larguras fixas mantêm as colunas alinhadas entre as páginas e
+    poupam o reportlab de medir cada célula.
+    """
+    total_chars = sum(max_chars) or 1
+    return [available_width * chars / total_chars for chars in max_chars]
+
+
+class PdfReport:
+    """Documento PDF com estilos compartilhados e listagens longas"""
+    
+    def __init__(self, filepath: str, pagesize=A4, margins: Sequence[int] = (20, 20, 30, 30),
+                 progress_callback=None, cancel_event=None):
+        """Cria o documento (margens: direita, esquerda, topo, base)
+        
+        Com progress_callback/cancel_event, build informa as linhas já
+        renderizadas e pode ser interrompido entre uma página e outra.
+        """
+        right, left, top, bottom = margins
+        self.doc = SimpleDocTemplate(
+            filepath,
+            pagesize=pagesize,
+            rightMargin=right,
+            leftMargin=left,
+            topMargin=top,
+            bottomMargin=bottom
+        )
+        self.styles = get_styles()
+        self.elements = []
+        self.total_rows = 0
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+    
+    @property
+    def available_width(self) -> float:
+        """Largura útil da página"""
+        return self.doc.width
+    
+    def add_paragraph(self, text: str, style: str = 'normal') -> None:
+        """Acrescenta um parágrafo com um dos estilos de get_styles"""
+        self.elements.append(Paragraph(text, self.styles[style]))
+    
+    def add_spacer(self, height: int) -> None:
+        """Acrescenta um espaço vertical"""
+        self.elements.append(Spacer(1, height))
+    
+    def add_page_break(self) -> None:
+        """Acrescenta uma quebra de página"""
+        self.elements.append(PageBreak())
+    
+    def add_table(self, data: List[List[Any]], style: TableStyle, col_widths: Optional[List[float]] = None,
+                  progress_rows: int = 0) -> None:
+        """Acrescenta uma tabela pequena (cabe em uma página)
+        
+        progress_rows é quanto a tabela conta no progresso de build.
+        """
+        table = Table(data, colWidths=col_widths)
+        table.setStyle(style)
+        table.progress_rows = progress_rows
+        self.total_rows += progress_rows
+        self.elements.append(table)
+    
+    def add_long_table(self, header: List[str], rows: Iterable[List[Any]], style: TableStyle,
+                       col_widths: Optional[List[float]] = None) -> int:
+        """Acrescenta uma listagem longa (cabeçalho repetido uma vez por página)
+        
+        LongTable mede as linhas só até preencher a página, então a
+        divisão entre páginas não mede de novo a tabela inteira.
+        Retorna o número de linhas.
+        """
+        data = [header]
+        data.extend(rows)
+        
+        table = LongTable(data, colWidths=col_widths, repeatRows=1)
+        table.setStyle(style)
+        self.elements.append(table)
+            
+        total = len(data) - 1
+        self.total_rows += total
+        return total
+    
+    def count_rendered_rows(self, flowable) -> int:
+        """Linhas de dados de uma tabela já desenhada
+        
+        Listagens longas são divididas entre páginas; cada parte repete o
+        cabeçalho, por isso a contagem vem de _nrows.
+        """
+        progress_rows = getattr(flowable, 'progress_rows', None)
+        if progress_rows is not None:
+            return progress_rows
+        
+        repeat_rows = getattr(flowable, 'repeatRows', 0)
+        if repeat_rows:
+            return flowable._nrows - repeat_rows
+        return 0
+    
+    def build(self) -> None:
+        """Gera o arquivo PDF"""
+        if self.progress_callback or self.cancel_event:
+            progress = ProgressTracker(self.total_rows, 0, self.progress_callback, self.cancel_event)
+            self.doc.afterFlowable = lambda flowable: progress.advance(self.count_rendered_rows(flowable))
+        
+        self.doc.build(self.elements)
+        self.elements = []
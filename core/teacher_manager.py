@@ -10,7 +10,19 @@ import os
 
 from dados.data_manager import DataManager
 from dados.history_manager import HistoryManager
-from core.validators import ValidatorManager
+from core.validators import ValidatorManager, CONSISTENCY_FIELDS, consistency_context
+from core.validation_cache import ValidationCache, record_hash, validate_with_cache
+
+# Campos cujas alterações são registradas no histórico
+MONITORED_FIELDS = (
+    'nome', 'data_nascimento', 'sexo', 'estado', 'email', 'telefone',
+    'carga_horaria', 'carreira', 'data_ingresso', 'status',
+    'area_atuacao', 'pos_graduacao', 'graduacao', 'instituicao_graduacao',
+    'curso_pos', 'instituicao_pos'
+)
+
+# Campos lidos pela correção automática (conteúdo do hash no cache de validação)
+FIX_FIELDS = ('nome', 'status', 'data_criacao')
 
 class TeacherManager:
     """Gerenciador de operações com professores"""
@@ -199,6 +211,58 @@ class TeacherManager:
             logging.error(f"Erro ao listar todos os professores: {e}")
             return []
     
+    def iter_teachers(self, school=None, include_deleted=False):
+        """Percorre os professores sem materializar listas (school=None ou DIRENS: todos)"""
+        if school == "DIRENS":
+            school = None
+        
+        for teacher in self.data_manager.iter_teachers(school):
+            if include_deleted or teacher.get('status') != 'Excluído':
+                yield teacher
+    
+    def get_changes_since(self, since, school=None):
+        """Professores criados, alterados ou excluídos depois de since
+        
+        Usa o histórico para descobrir quem mudou e percorre os dados uma
+        única vez. Cada registro recebe 'alteracao' (CREATE, UPDATE ou
+        DELETE); professores removidos fisicamente aparecem apenas com
+        SIAPE e escola. Sem since, todos os professores são retornados.
+        """
+        if school == "DIRENS":
+            school = None
+        
+        if since is None:
+            for teacher in self.iter_teachers(school, include_deleted=True):
+                change = 'DELETE' if teacher.get('status') == 'Excluído' else 'CREATE'
+                yield dict(teacher, alteracao=change)
+            return
+        
+        actions = {}
+        for entry in self.history_manager.get_history_by_date_range(since, None, school):
+            if entry.get('timestamp', '') > since:
+                key = (entry.get('escola'), str(entry.get('siape')))
+                actions.setdefault(key, set()).add(entry.get('action'))
+        
+        if not actions:
+            return
+        
+        for teacher in self.iter_teachers(school, include_deleted=True):
+            key = (teacher.get('escola'), str(teacher.get('siape')))
+            teacher_actions = actions.pop(key, None)
+            if teacher_actions is None:
+                continue
+            
+            if teacher.get('status') == 'Excluído':
+                change = 'DELETE'
+            elif 'CREATE' in teacher_actions:
+                change = 'CREATE'
+            else:
+                change = 'UPDATE'
+            yield dict(teacher, alteracao=change)
+        
+        for school_name, siape in actions:
+            yield {'siape': siape, 'escola': school_name, 'alteracao': 'DELETE'}
+    
     def search_teachers(self, school, search_term, filters=None):
         """Busca professores com filtros"""
         try:
@@ -245,19 +309,12 @@ class TeacherManager:
             logging.error(f"Erro ao verificar existência do professor: {e}")
             return False
     
-    def identify_changes(self, old_data, new_data):
+    @staticmethod
+    def identify_changes(old_data, new_data):
         """Identifica alterações entre dados antigos e novos"""
         changes = {}
         
-        # Campos que devem ser monitorados
-        monitored_fields = [
-            'nome', 'data_nascimento', 'sexo', 'estado', 'email', 'telefone',
-            'carga_horaria', 'carreira', 'data_ingresso', 'status',
-            'area_atuacao', 'pos_graduacao', 'graduacao', 'instituicao_graduacao',
-            'curso_pos', 'instituicao_pos'
-        ]
-        
-        for field in monitored_fields:
+        for field in MONITORED_FIELDS:
             old_value = old_data.get(field)
             new_value = new_data.get(field)
             
@@ -311,39 +368,31 @@ class TeacherManager:
             return {}
     
     def validate_teacher_consistency(self, school):
-        """Valida consistência dos dados dos professores"""
+        """Valida consistência dos dados dos professores
+        
+        Os registros são verificados em lote com as regras compiladas do
+        ValidatorManager (check_consistency_batch); só os alterados desde a
+        última verificação são revalidados (ValidationCache).
+        """
         try:
-            teachers = self.get_teachers_by_school(school, include_deleted=True)
-            issues = []
+            teachers = list(self.data_manager.iter_teachers(school))
+            keys = [f"{teacher.get('escola')}_{teacher.get('siape', '')}" for teacher in teachers]
             
-            for teacher in teachers:
-                teacher_issues = []
-                
-                # Valida dados obrigatórios
-                required_fields = ['siape', 'nome', 'data_nascimento', 'estado', 'email', 'telefone', 'carga_horaria', 'carreira']
-                for field in required_fields:
-                    if not teacher.get(field):
-                        teacher_issues.append(f"Campo obrigatório ausente: {field}")
-                
-                # Valida SIAPE
-                siape = teacher.get('siape', '')
-                if not self.validator.validate_siape(siape):
-                    teacher_issues.append("SIAPE inválido")
-                
-                # CPF removido por questões de segurança e privacidade
-                
-                # Valida datas
-                data_nasc = teacher.get('data_nascimento', '')
-                if data_nasc and not self.validator.validate_date(data_nasc):
-                    teacher_issues.append("Data de nascimento inválida")
-                
-                data_ing = teacher.get('data_ingresso', '')
-                if data_ing and not self.validator.validate_date(data_ing):
-                    teacher_issues.append("Data de ingresso inválida")
-                
+            cache = ValidationCache('consistencia', consistency_context())
+            cached = cache.load_entries([school])[school]
+            results, entries, revalidated = validate_with_cache(
+                teachers, keys, cached, CONSISTENCY_FIELDS, self.validator.check_consistency_batch
+            )
+            
+            # Grava só se algo mudou (registros revalidados ou removidos)
+            if revalidated or len(entries) != len(cached):
+                cache.save_entries({school: entries})
+            
+            issues = []
+            for teacher, teacher_issues in zip(teachers, results):
                 if teacher_issues:
                     issues.append({
-                        'siape': siape,
+                        'siape': teacher.get('siape', ''),
                         'nome': teacher.get('nome', 'N/A'),
                         'issues': teacher_issues
                     })
@@ -355,12 +404,26 @@ class TeacherManager:
             return []
     
     def fix_data_issues(self, school, user):
-        """Corrige problemas nos dados automaticamente"""
+        """Corrige problemas nos dados automaticamente
+        
+        Registros cujos campos verificados não mudaram desde a última
+        correção (mesmo hash no ValidationCache) não são verificados de novo.
+        """
         try:
             teachers = self.get_teachers_by_school(school, include_deleted=True)
             fixed_count = 0
             
+            cache = ValidationCache('correcoes')
+            cached = cache.load_entries([school])[school]
+            entries = {}
+            
             for teacher in teachers:
+                key = f"{teacher.get('escola')}_{teacher.get('siape', '')}"
+                content_hash = record_hash(teacher, FIX_FIELDS)
+                if cached.get(key, (None,))[0] == content_hash:
+                    entries[key] = cached[key]
+                    continue
+                
                 needs_update = False
                 
                 # Corrige nome em maiúscula
@@ -386,6 +449,11 @@ class TeacherManager:
                     
                     self.data_manager.update_teacher(teacher)
                     fixed_count += 1
+                
+                entries[key] = [record_hash(teacher, FIX_FIELDS), True]
+            
+            if entries != cached:
+                cache.save_entries({school: entries})
             
             logging.info(f"Correção automática concluída: {fixed_count} registros corrigidos")
             return fixed_count
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de Resultados de Validação - Sistema DIRENS
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Callable, Sequence, Tuple
+
+from core.validators import RULES_VERSION
+
+# Fora de data/: o cache é derivado dos dados e não entra nos backups
+VALIDATION_CACHE_FILE = os.path.join("cache", "validation_cache.json")
+
+# Local usado por versões anteriores (removido na primeira gravação)
+LEGACY_CACHE_FILE = os.path.join("data", "validation_cache.json")
+
+
+def record_hash(record: Dict[str, Any], fields: Sequence[str]) -> str:
+    """Hash do conteúdo dos campos lidos pelas regras (repr distingue None, '' e números)"""
+    content = "\x1f".join([repr(record.get(field)) for field in fields])
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def validate_with_cache(records: List[Dict[str, Any]], keys: Sequence[str], entries: Dict[str, Any],
+                        fields: Sequence[str], validate: Callable) -> Tuple[List[Any], Dict[str, Any], int]:
+    """Aplica validate (função em lote) só aos registros alterados
+    
+    entries é {chave: [hash, resultado]} da última validação. Retorna
+    (resultados na ordem de records, novas entries, registros
+    revalidados); as novas entries contêm apenas as chaves atuais.
+    """
+    hashes = [record_hash(record, fields) for record in records]
+    stale = [
+        position for position, (key, content_hash) in enumerate(zip(keys, hashes))
+        if entries.get(key, (None,))[0] != content_hash
+    ]
+    fresh = dict(zip(stale, validate([records[position] for position in stale]))) if stale else {}
+    
+    results = []
+    current = {}
+    for position, (key, content_hash) in enumerate(zip(keys, hashes)):
+        result = fresh[position] if position in fresh else entries[key][1]
+        current[key] = [content_hash, result]
+        results.append(result)
+    
+    return results, current, len(stale)
+
+
+class ValidationCache:
+    """Último resultado da validação de cada professor, por escola
+    
+    Cada seção (ex.: 'consistencia') guarda, por escola, {chave: [hash,
+    resultado]}. A seção é descartada quando a versão das regras
+    (RULES_VERSION) ou o contexto informado (ex.: o ano usado nas datas)
+    mudam (ex.: consistency_context()).
+    """
+    
+    # Validações podem rodar em threads de tarefas: o arquivo é protegido por um lock único
+    _lock = threading.Lock()
+    
+    def __init__(self, section: str, context: str = "", cache_file: str = VALIDATION_CACHE_FILE):
+        """Inicializa o cache da seção"""
+        self.section = section
+        self.context = context
+        self.cache_file = cache_file
+    
+    def load(self) -> Dict[str, Any]:
+        """Carrega o arquivo do cache (vazio se as regras mudaram)"""
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('rules_version') == RULES_VERSION:
+                    return data
+        except Exception as e:
+            logging.error(f"Erro ao carregar cache de validação: {e}")
+        return {'rules_version': RULES_VERSION, 'sections': {}}
+    
+    def load_entries(self, schools: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Entradas guardadas de cada escola ({} se ainda não validada ou contexto mudou)"""
+        with self._lock:
+            section = self.load()['sections'].get(self.section, {})
+        
+        if section.get('context') != self.context:
+            return {school: {} for school in schools}
+        return {school: section.get('schools', {}).get(school, {}) for school in schools}
+    
+    def save_entries(self, school_entries: Dict[str, Dict[str, Any]]) -> None:
+        """Substitui as entradas das escolas informadas"""
+        try:
+            with self._lock:
+                data = self.load()
+                section = data['sections'].get(self.section, {})
+                if section.get('context') != self.context:
+                    section = {'context': self.context, 'schools': {}}
+                
+                section['schools'].update(school_entries)
+                data['sections'][self.section] = section
+                
+                directory = os.path.dirname(self.cache_file)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory)
+                
+                temp_file = self.cache_file + ".tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(temp_file, self.cache_file)
+                
+                if os.path.exists(LEGACY_CACHE_FILE):
+                    os.remove(LEGACY_CACHE_FILE)
+        except Exception as e:
+            logging.error(f"Erro ao salvar cache de validação: {e}")
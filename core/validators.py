@@ -6,9 +6,297 @@ Módulo de Validadores - Sistema DIRENS
 import re
 import unicodedata
 from datetime import datetime
+from functools import lru_cache
+from itertools import compress
 import logging
 
-from recursos.constants import CARGAS_HORARIAS, CARREIRAS, POS_GRADUACAO
+from recursos.constants import (
+    CARGAS_HORARIAS, CARREIRAS, POS_GRADUACAO, DDDS_BRASIL_SET, REGEX_PATTERNS, VALIDATION_RULES
+)
+
+# Padrões de recursos.constants compilados uma única vez
+COMPILED_PATTERNS = {name: re.compile(pattern) for name, pattern in REGEX_PATTERNS.items()}
+
+NON_DIGIT_PATTERN = re.compile(r'\D')
+
+# Campos obrigatórios do cadastro
+REQUIRED_FIELDS = (
+    'siape', 'nome', 'data_nascimento', 'sexo',
+    'email', 'telefone_celular', 'carga_horaria', 'carreira', 'data_ingresso', 'pos_graduacao'
+)
+
+# Campos exigidos pela verificação de consistência dos dados gravados
+CONSISTENCY_REQUIRED_FIELDS = (
+    'siape', 'nome', 'data_nascimento', 'estado', 'email', 'telefone', 'carga_horaria', 'carreira'
+)
+
+# Campos lidos pela verificação de consistência (conteúdo do hash no cache de validação)
+CONSISTENCY_FIELDS = CONSISTENCY_REQUIRED_FIELDS + ('data_ingresso',)
+
+# Versão das regras: altere sempre que uma regra mudar, para descartar os
+# resultados guardados no cache de validação
+RULES_VERSION = "1"
+
+
+@lru_cache(maxsize=8192)
+def parse_date_text(value, max_year):
+    """Converte DD-MM-AAAA em datetime (cacheado: datas se repetem muito)"""
+    if not COMPILED_PATTERNS['data'].match(value):
+        return None
+    
+    try:
+        parsed = datetime(int(value[6:]), int(value[3:5]), int(value[:2]))
+    except ValueError:
+        return None
+    
+    if parsed.year < 1900 or parsed.year > max_year:
+        return None
+    
+    return parsed
+
+
+def parse_date(value, now=None):
+    """Converte DD-MM-AAAA em datetime (None se inválida ou fora de 1900 a ano seguinte)"""
+    if not value:
+        return None
+    return parse_date_text(str(value), (now or datetime.now()).year + 1)
+
+
+def consistency_context(now=None):
+    """Contexto do cache de validação para as regras de consistência
+    
+    As regras leem a data atual (idade mínima e máxima, ingresso futuro e
+    ano máximo das datas): o resultado guardado vale só para o dia.
+    """
+    return (now or datetime.now()).date().isoformat()
+
+
+def as_text(value):
+    """Valor de um campo como texto sem espaços nas pontas"""
+    return str(value).strip() if value is not None else ''
+
+
+@lru_cache(maxsize=1)
+def get_teacher_rules():
+    """Regras do cadastro: tupla ordenada de (campo, campos lidos, verificação)
+    
+    Cada verificação recebe o momento da validação e os valores dos campos
+    lidos, e retorna a mensagem de erro ou None. Padrões, listas fechadas
+    e limites vêm de recursos.constants e são preparados uma única vez.
+    """
+    siape_pattern = COMPILED_PATTERNS['siape']
+    email_name_pattern = COMPILED_PATTERNS['email_fab_nome']
+    mobile_pattern = COMPILED_PATTERNS['telefone_celular']
+    landline_pattern = COMPILED_PATTERNS['telefone_fixo']
+    cargas = frozenset(CARGAS_HORARIAS)
+    carreiras = frozenset(CARREIRAS)
+    pos_graduacoes = frozenset(POS_GRADUACAO)
+    
+    birth_rules = VALIDATION_RULES['data_nascimento']
+    min_age = birth_rules['min_age']
+    max_age = birth_rules['max_age']
+    name_rules = VALIDATION_RULES['nome']
+    
+    def check_siape(now, siape):
+        siape = as_text(siape)
+        if len(siape) == 7 and siape.isascii() and siape.isdigit():
+            return None
+        if not siape_pattern.match(NON_DIGIT_PATTERN.sub('', siape)):
+            return "SIAPE deve ter exatamente 7 dígitos numéricos"
+    
+    def check_date_format(message):
+        def check(now, value):
+            if parse_date(as_text(value), now) is None:
+                return message
+        return check
+    
+    def check_email(now, email):
+        email = as_text(email)
+        if not email:
+            return "Email institucional é obrigatório"
+        if not email.endswith('@fab.mil.br'):
+            return "Email deve ser do domínio @fab.mil.br"
+        if not email_name_pattern.match(email.replace('@fab.mil.br', '').strip()):
+            return "Nome do email deve conter apenas letras, números e pontos"
+    
+    def check_phone(pattern, required, format_message, ddd_message):
+        def check(now, phone):
+            phone = as_text(phone)
+            if not phone:
+                return "Telefone celular é obrigatório" if required else None
+            if not pattern.match(phone):
+                return format_message
+            if phone[:2] not in DDDS_BRASIL_SET:
+                return ddd_message
+        return check
+    
+    def check_allowed(allowed, label):
+        def check(now, value):
+            if value and value not in allowed:
+                return f"{label} inválida: {value}"
+        return check
+    
+    def check_sexo(now, sexo):
+        if sexo and sexo not in ('M', 'F'):
+            return "Sexo deve ser 'M' ou 'F'"
+    
+    def check_age(now, nascimento):
+        birth_date = parse_date(as_text(nascimento), now)
+        if birth_date is None:
+            return None
+        
+        age = (now - birth_date).days / 365.25
+        if age < min_age:
+            return f"Professor deve ter pelo menos {min_age} anos"
+        if age > max_age:
+            return "Verifique a data de nascimento (idade muito alta)"
+    
+    def check_ingresso_future(now, ingresso):
+        ingresso_date = parse_date(as_text(ingresso), now)
+        if ingresso_date is not None and ingresso_date > now:
+            return "Data de ingresso não pode ser futura"
+    
+    def check_ingresso_age(now, ingresso, nascimento):
+        ingresso_date = parse_date(as_text(ingresso), now)
+        birth_date = parse_date(as_text(nascimento), now)
+        if ingresso_date is None or birth_date is None:
+            return None
+        
+        try:
+            min_ingresso = birth_date.replace(year=birth_date.year + min_age)
+        except ValueError:
+            # 29 de fevereiro sem correspondente no ano
+            return None
+        
+        if ingresso_date < min_ingresso:
+            return f"Data de ingresso deve ser posterior aos {min_age} anos"
+    
+    def check_nome(now, nome):
+        nome = as_text(nome)
+        if len(nome) < name_rules['min_length']:
+            return f"Nome deve ter pelo menos {name_rules['min_length']} caracteres"
+        if len(nome) > name_rules['max_length']:
+            return f"Nome muito longo (máximo {name_rules['max_length']} caracteres)"
+    
+    return (
+        ('siape', ('siape',), check_siape),
+        ('data_nascimento', ('data_nascimento',),
+         check_date_format("Data de nascimento inválida (formato: DD-MM-AAAA)")),
+        ('data_ingresso', ('data_ingresso',), check_date_format("Data de ingresso inválida (formato: DD-MM-AAAA)")),
+        ('email', ('email',), check_email),
+        ('telefone_celular', ('telefone_celular',),
+         check_phone(mobile_pattern, True, "Telefone celular deve estar no formato dd-9-xxxx-xxxx", "DDD inválido")),
+        ('telefone_fixo', ('telefone_fixo',),
+         check_phone(landline_pattern, False, "Telefone fixo deve estar no formato dd-xxxx-xxxx",
+                     "DDD do telefone fixo inválido")),
+        ('carga_horaria', ('carga_horaria',), check_allowed(cargas, "Carga horária")),
+        ('carreira', ('carreira',), check_allowed(carreiras, "Carreira")),
+        ('pos_graduacao', ('pos_graduacao',), check_allowed(pos_graduacoes, "Pós-graduação")),
+        ('sexo', ('sexo',), check_sexo),
+        ('data_nascimento', ('data_nascimento',), check_age),
+        ('data_ingresso', ('data_ingresso',), check_ingresso_future),
+        ('data_ingresso', ('data_ingresso', 'data_nascimento'), check_ingresso_age),
+        ('nome', ('nome',), check_nome)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_consistency_rules():
+    """Regras da verificação de consistência dos dados já gravados"""
+    siape_pattern = COMPILED_PATTERNS['siape']
+    
+    def check_siape(now, siape):
+        if not siape or not siape_pattern.match(NON_DIGIT_PATTERN.sub('', str(siape))):
+            return "SIAPE inválido"
+    
+    def check_optional_date(message):
+        def check(now, value):
+            if value and parse_date(value, now) is None:
+                return message
+        return check
+    
+    return (
+        ('siape', ('siape',), check_siape),
+        ('data_nascimento', ('data_nascimento',), check_optional_date("Data de nascimento inválida")),
+        ('data_ingresso', ('data_ingresso',), check_optional_date("Data de ingresso inválida"))
+    )
+
+
+def missing_fields(record, fields):
+    """Campos vazios ou ausentes do registro"""
+    return [field for field in fields if not record.get(field) or str(record.get(field)).strip() == '']
+
+
+def run_rules(record, rules, now):
+    """Aplica as regras a um registro; retorna [(campo, mensagem)] na ordem das regras"""
+    errors = []
+    
+    for field, inputs, check in rules:
+        message = check(now, *[record.get(name) for name in inputs])
+        if message:
+            errors.append((field, message))
+    
+    return errors
+
+
+def get_column(records, name, columns):
+    """Valores de um campo em todos os registros (cacheado em columns)"""
+    if name not in columns:
+        columns[name] = [record.get(name) for record in records]
+    return columns[name]
+
+
+def blank_flags(values, strip=True):
+    """Indica, para cada valor, se o campo está vazio"""
+    if strip:
+        return [not value or not str(value).strip() for value in values]
+    return [not value for value in values]
+
+
+def run_rules_batch(records, rules, now, columns=None):
+    """Aplica as regras coluna a coluna a vários registros
+    
+    Colunas com muitos valores repetidos (datas, cargas, DDDs, campos
+    vazios) são avaliadas uma única vez por valor distinto. Retorna
+    [(campo, mensagem)] de cada registro, na ordem das regras.
+    """
+    columns = {} if columns is None else columns
+    results = [[] for _ in records]
+    positions = range(len(records))
+    
+    for field, inputs, check in rules:
+        if len(inputs) == 1:
+            values = get_column(records, inputs[0], columns)
+            evaluate = check
+        else:
+            values = list(zip(*[get_column(records, name, columns) for name in inputs]))
+            evaluate = lambda now, value, check=check: check(now, *value)
+        
+        try:
+            distinct = set(values)
+        except TypeError:
+            # Valor não hasheável (lista, dicionário): avalia registro a registro
+            distinct = None
+        
+        if distinct is not None and len(distinct) * 2 <= len(values):
+            verdicts = {value: evaluate(now, value) for value in distinct}
+            messages = [verdicts[value] for value in values]
+        else:
+            messages = [evaluate(now, value) for value in values]
+        
+        for position in compress(positions, messages):
+            results[position].append((field, messages[position]))
+    
+    return results
+
+
+def group_by_field(errors):
+    """[(campo, mensagem)] -> {campo: [mensagens]}"""
+    field_errors = {}
+    for field, message in errors:
+        field_errors.setdefault(field, []).append(message)
+    return field_errors
+
 
 class ValidatorManager:
     """Gerenciador de validações"""
@@ -63,37 +351,15 @@ class ValidatorManager:
     
     def validate_date(self, date_str):
         """Valida data no formato DD-MM-AAAA"""
-        if not date_str:
-            return False
-        
-        # Verifica formato
-        if not self.date_pattern.match(str(date_str)):
-            return False
-        
-        try:
-            # Tenta converter para data válida
-            day, month, year = map(int, date_str.split('-'))
-            datetime(year, month, day)
-            
-            # Verifica se a data não é muito antiga ou futura
-            current_year = datetime.now().year
-            if year < 1900 or year > current_year + 1:
-                return False
-            
-            return True
-            
-        except ValueError:
-            return False
+        # Formato, data existente e ano entre 1900 e o ano seguinte
+        return parse_date(date_str) is not None
     
     def validate_email(self, email):
         """Valida formato de email"""
         if not email:
             return True  # Email é opcional
         
-        email_pattern = re.compile(
-            r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        )
-        return email_pattern.match(email.strip()) is not None
+        return COMPILED_PATTERNS['email'].match(email.strip()) is not None
     
     def validate_phone(self, phone):
         """Valida telefone brasileiro"""
@@ -108,19 +374,7 @@ class ValidatorManager:
     
     def validate_required_fields(self, data):
         """Valida campos obrigatórios"""
-        required_fields = [
-            'siape', 'nome', 'data_nascimento', 'sexo',
-            'email', 'telefone_celular', 'carga_horaria', 'carreira', 'data_ingresso', 'pos_graduacao'
-        ]
-        
-        missing_fields = []
-        
-        for field in required_fields:
-            value = data.get(field)
-            if not value or str(value).strip() == '':
-                missing_fields.append(field)
-        
-        return missing_fields
+        return missing_fields(data, REQUIRED_FIELDS)
     
     def validate_restricted_values(self, data):
         """Valida valores restritos (listas fechadas)"""
@@ -200,9 +454,7 @@ class ValidatorManager:
             return False
         
         # Permite apenas letras, números e pontos
-        import re
-        pattern = r'^[a-zA-Z0-9\.]+$'
-        return re.match(pattern, email_nome.strip()) is not None
+        return COMPILED_PATTERNS['email_fab_nome'].match(email_nome.strip()) is not None
     
     def validate_numero_telefone(self, numero):
         """Valida número de telefone no formato xxxx-xxxx"""
@@ -210,108 +462,89 @@ class ValidatorManager:
             return False
         
         # Remove espaços e verifica formato
-        numero_clean = numero.strip()
-        pattern = r'^\d{4}-\d{4}$'
-        return re.match(pattern, numero_clean) is not None
+        return COMPILED_PATTERNS['numero_telefone'].match(numero.strip()) is not None
+    
+    def check_teacher_record(self, data, now=None):
+        """Erros de um registro como [(campo, mensagem)]
+        
+        Campos obrigatórios ausentes interrompem a validação, como no
+        formulário.
+        """
+        missing = missing_fields(data, REQUIRED_FIELDS)
+        if missing:
+            return [(field, f"Campo obrigatório: {field}") for field in missing]
+        
+        return run_rules(data, get_teacher_rules(), now or datetime.now())
     
     def validate_teacher_data(self, data):
-        """Validação completa dos dados do professor"""
-        all_errors = []
+        """Validação completa dos dados do professor
         
+        Retorna valid, errors (mensagens) e field_errors ({campo: mensagens}).
+        """
         try:
-            # Campos obrigatórios
-            missing_fields = self.validate_required_fields(data)
-            if missing_fields:
-                all_errors.extend([f"Campo obrigatório: {field}" for field in missing_fields])
-            
-            # Se há campos obrigatórios faltando, não continua
-            if missing_fields:
-                return {'valid': False, 'errors': all_errors}
-            
-            # Validações específicas
-            siape = data.get('siape', '').strip()
-            if not self.validate_siape(siape):
-                all_errors.append("SIAPE deve ter exatamente 7 dígitos numéricos")
-            
-            # CPF removido por questões de segurança e privacidade
-            
-            data_nasc = data.get('data_nascimento', '').strip()
-            if not self.validate_date(data_nasc):
-                all_errors.append("Data de nascimento inválida (formato: DD-MM-AAAA)")
-            
-            data_ing = data.get('data_ingresso', '').strip()
-            if not self.validate_date(data_ing):
-                all_errors.append("Data de ingresso inválida (formato: DD-MM-AAAA)")
-            
-            # Validações de email institucional (obrigatório)
-            email = data.get('email', '').strip()
-            if email:
-                if not email.endswith('@fab.mil.br'):
-                    all_errors.append("Email deve ser do domínio @fab.mil.br")
-                else:
-                    email_nome = email.replace('@fab.mil.br', '')
-                    if not self.validate_fab_email(email_nome):
-                        all_errors.append("Nome do email deve conter apenas letras, números e pontos")
-            else:
-                all_errors.append("Email institucional é obrigatório")
-            
-            # Validações de telefone celular (obrigatório)
-            telefone_celular = data.get('telefone_celular', '').strip()
-            if telefone_celular:
-                from recursos.constants import DDDS_BRASIL
-                # Verifica formato DDD-9-xxxx-xxxx
-                pattern = r'^\d{2}-9-\d{4}-\d{4}$'
-                if not re.match(pattern, telefone_celular):
-                    all_errors.append("Telefone celular deve estar no formato dd-9-xxxx-xxxx")
-                else:
-                    ddd = telefone_celular.split('-')[0]
-                    if ddd not in DDDS_BRASIL:
-                        all_errors.append("DDD inválido")
-            else:
-                all_errors.append("Telefone celular é obrigatório")
-            
-            # Validação de telefone fixo (opcional)
-            telefone_fixo = data.get('telefone_fixo', '').strip()
-            if telefone_fixo:
-                from recursos.constants import DDDS_BRASIL
-                # Verifica formato DDD-xxxx-xxxx
-                pattern = r'^\d{2}-\d{4}-\d{4}$'
-                if not re.match(pattern, telefone_fixo):
-                    all_errors.append("Telefone fixo deve estar no formato dd-xxxx-xxxx")
-                else:
-                    ddd = telefone_fixo.split('-')[0]
-                    if ddd not in DDDS_BRASIL:
-                        all_errors.append("DDD do telefone fixo inválido")
-            
-            # Valores restritos
-            restricted_errors = self.validate_restricted_values(data)
-            all_errors.extend(restricted_errors)
-            
-            # Regras de negócio
-            business_errors = self.validate_business_rules(data)
-            all_errors.extend(business_errors)
-            
-            # Validações de tamanho
-            nome = data.get('nome', '').strip()
-            if len(nome) < 2:
-                all_errors.append("Nome deve ter pelo menos 2 caracteres")
-            elif len(nome) > 100:
-                all_errors.append("Nome muito longo (máximo 100 caracteres)")
-            
-            # SEM VALIDAÇÃO DE CARACTERES - aceita qualquer coisa no nome
+            errors = self.check_teacher_record(data)
             
             return {
-                'valid': len(all_errors) == 0,
-                'errors': all_errors
+                'valid': len(errors) == 0,
+                'errors': [message for field, message in errors],
+                'field_errors': group_by_field(errors)
             }
             
         except Exception as e:
             logging.error(f"Erro na validação: {e}")
             return {
                 'valid': False,
-                'errors': ['Erro interno na validação dos dados']
+                'errors': ['Erro interno na validação dos dados'],
+                'field_errors': {}
             }
     
+    def validate_batch(self, records):
+        """Valida vários registros com as regras já compiladas
+        
+        Retorna, na mesma ordem, {campo: [mensagens]} de cada registro
+        ({} quando válido). Registros com campos obrigatórios ausentes
+        recebem só esses erros, como em validate_teacher_data.
+        """
+        records = list(records)
+        columns = {}
+        missing = [[] for _ in records]
+        positions = range(len(records))
+        
+        for field in REQUIRED_FIELDS:
+            for position in compress(positions, blank_flags(get_column(records, field, columns))):
+                missing[position].append(field)
+        
+        complete = [position for position in positions if not missing[position]]
+        if len(complete) == len(records):
+            checked = run_rules_batch(records, get_teacher_rules(), datetime.now(), columns)
+        else:
+            checked = run_rules_batch([records[position] for position in complete],
+                                      get_teacher_rules(), datetime.now())
+        
+        results = [{field: [f"Campo obrigatório: {field}"] for field in fields} for fields in missing]
+        for position, errors in zip(complete, checked):
+            results[position] = group_by_field(errors)
+        
+        return results
+    
+    def check_consistency_batch(self, records):
+        """Problemas de consistência de cada registro gravado (lista de mensagens)"""
+        records = list(records)
+        columns = {}
+        issues = [[] for _ in records]
+        positions = range(len(records))
+        
+        for field in CONSISTENCY_REQUIRED_FIELDS:
+            message = f"Campo obrigatório ausente: {field}"
+            for position in compress(positions, blank_flags(get_column(records, field, columns), strip=False)):
+                issues[position].append(message)
+        
+        checked = run_rules_batch(records, get_consistency_rules(), datetime.now(), columns)
+        for record_issues, errors in zip(issues, checked):
+            record_issues.extend(message for field, message in errors)
+        
+        return issues
+    
     def sanitize_teacher_data(self, data):
         """Limpa e padroniza dados do professor"""
         cleaned_data = data.copy()
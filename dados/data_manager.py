@@ -60,19 +60,29 @@ class DataManager:
             lock_file = filepath + ".lock"
             
             with FileLock(lock_file, timeout=10):
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+                self.write_json_atomic(filepath, data)
                     
         except Exception as e:
             if "FileLock" in str(type(e)):
                 # Fallback sem FileLock se não estiver disponível
                 with self.lock:
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+                    self.write_json_atomic(filepath, data)
             else:
                 logging.error(f"Erro ao salvar JSON {filepath}: {e}")
                 raise
     
+    def write_json_atomic(self, filepath, data):
+        """Grava o JSON em arquivo temporário e substitui o original
+        
+        O arquivo nunca fica parcialmente escrito, e cópias por hard link
+        (snapshots de backup) continuam apontando para a versão anterior.
+        """
+        temp_file = filepath + ".tmp"
+        
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(temp_file, filepath)
+    
     def load_json(self, filepath):
         """Carrega dados de JSON com lock"""
         try:
@@ -132,6 +142,38 @@ class DataManager:
             logging.error(f"Erro ao salvar professor: {e}")
             return False
     
+    def save_teachers(self, teachers_data):
+        """Salva vários professores com uma única gravação do arquivo"""
+        try:
+            # Carrega dados atuais
+            data = self.load_json(self.teachers_file)
+            
+            if "teachers" not in data:
+                data["teachers"] = {}
+            
+            for teacher_data in teachers_data:
+                school = teacher_data.get('escola', '')
+                siape = teacher_data.get('siape', '')
+                
+                if not school or not siape:
+                    logging.error("Escola e SIAPE são obrigatórios")
+                    return False
+                
+                data["teachers"].setdefault(school, {})[siape] = teacher_data
+            
+            # Atualiza metadados
+            data.setdefault("metadata", {})["last_updated"] = datetime.now().isoformat()
+            
+            # Salva arquivo
+            self.save_json(self.teachers_file, data)
+            
+            logging.info(f"{len(teachers_data)} professores salvos")
+            return True
+            
+        except Exception as e:
+            logging.error(f"Erro ao salvar professores: {e}")
+            return False
+    
     def get_teacher_by_siape(self, siape, school):
         """Busca professor por SIAPE e escola"""
         try:
@@ -186,6 +228,30 @@ class DataManager:
             logging.error(f"Erro ao listar todos os professores: {e}")
             return []
     
+    def iter_teachers(self, school=None):
+        """Percorre os professores (de uma escola ou de todas) sem montar listas
+        
+        Cada registro é entregue com o campo 'escola' preenchido. Erros de
+        leitura são propagados: uma exportação não pode terminar "com
+        sucesso" e vazia por causa de um arquivo ilegível.
+        """
+        if not os.path.exists(self.teachers_file):
+            return
+        
+        with FileLock(self.teachers_file + ".lock", timeout=10):
+            with open(self.teachers_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        
+        teachers_data = data.get("teachers", {})
+        schools = [school] if school else list(teachers_data)
+        
+        for teacher_school in schools:
+            for teacher in teachers_data.get(teacher_school, {}).values():
+                if teacher.get('escola') == teacher_school:
+                    yield teacher
+                else:
+                    yield dict(teacher, escola=teacher_school)
+    
     def update_teacher(self, teacher_data):
         """Atualiza dados de um professor"""
         try:
@@ -406,6 +472,18 @@ class DataManager:
             logging.error(f"Erro ao gerar estatísticas: {e}")
             return {}
     
+    def get_data_version(self):
+        """Versão dos dados de professores (tamanho e mtime do arquivo)
+        
+        Muda a cada gravação; serve para invalidar resultados derivados,
+        como as exportações em cache.
+        """
+        try:
+            stat = os.stat(self.teachers_file)
+            return f"{stat.st_size}-{stat.st_mtime_ns}"
+        except OSError:
+            return None
+    
     def get_last_update_time(self):
         """Retorna último tempo de atualização"""
         try:
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Documentos com Diário de Alterações - Sistema DIRENS
+"""
+
+import json
+import os
+import logging
+from typing import List, Dict, Any, Callable
+
+# Quantidade de registros no diário antes de consolidar o documento
+JOURNAL_COMPACT_THRESHOLD = 500
+
+
+class JournaledDocument:
+    """Documento JSON cujas alterações são acrescentadas a um diário
+    
+    Cada alteração custa uma linha em <arquivo>_journal.jsonl e o documento
+    consolidado só é regravado a cada JOURNAL_COMPACT_THRESHOLD registros.
+    Os registros são numerados (seq) e o consolidado guarda o último
+    incorporado em metadata.journal_seq: uma compactação interrompida antes
+    de limpar o diário não aplica nenhum registro duas vezes.
+    """
+    
+    def __init__(self, filepath: str, apply_record: Callable[[Dict[str, Any], Dict[str, Any]], None], lock):
+        """Inicializa o documento (lock protege o diário entre processos)"""
+        self.filepath = filepath
+        self.journal_file = os.path.splitext(filepath)[0] + "_journal.jsonl"
+        self.apply_record = apply_record
+        self.lock = lock
+    
+    def exists(self) -> bool:
+        """Verifica se o documento consolidado já foi gerado"""
+        return os.path.exists(self.filepath)
+    
+    def _read_document(self) -> Dict[str, Any]:
+        """Lê o documento consolidado ({} se ausente ou corrompido)"""
+        try:
+            if not os.path.exists(self.filepath):
+                return {}
+            
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"Erro ao carregar JSON {self.filepath}: {e}")
+            return {}
+    
+    def _read_journal(self) -> List[Dict[str, Any]]:
+        """Lê os registros do diário (linhas incompletas são ignoradas)"""
+        records = []
+        
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        logging.warning(f"Registro inválido ignorado no diário {self.journal_file}")
+        
+        return records
+    
+    def _last_seq(self, journal: List[Dict[str, Any]]) -> int:
+        """Número do último registro gravado"""
+        if journal:
+            return journal[-1].get("seq", 0)
+        return self._read_document().get("metadata", {}).get("journal_seq", 0)
+    
+    def load(self) -> Dict[str, Any]:
+        """Documento consolidado com os registros pendentes aplicados ({} se ausente)"""
+        document = self._read_document()
+        if not document:
+            return {}
+        
+        base_seq = document.get("metadata", {}).get("journal_seq", 0)
+        for record in self._read_journal():
+            if record.get("op") != "base" and record.get("seq", 0) > base_seq:
+                self.apply_record(document, record)
+        
+        return document
+    
+    def append(self, records: List[Dict[str, Any]]) -> None:
+        """Acrescenta registros ao diário, consolidando ao atingir o limite"""
+        if not records:
+            return
+        
+        with self.lock:
+            journal = self._read_journal()
+            seq = self._last_seq(journal)
+            
+            lines = []
+            for record in records:
+                seq += 1
+                lines.append(json.dumps(dict(record, seq=seq), ensure_ascii=False, default=str))
+            
+            # Gravação interrompida deixa a última linha sem quebra
+            prefix = ""
+            if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > 0:
+                with open(self.journal_file, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        prefix = "\n"
+            
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(prefix + "\n".join(lines) + "\n")
+            
+            pending = sum(1 for record in journal if record.get("op") != "base") + len(records)
+            if pending >= JOURNAL_COMPACT_THRESHOLD:
+                self.compact()
+    
+    def compact(self) -> None:
+        """Incorpora o diário ao documento consolidado"""
+        with self.lock:
+            document = self.load()
+            if document:
+                self.write(document)
+    
+    def write(self, document: Dict[str, Any]) -> None:
+        """Grava o documento consolidado e reinicia o diário"""
+        with self.lock:
+            seq = self._last_seq(self._read_journal())
+            document.setdefault("metadata", {})["journal_seq"] = seq
+            
+            temp_file = self.filepath + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, ensure_ascii=False, default=str)
+            os.replace(temp_file, self.filepath)
+            
+            # O diário recomeça com um marcador do último registro incorporado
+            temp_file = self.journal_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({"op": "base", "seq": seq}) + "\n")
+            os.replace(temp_file, self.journal_file)
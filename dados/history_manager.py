@@ -5,10 +5,119 @@ Gerenciador de Histórico - Sistema DIRENS
 
 import json
 import os
+import gzip
+import lzma
 import logging
 from datetime import datetime, timedelta
 import threading
-from typing import List, Dict, Any, Optional
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import chain, islice
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from filelock import FileLock
+
+from dados.history_journal import JournaledDocument
+from dados.history_search import HistorySearchIndex, entry_identity
+
+# Codecs suportados nos segmentos arquivados (extensão, função de abertura)
+ARCHIVE_CODECS = {
+    'gzip': ('.json.gz', gzip.open),
+    'lzma': ('.json.xz', lzma.open)
+}
+
+# Campos das entradas usados pelos agregados (gravados no diário dos agregados)
+ROLLUP_FIELDS = ('escola', 'siape', 'action', 'user', 'timestamp')
+
+# Arquivos de controle do diretório de histórico (não são históricos de professores)
+HISTORY_METADATA_FILES = {
+    'history_index.json',
+    'history_rollups.json',
+    'history_search_index.json'
+}
+
+
+def inspect_history_file(history_file: str) -> Dict[str, Any]:
+    """Lê um arquivo de histórico e verifica sua estrutura
+    
+    Função de módulo para poder ser executada em processos paralelos.
+    Retorna o cabeçalho do arquivo, a contagem de entradas e os problemas
+    encontrados (campos obrigatórios, ordem dos timestamps e identificação).
+    """
+    result = {
+        'history_file': history_file,
+        'siape': None,
+        'escola': None,
+        'entries': 0,
+        'last_updated': None,
+        'issues': []
+    }
+    
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            history_data = json.load(f)
+    except Exception as e:
+        result['issues'].append(f"Erro ao ler arquivo {history_file}: {e}")
+        return result
+    
+    if not isinstance(history_data, dict) or not isinstance(history_data.get("entries"), list):
+        result['issues'].append(f"Estrutura inválida no arquivo: {history_file}")
+        return result
+    
+    entries = history_data["entries"]
+    result['siape'] = history_data.get("siape")
+    result['escola'] = history_data.get("escola")
+    result['entries'] = len(entries)
+    
+    previous_timestamp = ''
+    for i, entry in enumerate(entries):
+        for field in ('timestamp', 'action'):
+            if field not in entry:
+                result['issues'].append(f"Campo {field} ausente na entrada {i} de {history_file}")
+        
+        timestamp = entry.get('timestamp', '')
+        if timestamp and timestamp < previous_timestamp:
+            result['issues'].append(f"Timestamp fora de ordem na entrada {i} de {history_file}")
+        previous_timestamp = max(previous_timestamp, timestamp)
+        
+        if entry.get('siape') and str(entry.get('siape')) != str(result['siape']):
+            result['issues'].append(f"SIAPE divergente na entrada {i} de {history_file}")
+    
+    result['last_updated'] = (
+        history_data.get("last_updated")
+        or previous_timestamp
+        or history_data.get("created_at")
+    )
+    
+    return result
+
+
+def run_in_pool(func: Callable, items: List[Any], max_workers: Optional[int] = None,
+                use_processes: bool = True, progress_callback: Optional[Callable] = None) -> List[Any]:
+    """Executa func sobre items em paralelo, informando o progresso (feitos, total)"""
+    results = []
+    total = len(items)
+    
+    if not items:
+        return results
+    
+    try:
+        executor = ProcessPoolExecutor(max_workers=max_workers) if use_processes else ThreadPoolExecutor(max_workers=max_workers)
+    except (OSError, NotImplementedError) as e:
+        # Ambientes sem suporte a multiprocessamento
+        logging.warning(f"Pool de processos indisponível, usando threads: {e}")
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    
+    with executor:
+        futures = [executor.submit(func, item) for item in items]
+        
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            if progress_callback:
+                progress_callback(done, total)
+    
+    return results
+
 
 class HistoryManager:
     """Gerenciador do histórico de alterações dos professores"""
@@ -18,10 +127,25 @@ class HistoryManager:
         self.data_dir = "data"
         self.history_dir = os.path.join(self.data_dir, "history")
         self.history_index_file = os.path.join(self.history_dir, "history_index.json")
+        self.archive_dir = os.path.join(self.history_dir, "archive")
+        self.archive_index_file = os.path.join(self.archive_dir, "archive_index.json")
+        self.rollups_file = os.path.join(self.history_dir, "history_rollups.json")
         self.lock = threading.Lock()
+        self.hot_entries_cache = None
         
         self.ensure_history_directory()
+        
+        # Lock compartilhado entre instâncias/processos que gravam o histórico
+        self.write_lock = FileLock(os.path.join(self.history_dir, "history.lock"), timeout=10)
+        
+        # Índices e agregados recebem as alterações em diários (uma linha por gravação)
+        self.index_document = JournaledDocument(self.history_index_file, self.apply_index_record, self.write_lock)
+        self.rollups_document = JournaledDocument(self.rollups_file, self.apply_rollups_record, self.write_lock)
+        self.search_index = HistorySearchIndex(self.history_dir, self.write_lock)
+        
         self.initialize_history_index()
+        self.initialize_history_rollups()
+        self.initialize_search_index()
     
     def ensure_history_directory(self):
         """Garante que o diretório de histórico existe"""
@@ -31,6 +155,11 @@ class HistoryManager:
     def initialize_history_index(self):
         """Inicializa o arquivo de índice do histórico"""
         if not os.path.exists(self.history_index_file):
+            # Índice perdido com históricos em disco: reconstrói a partir deles
+            if self.list_history_files():
+                self.rebuild_history_index(use_processes=False)
+                return
+            
             initial_index = {
                 "metadata": {
                     "created_at": datetime.now().isoformat(),
@@ -38,14 +167,27 @@ class HistoryManager:
                 },
                 "teachers": {}
             }
-            self.save_json(self.history_index_file, initial_index)
+            self.index_document.write(initial_index)
+    
+    def initialize_history_rollups(self):
+        """Gera os agregados de estatísticas se ainda não existirem"""
+        if not os.path.exists(self.rollups_file):
+            self.rebuild_history_rollups()
+    
+    def initialize_search_index(self):
+        """Gera o índice de busca se ainda não existir"""
+        if not self.search_index.exists():
+            self.rebuild_search_index()
     
     def save_json(self, filepath: str, data: Dict[str, Any]) -> None:
-        """Salva dados em JSON com lock"""
+        """Salva dados em JSON com lock (escrita atômica)"""
         try:
-            with self.lock:
-                with open(filepath, 'w', encoding='utf-8') as f:
+            temp_file = filepath + ".tmp"
+            
+            with self.write_lock, self.lock:
+                with open(temp_file, 'w', encoding='utf-8') as f:
                     json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+                os.replace(temp_file, filepath)
         except Exception as e:
             logging.error(f"Erro ao salvar JSON {filepath}: {e}")
             raise
@@ -83,29 +225,37 @@ class HistoryManager:
             if 'timestamp' not in entry:
                 entry['timestamp'] = datetime.now().isoformat()
             
-            # Arquivo de histórico do professor
-            history_file = self.get_teacher_history_file(siape, school)
+            # Bloqueia outros gravadores (e snapshots de backup) durante a alteração
+            with self.write_lock:
+                # Arquivo de histórico do professor
+                history_file = self.get_teacher_history_file(siape, school)
             
-            # Carrega histórico existente
-            if os.path.exists(history_file):
-                history_data = self.load_json(history_file)
-            else:
-                history_data = {
-                    "siape": siape,
-                    "escola": school,
-                    "created_at": datetime.now().isoformat(),
-                    "entries": []
-                }
+                # Carrega histórico existente
+                if os.path.exists(history_file):
+                    history_data = self.load_json(history_file)
+                else:
+                    history_data = {
+                        "siape": siape,
+                        "escola": school,
+                        "created_at": datetime.now().isoformat(),
+                        "entries": []
+                    }
+            
+                # Adiciona nova entrada
+                history_data["entries"].append(entry)
+                history_data["last_updated"] = datetime.now().isoformat()
+            
+                # Salva arquivo de histórico
+                self.save_json(history_file, history_data)
             
-            # Adiciona nova entrada
-            history_data["entries"].append(entry)
-            history_data["last_updated"] = datetime.now().isoformat()
+                # Atualiza índice
+                self.update_history_index(siape, school, history_file)
             
-            # Salva arquivo de histórico
-            self.save_json(history_file, history_data)
+                # Atualiza agregados de estatísticas
+                self.update_history_rollups([entry])
             
-            # Atualiza índice
-            self.update_history_index(siape, school, history_file)
+                # Indexa para busca textual
+                self.search_index.add_entries([entry])
             
             logging.info(f"Entrada de histórico adicionada: {siape} - {entry.get('action', 'N/A')}")
             return True
@@ -114,43 +264,143 @@ class HistoryManager:
             logging.error(f"Erro ao adicionar entrada no histórico: {e}")
             return False
     
-    def update_history_index(self, siape: str, school: str, history_file: str) -> None:
-        """Atualiza o índice de histórico"""
+    def add_history_entries(self, entries: List[Dict[str, Any]]) -> int:
+        """Adiciona várias entradas de uma vez (importações em lote)
+        
+        Cada arquivo de professor é gravado uma vez e o índice, os
+        agregados e o índice de busca são atualizados uma única vez.
+        Retorna quantas entradas foram gravadas.
+        """
         try:
-            index_data = self.load_json(self.history_index_file)
+            by_teacher = {}
+            for entry in entries:
+                siape = entry.get('siape')
+                school = entry.get('escola')
+                if not siape or not school:
+                    logging.error("SIAPE e escola são obrigatórios para o histórico")
+                    continue
+                
+                entry.setdefault('timestamp', datetime.now().isoformat())
+                by_teacher.setdefault((siape, school), []).append(entry)
             
-            if "teachers" not in index_data:
-                index_data["teachers"] = {}
+            if not by_teacher:
+                return 0
             
-            # Chave única para o professor
-            teacher_key = f"{school}_{siape}"
+            written = []
+            index_records = []
+            with self.write_lock:
+                now = datetime.now().isoformat()
+                
+                for (siape, school), teacher_entries in by_teacher.items():
+                    history_file = self.get_teacher_history_file(siape, school)
+                    
+                    if os.path.exists(history_file):
+                        history_data = self.load_json(history_file)
+                    else:
+                        history_data = {
+                            "siape": siape,
+                            "escola": school,
+                            "created_at": now,
+                            "entries": []
+                        }
+                    
+                    history_data["entries"].extend(teacher_entries)
+                    history_data["last_updated"] = now
+                    self.save_json(history_file, history_data)
+                    written.extend(teacher_entries)
+                    
+                    index_records.append({
+                        "op": "set",
+                        "key": f"{school}_{siape}",
+                        "teacher": {
+                            "siape": siape,
+                            "escola": school,
+                            "history_file": history_file,
+                            "last_updated": now
+                        },
+                        "at": now
+                    })
+                
+                self.index_document.append(index_records)
+                self.update_history_rollups(written)
+                self.search_index.add_entries(written)
             
-            index_data["teachers"][teacher_key] = {
-                "siape": siape,
-                "escola": school,
-                "history_file": history_file,
-                "last_updated": datetime.now().isoformat()
-            }
+            logging.info(f"{len(written)} entradas de histórico adicionadas em lote")
+            return len(written)
             
-            index_data["metadata"]["last_updated"] = datetime.now().isoformat()
+        except Exception as e:
+            logging.error(f"Erro ao adicionar entradas no histórico: {e}")
+            return 0
+    
+    def update_history_index(self, siape: str, school: str, history_file: str) -> None:
+        """Atualiza o índice de histórico (registro no diário do índice)"""
+        try:
+            now = datetime.now().isoformat()
             
-            self.save_json(self.history_index_file, index_data)
+            self.index_document.append([{
+                "op": "set",
+                "key": f"{school}_{siape}",
+                "teacher": {
+                    "siape": siape,
+                    "escola": school,
+                    "history_file": history_file,
+                    "last_updated": now
+                },
+                "at": now
+            }])
             
         except Exception as e:
             logging.error(f"Erro ao atualizar índice do histórico: {e}")
     
-    def get_teacher_history(self, siape: str, school: str) -> List[Dict[str, Any]]:
-        """Retorna o histórico de um professor"""
+    def apply_index_record(self, index_data: Dict[str, Any], record: Dict[str, Any]) -> None:
+        """Aplica um registro do diário (inclusão ou remoção de professor) ao índice"""
+        teachers = index_data.setdefault("teachers", {})
+        
+        if record.get("op") == "remove":
+            teachers.pop(record.get("key"), None)
+        else:
+            teachers[record.get("key")] = record.get("teacher", {})
+        
+        index_data.setdefault("metadata", {})["last_updated"] = record.get("at")
+    
+    def load_history_index(self) -> Dict[str, Any]:
+        """Carrega o índice de histórico (consolidado + diário)"""
+        try:
+            return self.index_document.load()
+        except Exception as e:
+            logging.error(f"Erro ao carregar índice do histórico: {e}")
+            return {}
+    
+    def get_teacher_history(self, siape: str, school: str, start_date: Optional[str] = None,
+                            end_date: Optional[str] = None, include_archived: bool = False) -> List[Dict[str, Any]]:
+        """Retorna o histórico de um professor
+        
+        Por padrão lê apenas o arquivo ativo. Os segmentos arquivados são
+        consultados quando include_archived=True ou quando o período
+        informado alcança meses já arquivados.
+        """
         try:
             history_file = self.get_teacher_history_file(siape, school)
+            entries = []
+            
+            if os.path.exists(history_file):
+                history_data = self.load_json(history_file)
+                entries = history_data.get("entries", [])
             
-            if not os.path.exists(history_file):
+            # Entradas arquivadas do professor
+            if include_archived or start_date or end_date:
+                teacher_key = f"{school}_{siape}"
+                entries = entries + self.load_archived_entries(
+                    start_date, end_date, teacher_key=teacher_key
+                )
+            
+            if start_date or end_date:
+                entries = self.filter_entries_by_date(entries, start_date, end_date)
+            
+            if not entries:
                 logging.info(f"Nenhum histórico encontrado para: {siape} - {school}")
                 return []
             
-            history_data = self.load_json(history_file)
-            entries = history_data.get("entries", [])
-            
             # Ordena por timestamp (mais recente primeiro)
             entries.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
             
@@ -160,11 +410,113 @@ class HistoryManager:
             logging.error(f"Erro ao buscar histórico do professor: {e}")
             return []
     
+    def load_hot_entries(self, history_file: str) -> List[Dict[str, Any]]:
+        """Entradas do arquivo ativo em ordem cronológica
+        
+        O último arquivo lido fica em cache enquanto não muda (mtime e
+        tamanho), de modo que as páginas seguintes não o leem de novo.
+        """
+        try:
+            stat = os.stat(history_file)
+        except OSError:
+            return []
+        
+        signature = (history_file, stat.st_mtime_ns, stat.st_size)
+        cached = self.hot_entries_cache
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        entries = self.load_json(history_file).get("entries", [])
+        timestamps = [entry.get('timestamp', '') for entry in entries]
+        
+        # Os arquivos já são gravados em ordem; só ordena se necessário
+        if any(previous > current for previous, current in zip(timestamps, timestamps[1:])):
+            entries = sorted(entries, key=lambda x: x.get('timestamp', ''))
+        
+        self.hot_entries_cache = (signature, entries)
+        return entries
+    
+    def iter_teacher_history(self, siape: str, school: str, newest_first: bool = True, offset: int = 0):
+        """Percorre o histórico de um professor em ordem cronológica
+        
+        O arquivo ativo é lido primeiro (mais recente primeiro) e os
+        segmentos arquivados só são descompactados quando o consumidor
+        avança além das entradas ativas. As offset primeiras entradas são
+        puladas sem cópia; segmentos inteiros são pulados pela contagem
+        do índice de arquivamento, sem descompactar.
+        """
+        history_file = self.get_teacher_history_file(siape, school)
+        teacher_key = f"{school}_{siape}"
+        
+        hot_entries = self.load_hot_entries(history_file)
+        
+        segments = [
+            segment for month, segment in sorted(self.load_archive_index().get("segments", {}).items(),
+                                                 reverse=newest_first)
+            if teacher_key in segment.get("teachers", {})
+        ]
+        
+        def hot(skip):
+            if newest_first:
+                return (hot_entries[position] for position in range(len(hot_entries) - 1 - skip, -1, -1))
+            return islice(hot_entries, skip, None)
+        
+        def archived_entries(skip):
+            for segment in segments:
+                segment_count = segment["teachers"][teacher_key].get("entries", 0)
+                if skip >= segment_count:
+                    skip -= segment_count
+                    continue
+                
+                segment_data = self.load_archive_segment(segment["file"], segment.get("codec", 'gzip'))
+                segment_entries = [
+                    entry for entry in segment_data.get("entries", [])
+                    if f"{entry.get('escola')}_{entry.get('siape')}" == teacher_key
+                ]
+                segment_entries.sort(key=lambda x: x.get('timestamp', ''), reverse=newest_first)
+                yield from islice(segment_entries, skip, None)
+                skip = 0
+        
+        # Entradas arquivadas são sempre mais antigas que as ativas
+        if newest_first:
+            yield from hot(min(offset, len(hot_entries)))
+            yield from archived_entries(max(offset - len(hot_entries), 0))
+        else:
+            archived_total = sum(segment["teachers"][teacher_key].get("entries", 0) for segment in segments)
+            yield from archived_entries(offset)
+            yield from hot(max(offset - archived_total, 0))
+    
+    def get_teacher_history_page(self, siape: str, school: str, offset: int = 0,
+                                 limit: int = 100) -> Tuple[List[Dict[str, Any]], bool]:
+        """Retorna uma página do histórico (mais recente primeiro) e se há mais entradas"""
+        try:
+            entries = list(islice(self.iter_teacher_history(siape, school, offset=offset), limit + 1))
+            return entries[:limit], len(entries) > limit
+            
+        except Exception as e:
+            logging.error(f"Erro ao buscar página do histórico do professor: {e}")
+            return [], False
+    
+    def filter_entries_by_date(self, entries: List[Dict[str, Any]], start_date: Optional[str],
+                               end_date: Optional[str]) -> List[Dict[str, Any]]:
+        """Filtra entradas pelo período (comparação de timestamps ISO)"""
+        filtered_entries = []
+        
+        for entry in entries:
+            entry_date = entry.get('timestamp', '')
+            if start_date and entry_date < start_date:
+                continue
+            if end_date and entry_date > end_date:
+                continue
+            filtered_entries.append(entry)
+        
+        return filtered_entries
+    
     def get_recent_history(self, school: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
         """Retorna histórico recente de todos os professores ou de uma escola"""
         try:
             all_entries = []
-            index_data = self.load_json(self.history_index_file)
+            index_data = self.load_history_index()
             teachers = index_data.get("teachers", {})
             
             for teacher_key, teacher_info in teachers.items():
@@ -215,15 +567,45 @@ class HistoryManager:
             return []
     
     def get_history_by_date_range(self, start_date: str, end_date: str, school: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Retorna histórico em um período específico"""
+        """Retorna histórico em um período específico
+        
+        Lê os arquivos ativos e, quando o período exige, os segmentos
+        arquivados que se sobrepõem ao intervalo.
+        """
         try:
-            recent_history = self.get_recent_history(school, limit=1000)
             filtered_entries = []
+            index_data = self.load_history_index()
+            teachers = index_data.get("teachers", {})
+            
+            for teacher_key, teacher_info in teachers.items():
+                # Filtra por escola se especificada
+                if school and teacher_info.get("escola") != school:
+                    continue
+                
+                # Arquivo sem alterações desde o início do período
+                last_updated = teacher_info.get("last_updated", '')
+                if last_updated and start_date and last_updated < start_date:
+                    continue
+                
+                history_file = teacher_info.get("history_file")
+                if history_file and os.path.exists(history_file):
+                    history_data = self.load_json(history_file)
+                    
+                    for entry in self.filter_entries_by_date(history_data.get("entries", []), start_date, end_date):
+                        entry_with_info = entry.copy()
+                        entry_with_info["teacher_siape"] = teacher_info.get("siape")
+                        entry_with_info["teacher_escola"] = teacher_info.get("escola")
+                        filtered_entries.append(entry_with_info)
             
-            for entry in recent_history:
-                entry_date = entry.get('timestamp', '')
-                if start_date <= entry_date <= end_date:
-                    filtered_entries.append(entry)
+            # Segmentos arquivados que se sobrepõem ao período
+            for entry in self.load_archived_entries(start_date, end_date, school=school):
+                entry_with_info = entry.copy()
+                entry_with_info["teacher_siape"] = entry.get("siape")
+                entry_with_info["teacher_escola"] = entry.get("escola")
+                filtered_entries.append(entry_with_info)
+            
+            filtered_entries = self.filter_entries_by_date(filtered_entries, start_date, end_date)
+            filtered_entries.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
             
             return filtered_entries
             
@@ -231,26 +613,79 @@ class HistoryManager:
             logging.error(f"Erro ao buscar histórico por período: {e}")
             return []
     
-    def delete_teacher_history(self, siape: str, school: str) -> bool:
-        """Remove todo o histórico de um professor"""
+    def merge_teacher_history(self, siape: str, school: str, entries: List[Dict[str, Any]]) -> int:
+        """Acrescenta ao histórico ativo as entradas que ainda não existem
+        
+        Usado na restauração seletiva: entradas atuais são mantidas e só as
+        ausentes (mesma identidade) são incluídas. Retorna quantas foram
+        acrescentadas.
+        """
         try:
-            history_file = self.get_teacher_history_file(siape, school)
-            
-            # Remove arquivo de histórico
-            if os.path.exists(history_file):
-                os.remove(history_file)
-                logging.info(f"Arquivo de histórico removido: {history_file}")
+            with self.write_lock:
+                history_file = self.get_teacher_history_file(siape, school)
+                
+                if os.path.exists(history_file):
+                    history_data = self.load_json(history_file)
+                else:
+                    history_data = {
+                        "siape": siape,
+                        "escola": school,
+                        "created_at": datetime.now().isoformat(),
+                        "entries": []
+                    }
+                
+                existing = {entry_identity(entry) for entry in history_data.get("entries", [])}
+                new_entries = [entry for entry in entries if entry_identity(entry) not in existing]
+                
+                if not new_entries:
+                    return 0
+                
+                history_data["entries"] = sorted(
+                    history_data.get("entries", []) + new_entries,
+                    key=lambda x: x.get('timestamp', '')
+                )
+                history_data["last_updated"] = datetime.now().isoformat()
+                
+                self.save_json(history_file, history_data)
+                self.update_history_index(siape, school, history_file)
+                self.update_history_rollups(new_entries)
+                self.search_index.add_entries(new_entries)
             
-            # Remove do índice
-            index_data = self.load_json(self.history_index_file)
-            teachers = index_data.get("teachers", {})
-            teacher_key = f"{school}_{siape}"
+            logging.info(f"Histórico mesclado: {siape} - {school} ({len(new_entries)} entradas)")
+            return len(new_entries)
             
-            if teacher_key in teachers:
-                del teachers[teacher_key]
-                index_data["metadata"]["last_updated"] = datetime.now().isoformat()
-                self.save_json(self.history_index_file, index_data)
-                logging.info(f"Professor removido do índice de histórico: {siape} - {school}")
+        except Exception as e:
+            logging.error(f"Erro ao mesclar histórico do professor: {e}")
+            return 0
+    
+    def delete_teacher_history(self, siape: str, school: str) -> bool:
+        """Remove o histórico ativo de um professor
+        
+        Os segmentos arquivados são preservados por exigência de auditoria.
+        """
+        try:
+            # Sem gravações concorrentes entre a leitura e o ajuste dos agregados
+            with self.write_lock:
+                history_file = self.get_teacher_history_file(siape, school)
+                
+                # Remove arquivo de histórico
+                if os.path.exists(history_file):
+                    removed_entries = self.load_json(history_file).get("entries", [])
+                    os.remove(history_file)
+                    self.update_history_rollups(removed_entries, delta=-1)
+                    self.search_index.remove_entries(removed_entries)
+                    logging.info(f"Arquivo de histórico removido: {history_file}")
+                
+                # Remove do índice
+                teacher_key = f"{school}_{siape}"
+                
+                if teacher_key in self.load_history_index().get("teachers", {}):
+                    self.index_document.append([{
+                        "op": "remove",
+                        "key": teacher_key,
+                        "at": datetime.now().isoformat()
+                    }])
+                    logging.info(f"Professor removido do índice de histórico: {siape} - {school}")
             
             return True
             
@@ -259,11 +694,16 @@ class HistoryManager:
             return False
     
     def get_history_statistics(self, school: Optional[str] = None) -> Dict[str, Any]:
-        """Retorna estatísticas do histórico"""
+        """Retorna estatísticas do histórico a partir dos agregados"""
         try:
-            recent_history = self.get_recent_history(school, limit=10000)
+            rollups = self.load_history_rollups()
+            
+            if school:
+                summary = rollups.get("schools", {}).get(school, {})
+            else:
+                summary = rollups.get("totals", {})
             
-            if not recent_history:
+            if not summary.get("entries"):
                 return {
                     "total_entries": 0,
                     "actions_count": {},
@@ -272,28 +712,12 @@ class HistoryManager:
                     "last_entry": None
                 }
             
-            # Conta ações
-            actions_count = {}
-            users_count = {}
-            
-            for entry in recent_history:
-                action = entry.get('action', 'Unknown')
-                user = entry.get('user', 'Unknown')
-                
-                actions_count[action] = actions_count.get(action, 0) + 1
-                users_count[user] = users_count.get(user, 0) + 1
-            
-            # Primeira e última entrada
-            sorted_entries = sorted(recent_history, key=lambda x: x.get('timestamp', ''))
-            first_entry = sorted_entries[0].get('timestamp') if sorted_entries else None
-            last_entry = sorted_entries[-1].get('timestamp') if sorted_entries else None
-            
             return {
-                "total_entries": len(recent_history),
-                "actions_count": actions_count,
-                "users_count": users_count,
-                "first_entry": first_entry,
-                "last_entry": last_entry,
+                "total_entries": summary.get("entries", 0),
+                "actions_count": dict(summary.get("actions", {})),
+                "users_count": dict(summary.get("users", {})),
+                "first_entry": summary.get("first_entry"),
+                "last_entry": summary.get("last_entry"),
                 "school": school
             }
             
@@ -301,52 +725,386 @@ class HistoryManager:
             logging.error(f"Erro ao gerar estatísticas do histórico: {e}")
             return {}
     
-    def cleanup_old_history(self, days_to_keep: int = 365) -> int:
-        """Remove entradas de histórico antigas"""
+    def get_teacher_history_statistics(self, siape: str, school: str) -> Dict[str, Any]:
+        """Retorna estatísticas do histórico de um professor a partir dos agregados"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-            cutoff_iso = cutoff_date.isoformat()
+            rollups = self.load_history_rollups()
+            summary = rollups.get("teachers", {}).get(f"{school}_{siape}", {})
             
-            cleaned_count = 0
-            index_data = self.load_json(self.history_index_file)
-            teachers = index_data.get("teachers", {})
+            return {
+                "total_entries": summary.get("entries", 0),
+                "actions_count": dict(summary.get("actions", {})),
+                "users_count": dict(summary.get("users", {})),
+                "first_entry": summary.get("first_entry"),
+                "last_entry": summary.get("last_entry"),
+                "siape": siape,
+                "school": school
+            }
             
-            for teacher_key, teacher_info in teachers.items():
-                history_file = teacher_info.get("history_file")
+        except Exception as e:
+            logging.error(f"Erro ao gerar estatísticas do histórico do professor: {e}")
+            return {}
+    
+    def get_daily_history_counts(self, school: Optional[str] = None, start_date: Optional[str] = None,
+                                 end_date: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Retorna contagens diárias por ação (dia -> ação -> total)"""
+        try:
+            rollups = self.load_history_rollups()
+            daily_counts = {}
+            
+            for day, schools in rollups.get("days", {}).items():
+                if start_date and day < start_date[:10]:
+                    continue
+                if end_date and day > end_date[:10]:
+                    continue
                 
-                if not history_file or not os.path.exists(history_file):
+                for day_school, users in schools.items():
+                    if school and day_school != school:
+                        continue
+                    
+                    for actions in users.values():
+                        for action, count in actions.items():
+                            day_actions = daily_counts.setdefault(day, {})
+                            day_actions[action] = day_actions.get(action, 0) + count
+            
+            return daily_counts
+            
+        except Exception as e:
+            logging.error(f"Erro ao gerar contagens diárias do histórico: {e}")
+            return {}
+    
+    def empty_history_rollups(self) -> Dict[str, Any]:
+        """Retorna a estrutura vazia dos agregados de histórico"""
+        return {
+            "metadata": {
+                "created_at": datetime.now().isoformat(),
+                "version": "1.0"
+            },
+            "totals": {},
+            "schools": {},
+            "teachers": {},
+            "days": {}
+        }
+    
+    def load_history_rollups(self) -> Dict[str, Any]:
+        """Carrega os agregados de histórico (consolidado + diário)"""
+        try:
+            rollups = self.rollups_document.load()
+        except Exception as e:
+            logging.error(f"Erro ao carregar agregados do histórico: {e}")
+            rollups = {}
+        return rollups if rollups else self.empty_history_rollups()
+    
+    def apply_rollups_record(self, rollups: Dict[str, Any], record: Dict[str, Any]) -> None:
+        """Aplica um registro do diário (entradas e delta) aos agregados"""
+        for entry in record.get("entries", []):
+            self.apply_entry_to_rollups(rollups, entry, record.get("delta", 1))
+        
+        rollups.setdefault("metadata", {})["last_updated"] = record.get("at")
+    
+    def apply_entry_to_rollups(self, rollups: Dict[str, Any], entry: Dict[str, Any], delta: int = 1) -> None:
+        """Aplica uma entrada (delta=1) ou sua remoção (delta=-1) aos agregados
+        
+        Mantém contagens por dia × escola × usuário × ação e resumos por
+        escola, por professor e totais.
+        """
+        school = entry.get('escola') or 'Unknown'
+        siape = entry.get('siape') or 'Unknown'
+        action = entry.get('action') or 'Unknown'
+        user = entry.get('user') or 'Unknown'
+        timestamp = entry.get('timestamp', '')
+        day = timestamp[:10] or 'Unknown'
+        
+        # Contagem por dia × escola × usuário × ação
+        day_actions = rollups["days"].setdefault(day, {}).setdefault(school, {}).setdefault(user, {})
+        day_actions[action] = day_actions.get(action, 0) + delta
+        if day_actions[action] <= 0:
+            del day_actions[action]
+        
+        summaries = [
+            rollups.setdefault("totals", {}),
+            rollups["schools"].setdefault(school, {}),
+            rollups["teachers"].setdefault(f"{school}_{siape}", {})
+        ]
+        
+        for summary in summaries:
+            summary["entries"] = summary.get("entries", 0) + delta
+            
+            for counter_name, key in (("actions", action), ("users", user)):
+                counter = summary.setdefault(counter_name, {})
+                counter[key] = counter.get(key, 0) + delta
+                if counter[key] <= 0:
+                    del counter[key]
+            
+            if delta > 0 and timestamp:
+                if not summary.get("first_entry") or timestamp < summary["first_entry"]:
+                    summary["first_entry"] = timestamp
+                if not summary.get("last_entry") or timestamp > summary["last_entry"]:
+                    summary["last_entry"] = timestamp
+            elif summary["entries"] <= 0:
+                summary.clear()
+    
+    def update_history_rollups(self, entries: List[Dict[str, Any]], delta: int = 1) -> None:
+        """Atualiza incrementalmente os agregados (registro no diário dos agregados)"""
+        try:
+            if not entries:
+                return
+            
+            self.rollups_document.append([{
+                "delta": delta,
+                "entries": [{field: entry.get(field) for field in ROLLUP_FIELDS} for entry in entries],
+                "at": datetime.now().isoformat()
+            }])
+            
+        except Exception as e:
+            logging.error(f"Erro ao atualizar agregados do histórico: {e}")
+    
+    def rebuild_history_rollups(self) -> Dict[str, Any]:
+        """Reconstrói os agregados a partir de todo o histórico (ativo e arquivado)"""
+        try:
+            # Gravações concorrentes esperam: não se perdem entre a leitura e a escrita
+            with self.write_lock:
+                rollups = self.empty_history_rollups()
+                entries_count = 0
+            
+                for entry in self.iter_all_entries():
+                    self.apply_entry_to_rollups(rollups, entry)
+                    entries_count += 1
+            
+                rollups["metadata"]["last_rebuild"] = datetime.now().isoformat()
+                rollups["metadata"]["last_updated"] = rollups["metadata"]["last_rebuild"]
+                self.rollups_document.write(rollups)
+            
+            logging.info(f"Agregados do histórico reconstruídos: {entries_count} entradas")
+            return {'success': True, 'total_entries': entries_count}
+            
+        except Exception as e:
+            logging.error(f"Erro ao reconstruir agregados do histórico: {e}")
+            return {'success': False, 'total_entries': 0, 'error': str(e)}
+    
+    def cleanup_old_history(self, days_to_keep: int = 365, codec: str = 'gzip') -> int:
+        """Move entradas antigas para os segmentos arquivados
+        
+        As entradas não são descartadas: saem dos arquivos ativos e passam
+        a ser mantidas em segmentos mensais compactados.
+        """
+        return self.archive_old_history(days_to_keep, codec)
+    
+    def get_archive_segment_file(self, month: str, codec: str = 'gzip') -> str:
+        """Retorna o caminho do segmento arquivado de um mês (AAAA-MM)"""
+        extension = ARCHIVE_CODECS[codec][0]
+        return os.path.join(self.archive_dir, f"history_{month}{extension}")
+    
+    def load_archive_index(self) -> Dict[str, Any]:
+        """Carrega o índice dos segmentos arquivados"""
+        index_data = self.load_json(self.archive_index_file)
+        
+        if not index_data:
+            index_data = {
+                "metadata": {
+                    "created_at": datetime.now().isoformat(),
+                    "version": "1.0"
+                },
+                "segments": {}
+            }
+        
+        return index_data
+    
+    def load_archive_segment(self, filepath: str, codec: str) -> Dict[str, Any]:
+        """Carrega um segmento arquivado compactado"""
+        try:
+            if not os.path.exists(filepath):
+                return {}
+            
+            open_func = ARCHIVE_CODECS[codec][1]
+            
+            with self.lock:
+                with open_func(filepath, 'rt', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"Erro ao carregar segmento arquivado {filepath}: {e}")
+            return {}
+    
+    def save_archive_segment(self, filepath: str, codec: str, data: Dict[str, Any]) -> None:
+        """Salva um segmento arquivado compactado (escrita atômica)"""
+        open_func = ARCHIVE_CODECS[codec][1]
+        temp_file = filepath + ".tmp"
+        
+        try:
+            with self.write_lock, self.lock:
+                with open_func(temp_file, 'wt', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, default=str)
+                os.replace(temp_file, filepath)
+        except Exception as e:
+            logging.error(f"Erro ao salvar segmento arquivado {filepath}: {e}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+    
+    def load_archived_entries(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                              school: Optional[str] = None, teacher_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Retorna entradas arquivadas dos segmentos que se sobrepõem ao período
+        
+        Só descompacta segmentos cujo intervalo e professores (pelo índice
+        do arquivo) podem conter entradas relevantes.
+        """
+        entries = []
+        archive_index = self.load_archive_index()
+        
+        for month, segment in sorted(archive_index.get("segments", {}).items()):
+            if start_date and segment.get("last_entry", '') < start_date:
+                continue
+            if end_date and segment.get("first_entry", '') > end_date:
+                continue
+            
+            segment_teachers = segment.get("teachers", {})
+            if teacher_key and teacher_key not in segment_teachers:
+                continue
+            if school and not any(info.get("escola") == school for info in segment_teachers.values()):
+                continue
+            
+            segment_data = self.load_archive_segment(segment["file"], segment.get("codec", 'gzip'))
+            
+            for entry in segment_data.get("entries", []):
+                if teacher_key and f"{entry.get('escola')}_{entry.get('siape')}" != teacher_key:
+                    continue
+                if school and entry.get('escola') != school:
                     continue
+                entries.append(entry)
+        
+        return entries
+    
+    def archive_old_history(self, days_to_keep: int = 365, codec: str = 'gzip') -> int:
+        """Move entradas mais antigas que o limite para segmentos mensais compactados
+        
+        Roda inteiro com o write_lock. Se interrompido depois de gravar os
+        segmentos, a próxima execução não duplica as entradas (entry_identity).
+        """
+        try:
+            if codec not in ARCHIVE_CODECS:
+                logging.error(f"Codec de arquivamento inválido: {codec}")
+                return 0
+            
+            # Nenhuma entrada pode ser gravada entre a leitura dos arquivos
+            # ativos e a sua redução às entradas recentes
+            with self.write_lock:
+                cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+                cutoff_iso = cutoff_date.isoformat()
                 
-                history_data = self.load_json(history_file)
-                entries = history_data.get("entries", [])
+                os.makedirs(self.archive_dir, exist_ok=True)
                 
-                # Filtra entradas recentes
-                recent_entries = [
-                    entry for entry in entries
-                    if entry.get('timestamp', '') >= cutoff_iso
-                ]
+                index_data = self.load_history_index()
+                teachers = index_data.get("teachers", {})
                 
-                # Se removeu alguma entrada
-                if len(recent_entries) < len(entries):
-                    history_data["entries"] = recent_entries
-                    history_data["last_cleanup"] = datetime.now().isoformat()
+                # Separa entradas antigas por mês e guarda as recentes de cada arquivo
+                old_by_month = {}
+                pending_files = {}
+                
+                for teacher_key, teacher_info in teachers.items():
+                    history_file = teacher_info.get("history_file")
+                    
+                    if not history_file or not os.path.exists(history_file):
+                        continue
+                    
+                    history_data = self.load_json(history_file)
+                    entries = history_data.get("entries", [])
                     
+                    recent_entries = []
+                    for entry in entries:
+                        timestamp = entry.get('timestamp', '')
+                        if timestamp >= cutoff_iso:
+                            recent_entries.append(entry)
+                        else:
+                            month = timestamp[:7] or "0000-00"
+                            old_by_month.setdefault(month, []).append(entry)
+                    
+                    if len(recent_entries) < len(entries):
+                        history_data["entries"] = recent_entries
+                        history_data["archived_entries"] = history_data.get("archived_entries", 0) + len(entries) - len(recent_entries)
+                        history_data["last_archive"] = datetime.now().isoformat()
+                        pending_files[history_file] = history_data
+                
+                if not old_by_month:
+                    logging.info("Arquivamento de histórico: nenhuma entrada antiga encontrada")
+                    return 0
+                
+                # Grava os segmentos antes de reduzir os arquivos ativos
+                archive_index = self.load_archive_index()
+                segments = archive_index.setdefault("segments", {})
+                archived_count = 0
+                
+                for month, month_entries in old_by_month.items():
+                    segment_info = segments.get(month)
+                    
+                    if segment_info:
+                        # Mantém o codec do segmento já existente
+                        segment_codec = segment_info.get("codec", codec)
+                        segment_file = segment_info["file"]
+                        segment_data = self.load_archive_segment(segment_file, segment_codec)
+                    else:
+                        segment_codec = codec
+                        segment_file = self.get_archive_segment_file(month, codec)
+                        segment_data = {}
+                    
+                    # Uma execução interrompida antes de reduzir os arquivos ativos
+                    # deixa entradas já arquivadas neles: não as duplica
+                    archived_ids = {entry_identity(entry) for entry in segment_data.get("entries", [])}
+                    all_entries = segment_data.get("entries", []) + [
+                        entry for entry in month_entries if entry_identity(entry) not in archived_ids
+                    ]
+                    all_entries.sort(key=lambda x: x.get('timestamp', ''))
+                    
+                    self.save_archive_segment(segment_file, segment_codec, {
+                        "month": month,
+                        "entries": all_entries
+                    })
+                    
+                    segment_teachers = {}
+                    for entry in all_entries:
+                        entry_key = f"{entry.get('escola')}_{entry.get('siape')}"
+                        teacher_info = segment_teachers.setdefault(entry_key, {
+                            "siape": entry.get('siape'),
+                            "escola": entry.get('escola'),
+                            "entries": 0
+                        })
+                        teacher_info["entries"] += 1
+                    
+                    segments[month] = {
+                        "file": segment_file,
+                        "codec": segment_codec,
+                        "entries": len(all_entries),
+                        "first_entry": all_entries[0].get('timestamp', ''),
+                        "last_entry": all_entries[-1].get('timestamp', ''),
+                        "teachers": segment_teachers,
+                        "last_updated": datetime.now().isoformat()
+                    }
+                    archived_count += len(month_entries)
+                
+                archive_index["metadata"]["last_updated"] = datetime.now().isoformat()
+                self.save_json(self.archive_index_file, archive_index)
+                
+                # Reduz os arquivos ativos às entradas recentes
+                for history_file, history_data in pending_files.items():
                     self.save_json(history_file, history_data)
-                    cleaned_count += len(entries) - len(recent_entries)
-            
-            logging.info(f"Limpeza de histórico concluída: {cleaned_count} entradas removidas")
-            return cleaned_count
+                
+                logging.info(f"Arquivamento de histórico concluído: {archived_count} entradas movidas para {len(old_by_month)} segmentos")
+                return archived_count
             
         except Exception as e:
-            logging.error(f"Erro na limpeza do histórico: {e}")
+            logging.error(f"Erro no arquivamento do histórico: {e}")
             return 0
-    
+
     def export_history(self, siape: str, school: str, format: str = 'json') -> Optional[str]:
-        """Exporta histórico de um professor"""
+        """Exporta histórico de um professor
+        
+        As entradas (ativas e arquivadas) são gravadas à medida que são lidas,
+        sem montar o histórico completo em memória.
+        """
         try:
-            history = self.get_teacher_history(siape, school)
+            history = self.iter_teacher_history(siape, school)
+            first_entry = next(history, None)
             
-            if not history:
+            if first_entry is None:
                 return None
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -358,16 +1116,25 @@ class HistoryManager:
                 # Garante que o diretório existe
                 os.makedirs("exports", exist_ok=True)
                 
-                export_data = {
+                header = {
                     "siape": siape,
                     "escola": school,
-                    "exported_at": datetime.now().isoformat(),
-                    "total_entries": len(history),
-                    "history": history
+                    "exported_at": datetime.now().isoformat()
                 }
                 
                 with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(export_data, f, indent=2, ensure_ascii=False, default=str)
+                    f.write("{\n")
+                    for key, value in header.items():
+                        f.write(f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n")
+                    
+                    f.write('  "history": [')
+                    total_entries = 0
+                    for entry in chain([first_entry], history):
+                        entry_json = json.dumps(entry, indent=2, ensure_ascii=False, default=str)
+                        f.write(("," if total_entries else "") + "\n    " + entry_json.replace("\n", "\n    "))
+                        total_entries += 1
+                    
+                    f.write(f'\n  ],\n  "total_entries": {total_entries}\n}}\n')
                 
                 return filepath
             
@@ -385,7 +1152,7 @@ class HistoryManager:
                     writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                     
                     writer.writeheader()
-                    for entry in history:
+                    for entry in chain([first_entry], history):
                         writer.writerow({
                             'timestamp': entry.get('timestamp', ''),
                             'action': entry.get('action', ''),
@@ -404,22 +1171,152 @@ class HistoryManager:
             logging.error(f"Erro ao exportar histórico: {e}")
             return None
     
-    def validate_history_integrity(self) -> Dict[str, Any]:
-        """Valida a integridade dos arquivos de histórico"""
+    def search(self, text: str, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = 200) -> List[Dict[str, Any]]:
+        """Busca textual (sem acentos) em notas, valores e campos do histórico
+        
+        Filtros aceitos: escola, siape, action, user, field, start_date e
+        end_date. Inclui entradas ativas e arquivadas de todas as escolas.
+        """
         try:
+            return self.search_index.search(text, filters, limit)
+        except Exception as e:
+            logging.error(f"Erro na busca do histórico: {e}")
+            return []
+    
+    def iter_all_entries(self):
+        """Percorre todas as entradas do histórico (ativas e arquivadas)"""
+        index_data = self.load_history_index()
+        
+        for teacher_info in index_data.get("teachers", {}).values():
+            history_file = teacher_info.get("history_file")
+            if history_file and os.path.exists(history_file):
+                for entry in self.load_json(history_file).get("entries", []):
+                    yield entry
+        
+        for entry in self.load_archived_entries():
+            yield entry
+    
+    def rebuild_search_index(self) -> Dict[str, Any]:
+        """Reconstrói o índice de busca a partir de todo o histórico"""
+        try:
+            with self.write_lock:
+                total_entries = self.search_index.rebuild(self.iter_all_entries())
+            logging.info(f"Índice de busca do histórico reconstruído: {total_entries} entradas")
+            return {'success': True, 'total_entries': total_entries}
+            
+        except Exception as e:
+            logging.error(f"Erro ao reconstruir índice de busca do histórico: {e}")
+            return {'success': False, 'total_entries': 0, 'error': str(e)}
+    
+    def list_history_files(self) -> List[str]:
+        """Lista os arquivos de histórico de professores no diretório"""
+        try:
+            return sorted(
+                os.path.join(self.history_dir, filename)
+                for filename in os.listdir(self.history_dir)
+                if filename.startswith("history_") and filename.endswith(".json")
+                and filename not in HISTORY_METADATA_FILES
+            )
+        except Exception as e:
+            logging.error(f"Erro ao listar arquivos de histórico: {e}")
+            return []
+    
+    def rebuild_history_index(self, max_workers: Optional[int] = None, use_processes: bool = True,
+                              progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """Reconstrói history_index.json varrendo o diretório de histórico em paralelo"""
+        try:
+            start_time = time.time()
+            
+            with self.write_lock:
+                history_files = self.list_history_files()
+            
+                results = run_in_pool(
+                    inspect_history_file, history_files,
+                    max_workers=max_workers,
+                    use_processes=use_processes,
+                    progress_callback=progress_callback
+                )
+            
+                previous_index = self.load_history_index()
+                metadata = previous_index.get("metadata") or {
+                    "created_at": datetime.now().isoformat(),
+                    "version": "1.0"
+                }
+            
+                teachers = {}
+                errors = []
+            
+                for result in sorted(results, key=lambda r: r['history_file']):
+                    if not result['siape'] or not result['escola']:
+                        errors.extend(result['issues'] or [f"Arquivo sem identificação: {result['history_file']}"])
+                        continue
+                    
+                    teachers[f"{result['escola']}_{result['siape']}"] = {
+                        "siape": result['siape'],
+                        "escola": result['escola'],
+                        "history_file": result['history_file'],
+                        "last_updated": result['last_updated']
+                    }
+                
+                metadata["last_updated"] = datetime.now().isoformat()
+                metadata["last_rebuild"] = metadata["last_updated"]
+                
+                self.index_document.write({
+                    "metadata": metadata,
+                    "teachers": teachers
+                })
+            
+            elapsed = time.time() - start_time
+            logging.info(f"Índice de histórico reconstruído: {len(teachers)} professores em {elapsed:.2f}s")
+            
+            return {
+                'success': True,
+                'total_teachers': len(teachers),
+                'files_scanned': len(history_files),
+                'errors': errors,
+                'elapsed_seconds': elapsed
+            }
+            
+        except Exception as e:
+            logging.error(f"Erro ao reconstruir índice do histórico: {e}")
+            return {
+                'success': False,
+                'total_teachers': 0,
+                'files_scanned': 0,
+                'errors': [f"Erro na reconstrução: {e}"],
+                'elapsed_seconds': 0
+            }
+    
+    def validate_history_integrity(self, max_workers: Optional[int] = None, use_processes: bool = True,
+                                   progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """Valida a integridade dos arquivos de histórico
+        
+        Os arquivos são verificados em paralelo (campos obrigatórios, ordem
+        dos timestamps, identificação) e o resultado é cruzado com o índice
+        e com os agregados de estatísticas.
+        """
+        try:
+            start_time = time.time()
             issues = []
             fixed_issues = []
             
-            # Verifica índice principal
-            if not os.path.exists(self.history_index_file):
-                issues.append("Arquivo de índice de histórico não encontrado")
-                self.initialize_history_index()
-                fixed_issues.append("Arquivo de índice recriado")
+            # Verifica índice principal (ausente ou corrompido é reconstruído)
+            index_data = self.load_history_index()
+            if "teachers" not in index_data:
+                if os.path.exists(self.history_index_file):
+                    issues.append("Arquivo de índice de histórico corrompido")
+                else:
+                    issues.append("Arquivo de índice de histórico não encontrado")
+                
+                rebuild_result = self.rebuild_history_index(max_workers, use_processes)
+                if rebuild_result['success']:
+                    fixed_issues.append(f"Arquivo de índice reconstruído ({rebuild_result['total_teachers']} professores)")
+                index_data = self.load_history_index()
             
-            # Verifica cada arquivo de histórico referenciado no índice
-            index_data = self.load_json(self.history_index_file)
             teachers = index_data.get("teachers", {})
             
+            # Arquivos referenciados no índice e presentes em disco
+            indexed_files = {}
             for teacher_key, teacher_info in teachers.items():
                 history_file = teacher_info.get("history_file")
                 
@@ -431,27 +1328,51 @@ class HistoryManager:
                     issues.append(f"Arquivo de histórico não encontrado: {history_file}")
                     continue
                 
-                try:
-                    history_data = self.load_json(history_file)
-                    
-                    if "entries" not in history_data:
-                        issues.append(f"Estrutura inválida no arquivo: {history_file}")
-                    
-                    entries = history_data.get("entries", [])
-                    for i, entry in enumerate(entries):
-                        required_fields = ['timestamp', 'action']
-                        for field in required_fields:
-                            if field not in entry:
-                                issues.append(f"Campo {field} ausente na entrada {i} de {history_file}")
+                indexed_files[os.path.normpath(history_file)] = teacher_key
+            
+            disk_files = {os.path.normpath(f) for f in self.list_history_files()}
+            for history_file in sorted(disk_files - set(indexed_files)):
+                issues.append(f"Arquivo de histórico fora do índice: {history_file}")
+            
+            results = run_in_pool(
+                inspect_history_file, sorted(disk_files | set(indexed_files)),
+                max_workers=max_workers,
+                use_processes=use_processes,
+                progress_callback=progress_callback
+            )
+            
+            # Contagem de entradas arquivadas por professor
+            archived_counts = {}
+            for segment in self.load_archive_index().get("segments", {}).values():
+                for teacher_key, teacher_info in segment.get("teachers", {}).items():
+                    archived_counts[teacher_key] = archived_counts.get(teacher_key, 0) + teacher_info.get("entries", 0)
+            
+            rollup_teachers = self.load_history_rollups().get("teachers", {})
+            
+            for result in results:
+                issues.extend(result['issues'])
+                
+                teacher_key = indexed_files.get(os.path.normpath(result['history_file']))
+                if not teacher_key or result['siape'] is None:
+                    continue
                 
-                except Exception as e:
-                    issues.append(f"Erro ao ler arquivo {history_file}: {e}")
+                teacher_info = teachers[teacher_key]
+                if (str(teacher_info.get("siape")) != str(result['siape'])
+                        or teacher_info.get("escola") != result['escola']):
+                    issues.append(f"Índice divergente do arquivo para {teacher_key}: {result['history_file']}")
+                
+                expected_entries = result['entries'] + archived_counts.get(teacher_key, 0)
+                rollup_entries = rollup_teachers.get(teacher_key, {}).get("entries", 0)
+                if rollup_entries != expected_entries:
+                    issues.append(f"Agregados divergentes para {teacher_key}: {rollup_entries} != {expected_entries}")
             
             return {
                 'valid': len(issues) == 0,
                 'issues': issues,
                 'fixed_issues': fixed_issues,
-                'total_teachers_with_history': len(teachers)
+                'total_teachers_with_history': len(teachers),
+                'files_checked': len(results),
+                'elapsed_seconds': time.time() - start_time
             }
             
         except Exception as e:
@@ -460,5 +1381,81 @@ class HistoryManager:
                 'valid': False,
                 'issues': [f"Erro na validação: {e}"],
                 'fixed_issues': [],
-                'total_teachers_with_history': 0
+                'total_teachers_with_history': 0,
+                'files_checked': 0,
+                'elapsed_seconds': 0
             }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Comandos de manutenção do histórico (python -m dados.history_manager)"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Manutenção do histórico - Sistema DIRENS")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild-rollups", help="Reconstrói os agregados de estatísticas")
+    subparsers.add_parser("rebuild-search", help="Reconstrói o índice de busca textual")
+    
+    search_parser = subparsers.add_parser("search", help="Busca textual no histórico")
+    search_parser.add_argument("text", help="Termos de busca")
+    search_parser.add_argument("--escola", default=None)
+    search_parser.add_argument("--field", default=None)
+    search_parser.add_argument("--start-date", default=None)
+    search_parser.add_argument("--end-date", default=None)
+    
+    for command, help_text in (("rebuild-index", "Reconstrói o history_index.json"),
+                               ("validate", "Valida a integridade do histórico")):
+        command_parser = subparsers.add_parser(command, help=help_text)
+        command_parser.add_argument("--workers", type=int, default=None, help="Número de workers paralelos")
+        command_parser.add_argument("--threads", action="store_true", help="Usa threads em vez de processos")
+    
+    args = parser.parse_args(argv)
+    history_manager = HistoryManager()
+    
+    def print_progress(done, total):
+        print(f"\r{done}/{total} arquivos", end="", flush=True)
+    
+    if args.command == "rebuild-rollups":
+        result = history_manager.rebuild_history_rollups()
+        print(f"Agregados reconstruídos: {result.get('total_entries', 0)} entradas")
+        return 0 if result.get('success') else 1
+    
+    if args.command == "rebuild-search":
+        result = history_manager.rebuild_search_index()
+        print(f"Índice de busca reconstruído: {result.get('total_entries', 0)} entradas")
+        return 0 if result.get('success') else 1
+    
+    if args.command == "search":
+        results = history_manager.search(args.text, {
+            'escola': args.escola,
+            'field': args.field,
+            'start_date': args.start_date,
+            'end_date': args.end_date
+        }, limit=None)
+        for entry in results:
+            print(f"{entry.get('timestamp', '')} {entry.get('escola', '')} {entry.get('siape', '')} "
+                  f"{entry.get('action', '')} {entry.get('user', '')} {entry.get('field', '')}: "
+                  f"{entry.get('old_value', '')} -> {entry.get('new_value', '')}")
+        print(f"{len(results)} entradas encontradas")
+        return 0
+    
+    if args.command == "rebuild-index":
+        result = history_manager.rebuild_history_index(args.workers, not args.threads, print_progress)
+        print(f"\nÍndice reconstruído: {result['total_teachers']} professores em {result['elapsed_seconds']:.2f}s")
+        for error in result['errors']:
+            print(f"  - {error}")
+        return 0 if result['success'] else 1
+    
+    if args.command == "validate":
+        result = history_manager.validate_history_integrity(args.workers, not args.threads, print_progress)
+        print(f"\n{result['files_checked']} arquivos verificados em {result['elapsed_seconds']:.2f}s")
+        for issue in result['issues']:
+            print(f"  - {issue}")
+        for fixed in result['fixed_issues']:
+            print(f"  * {fixed}")
+        return 0 if result['valid'] else 1
+    
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de Busca do Histórico - Sistema DIRENS
+"""
+
+import os
+import re
+import bisect
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable
+
+from dados.history_journal import JournaledDocument
+
+# Campos da entrada de histórico indexados para busca textual
+SEARCH_FIELDS = ('notes', 'old_value', 'new_value', 'field')
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def normalize_text(text: Any) -> str:
+    """Normaliza texto para busca (minúsculas e sem acentos)"""
+    if text is None:
+        return ''
+    
+    normalized = unicodedata.normalize('NFD', str(text))
+    return ''.join(c for c in normalized if unicodedata.category(c) != 'Mn').lower()
+
+
+def tokenize(text: Any) -> List[str]:
+    """Divide o texto normalizado em termos de busca"""
+    return TOKEN_PATTERN.findall(normalize_text(text))
+
+
+def entry_identity(entry: Dict[str, Any]) -> str:
+    """Identifica uma entrada de histórico (professor, momento e campo)"""
+    return "|".join(str(entry.get(key, '')) for key in ('escola', 'siape', 'timestamp', 'action', 'field'))
+
+
+def build_postings(docs: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    """Índice invertido termo -> posições das entradas em docs"""
+    postings = {}
+    for doc_id, entry in enumerate(docs):
+        add_postings(postings, doc_id, entry)
+    return postings
+
+
+def add_postings(postings: Dict[str, List[int]], doc_id: int, entry: Dict[str, Any]) -> None:
+    """Inclui os termos de uma entrada no índice invertido"""
+    tokens = set()
+    for field in SEARCH_FIELDS:
+        tokens.update(tokenize(entry.get(field)))
+    
+    for token in tokens:
+        postings.setdefault(token, []).append(doc_id)
+
+
+def apply_search_record(document: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """Aplica um registro do diário (op add/remove) ao documento do índice"""
+    docs = document.setdefault("docs", [])
+    postings = document.setdefault("postings", {})
+    
+    if record.get("op") == "remove":
+        # Remoções são raras (limpeza do histórico): o índice invertido é refeito
+        identities = set(record.get("identities", []))
+        document["docs"] = [entry for entry in docs if entry_identity(entry) not in identities]
+        document["postings"] = build_postings(document["docs"])
+    else:
+        entry = record.get("entry", {})
+        docs.append(entry)
+        add_postings(postings, len(docs) - 1, entry)
+
+
+class HistorySearchIndex:
+    """Índice invertido sobre notas, valores e campos das entradas de histórico
+    
+    O índice consolidado (history_search_index.json) é um JournaledDocument:
+    as novas entradas custam uma linha no diário e a consolidação, a
+    numeração dos registros e o descarte de linhas incompletas ficam com
+    ele. O lock é o mesmo que protege as gravações do histórico.
+    """
+    
+    # Cache compartilhado entre instâncias (chave: arquivo do índice)
+    _cache = {}
+    _cache_lock = threading.RLock()
+    
+    def __init__(self, history_dir: str, lock):
+        """Inicializa o índice de busca"""
+        self.history_dir = history_dir
+        self.index_file = os.path.join(history_dir, "history_search_index.json")
+        self.legacy_journal_file = os.path.join(history_dir, "history_search_journal.jsonl")
+        self.document = JournaledDocument(self.index_file, apply_search_record, lock)
+        self.lock = lock
+    
+    def exists(self) -> bool:
+        """Verifica se o índice já foi gerado (diário do formato antigo exige reconstrução)"""
+        return self.document.exists() and not os.path.exists(self.legacy_journal_file)
+    
+    def _file_signature(self, filepath: str):
+        """Assinatura (mtime, tamanho) de um arquivo para invalidar o cache"""
+        try:
+            stat = os.stat(filepath)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+    
+    def _signature(self):
+        """Assinatura combinada do índice e do diário"""
+        return (self._file_signature(self.index_file), self._file_signature(self.document.journal_file))
+    
+    def _load_state(self) -> Dict[str, Any]:
+        """Carrega o índice (consolidado + diário), reutilizando o cache"""
+        with self._cache_lock:
+            signature = self._signature()
+            state = self._cache.get(self.index_file)
+            
+            if state and state["signature"] == signature:
+                return state
+            
+            document = self.document.load()
+            state = {
+                "document": {"docs": document.get("docs", []), "postings": document.get("postings", {})},
+                "vocabulary": None,
+                "signature": signature
+            }
+            self._cache[self.index_file] = state
+            return state
+    
+    def _append_journal(self, records: List[Dict[str, Any]]) -> None:
+        """Acrescenta registros ao diário e ao índice em memória"""
+        with self.lock, self._cache_lock:
+            state = self._load_state()
+            self.document.append(records)
+            
+            for record in records:
+                apply_search_record(state["document"], record)
+            state["vocabulary"] = None
+            state["signature"] = self._signature()
+            
+    def compact(self) -> None:
+        """Consolida o diário no índice principal"""
+        with self.lock, self._cache_lock:
+            self._write_index(self._load_state()["document"]["docs"])
+    
+    def _write_index(self, entries: List[Dict[str, Any]]) -> None:
+        """Grava o índice consolidado (o diário recomeça vazio)"""
+        with self.lock, self._cache_lock:
+            document = {
+                "metadata": {
+                    "updated_at": datetime.now().isoformat(),
+                    "version": "1.0",
+                    "total_docs": len(entries)
+                },
+                "docs": entries,
+                "postings": build_postings(entries)
+            }
+            self.document.write(document)
+            
+            if os.path.exists(self.legacy_journal_file):
+                os.remove(self.legacy_journal_file)
+            
+            self._cache[self.index_file] = {
+                "document": {"docs": document["docs"], "postings": document["postings"]},
+                "vocabulary": None,
+                "signature": self._signature()
+            }
+    
+    def add_entries(self, entries: List[Dict[str, Any]]) -> None:
+        """Indexa novas entradas de histórico"""
+        try:
+            if entries:
+                self._append_journal([{"op": "add", "entry": entry} for entry in entries])
+        except Exception as e:
+            logging.error(f"Erro ao indexar entradas de histórico: {e}")
+    
+    def remove_entries(self, entries: List[Dict[str, Any]]) -> None:
+        """Remove entradas de histórico do índice"""
+        try:
+            if entries:
+                self._append_journal([{
+                    "op": "remove",
+                    "identities": sorted({entry_identity(entry) for entry in entries})
+                }])
+        except Exception as e:
+            logging.error(f"Erro ao remover entradas do índice de busca: {e}")
+    
+    def rebuild(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Reconstrói o índice com o conjunto completo de entradas"""
+        entries = list(entries)
+        self._write_index(entries)
+        return len(entries)
+    
+    def _matching_tokens(self, state: Dict[str, Any], token: str) -> List[str]:
+        """Termos do vocabulário iguais ou iniciados pelo termo buscado"""
+        if state["vocabulary"] is None:
+            state["vocabulary"] = sorted(state["document"]["postings"])
+        
+        vocabulary = state["vocabulary"]
+        matches = []
+        position = bisect.bisect_left(vocabulary, token)
+        
+        while position < len(vocabulary) and vocabulary[position].startswith(token):
+            matches.append(vocabulary[position])
+            position += 1
+        
+        return matches
+    
+    def search(self, text: str, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = 200) -> List[Dict[str, Any]]:
+        """Busca entradas que contenham todos os termos (com prefixo)
+        
+        Filtros aceitos: escola, siape, action, user, field, start_date e
+        end_date (timestamps ISO).
+        """
+        filters = filters or {}
+        state = self._load_state()
+        docs = state["document"]["docs"]
+        postings = state["document"]["postings"]
+        
+        candidates = None
+        for token in set(tokenize(text)):
+            token_docs = set()
+            for matched in self._matching_tokens(state, token):
+                token_docs.update(postings[matched])
+            
+            candidates = token_docs if candidates is None else candidates & token_docs
+            if not candidates:
+                return []
+        
+        if candidates is None:
+            candidates = range(len(docs))
+        
+        start_date = filters.get('start_date')
+        end_date = filters.get('end_date')
+        exact_filters = {
+            key: str(value) for key, value in filters.items()
+            if key in ('escola', 'siape', 'action', 'user', 'field') and value
+        }
+        
+        results = []
+        for doc_id in candidates:
+            entry = docs[doc_id]
+            if any(str(entry.get(key, '')) != value for key, value in exact_filters.items()):
+                continue
+            
+            timestamp = entry.get('timestamp', '')
+            if start_date and timestamp < start_date:
+                continue
+            if end_date and timestamp > end_date:
+                continue
+            
+            result = entry.copy()
+            result["teacher_siape"] = entry.get('siape')
+            result["teacher_escola"] = entry.get('escola')
+            results.append(result)
+        
+        results.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        
+        return results[:limit] if limit else results
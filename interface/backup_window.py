@@ -10,6 +10,9 @@ import os
 import logging
 
 from core.backup_manager import BackupManager
+from core.backup_diff import BackupDiff, LIVE_SOURCE, format_diff_summary
+from core.jobs import job_manager
+from recursos.constants import ESCOLAS
 
 class BackupWindow:
     """Janela para gerenciamento de backups"""
@@ -19,12 +22,14 @@ class BackupWindow:
         self.parent = parent
         self.callback = callback
         self.backup_manager = BackupManager()
+        self.current_job = None
         
         # Cria a janela
         self.window = tk.Toplevel(parent)
         self.window.title("Gerenciamento de Backups")
         self.window.geometry("800x600")
         self.window.resizable(True, True)
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Modal
         self.window.grab_set()
@@ -138,6 +143,30 @@ class BackupWindow:
         # Evento de seleção
         self.tree.bind('<<TreeviewSelect>>', self.on_selection_change)
         
+        # Frame de progresso das operações em segundo plano
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.progress_var = tk.DoubleVar()
+        self.progress_text_var = tk.StringVar(value="Nenhuma operação em andamento")
+        
+        ttk.Progressbar(
+            progress_frame,
+            variable=self.progress_var,
+            maximum=100,
+            length=250
+        ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Label(progress_frame, textvariable=self.progress_text_var).pack(side=tk.LEFT)
+        
+        self.cancel_button = ttk.Button(
+            progress_frame,
+            text="Cancelar",
+            command=self.cancel_job,
+            state=tk.DISABLED
+        )
+        self.cancel_button.pack(side=tk.RIGHT)
+        
         # Frame de ações
         action_frame = ttk.Frame(main_frame)
         action_frame.pack(fill=tk.X)
@@ -149,6 +178,12 @@ class BackupWindow:
             command=self.restore_backup
         ).pack(side=tk.LEFT, padx=5)
         
+        ttk.Button(
+            action_frame,
+            text="Restaurar Seleção",
+            command=self.restore_selective
+        ).pack(side=tk.LEFT, padx=5)
+        
         ttk.Button(
             action_frame,
             text="Excluir",
@@ -161,6 +196,18 @@ class BackupWindow:
             command=self.export_backup
         ).pack(side=tk.LEFT, padx=5)
         
+        ttk.Button(
+            action_frame,
+            text="Verificar",
+            command=self.verify_backup
+        ).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(
+            action_frame,
+            text="Fixar/Liberar",
+            command=self.toggle_pinned
+        ).pack(side=tk.LEFT, padx=5)
+        
         # Configurações de backup automático
         ttk.Separator(action_frame, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=10)
         
@@ -176,7 +223,7 @@ class BackupWindow:
         ttk.Button(
             action_frame,
             text="Fechar",
-            command=self.window.destroy
+            command=self.on_close
         ).pack(side=tk.RIGHT, padx=5)
         
         # Carrega configuração de backup automático
@@ -213,12 +260,10 @@ class BackupWindow:
                 else:
                     formatted_date = ''
                 
-                # Calcula tamanho do arquivo
-                filepath = backup.get('filepath', '')
-                size_str = ''
-                if filepath and os.path.exists(filepath):
-                    size_bytes = os.path.getsize(filepath)
-                    size_str = self.format_file_size(size_bytes)
+                # Tamanho do arquivo (incrementais: bytes novos gravados)
+                size_str = self.format_file_size(backup.get('size', 0))
+                if backup.get('mode') == 'incremental':
+                    size_str += " (incr.)"
                 
                 self.tree.insert('', tk.END, values=(
                     backup.get('name', ''),
@@ -280,7 +325,21 @@ class BackupWindow:
         info += f"Tamanho: {values[2]}\n"
         info += f"Tipo: {backup_info.get('type', 'Manual')}\n"
         info += f"Descrição: {backup_info.get('description', 'Sem descrição')}\n"
-        info += f"Arquivo: {backup_info.get('filepath', 'N/A')}"
+        info += f"Arquivo: {backup_info.get('filepath', 'N/A')}\n"
+        info += f"Fixado: {'Sim' if backup_info.get('pinned') else 'Não'}\n"
+        
+        # Dados do catálogo
+        if backup_info.get('record_counts'):
+            info += f"Professores: {sum(backup_info['record_counts'].values())} em {len(backup_info['record_counts'])} escolas\n"
+        if backup_info.get('file_count'):
+            info += f"Arquivos: {backup_info['file_count']}\n"
+        
+        verified_at = backup_info.get('verified_at')
+        if verified_at:
+            verified_str = datetime.fromisoformat(verified_at).strftime('%d/%m/%Y %H:%M')
+            info += f"Verificação: {backup_info.get('status', 'OK')} em {verified_str}"
+        else:
+            info += "Verificação: pendente"
         
         # Atualiza text widget
         self.info_text.delete(1.0, tk.END)
@@ -297,17 +356,19 @@ class BackupWindow:
                 description = dialog.result.get('description', '')
                 include_history = dialog.result.get('include_history', True)
                 
-                # Cria o backup
-                backup_info = self.backup_manager.create_backup(
+                def on_success(backup_info):
+                    messagebox.showinfo("Sucesso", "Backup criado com sucesso!")
+                    self.load_backups()
+                
+                # Cria o backup em segundo plano
+                self.run_job(
+                    "Criação de backup",
+                    self.backup_manager.create_backup,
+                    on_success,
+                    "Erro ao criar backup",
                     description=description,
                     include_history=include_history
                 )
-                
-                if backup_info:
-                    messagebox.showinfo("Sucesso", "Backup criado com sucesso!")
-                    self.load_backups()
-                else:
-                    messagebox.showerror("Erro", "Erro ao criar backup")
                     
         except Exception as e:
             logging.error(f"Erro ao criar backup: {e}")
@@ -328,10 +389,40 @@ class BackupWindow:
         
         backup_name = values[0]
         
+        def on_diff(diff_result):
+            self.confirm_restore(backup_name, diff_result)
+        
+        def on_diff_error(job):
+            # Sem a prévia, a restauração ainda pode ser confirmada
+            logging.error(f"Erro ao comparar o backup com os dados atuais: {job.error}")
+            self.confirm_restore(backup_name, None)
+        
+        # Mostra o que vai mudar antes de confirmar
+        self.run_job(
+            "Comparação com backup",
+            BackupDiff(self.backup_manager).diff,
+            on_diff,
+            "Erro ao comparar o backup com os dados atuais",
+            LIVE_SOURCE,
+            backup_name,
+            on_error=on_diff_error
+        )
+    
+    def confirm_restore(self, backup_name, diff_result):
+        """Confirma e executa a restauração completa após a comparação
+        
+        diff_result é None quando a comparação falhou.
+        """
+        if diff_result is None:
+            summary = "Não foi possível comparar o backup com os dados atuais."
+        else:
+            summary = format_diff_summary(diff_result)
+        
         # Confirma restauração
         response = messagebox.askyesno(
             "Confirmar Restauração",
             f"Deseja restaurar o backup '{backup_name}'?\n\n"
+            f"{summary}\n\n"
             "ATENÇÃO: Esta ação irá substituir todos os dados atuais!\n"
             "Recomenda-se criar um backup antes de prosseguir."
         )
@@ -340,16 +431,7 @@ class BackupWindow:
             return
         
         try:
-            # Cria backup de segurança antes da restauração
-            self.backup_manager.create_backup(
-                description="Backup automático antes da restauração",
-                backup_type="pre_restore"
-            )
-            
-            # Restaura o backup
-            success = self.backup_manager.restore_backup(backup_name)
-            
-            if success:
+            def on_success(result):
                 messagebox.showinfo(
                     "Sucesso",
                     "Backup restaurado com sucesso!\n\n"
@@ -361,13 +443,169 @@ class BackupWindow:
                     self.callback()
                     
                 self.window.destroy()
-            else:
-                messagebox.showerror("Erro", "Erro ao restaurar backup")
+            
+            # Restaura o backup em segundo plano (o backup de segurança
+            # pre_restore é criado pelo próprio restore_backup)
+            self.run_job(
+                "Restauração de backup",
+                self.backup_manager.restore_backup,
+                on_success,
+                "Erro ao restaurar backup",
+                backup_name
+            )
                 
         except Exception as e:
             logging.error(f"Erro ao restaurar backup: {e}")
             messagebox.showerror("Erro", f"Erro ao restaurar backup:\n{e}")
     
+    def restore_selective(self):
+        """Restaura apenas uma escola ou um professor do backup selecionado"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Aviso", "Selecione um backup para restaurar")
+            return
+        
+        item = selection[0]
+        values = self.tree.item(item)['values']
+        
+        if not values:
+            return
+        
+        backup_name = values[0]
+        
+        try:
+            dialog = SelectiveRestoreDialog(self.window, backup_name)
+            self.window.wait_window(dialog.window)
+            
+            if not dialog.result:
+                return
+            
+            options = dialog.result
+            
+            def on_restored(result):
+                if not result.get('success'):
+                    messagebox.showerror("Erro", "Erro ao restaurar seleção")
+                    return
+                
+                messagebox.showinfo(
+                    "Sucesso",
+                    f"Seleção restaurada com sucesso!\n\n{self.format_selective_summary(result)}"
+                )
+                
+                if self.callback:
+                    self.callback()
+            
+            def on_preview(result):
+                if not result.get('success'):
+                    messagebox.showerror("Erro", "Erro ao comparar o backup com os dados atuais")
+                    return
+                
+                if not result['added'] and not result['modified'] and not result['history_entries']:
+                    messagebox.showinfo("Restauração", "Os dados atuais já correspondem ao backup.")
+                    return
+                
+                response = messagebox.askyesno(
+                    "Confirmar Restauração",
+                    f"Restaurar do backup '{backup_name}':\n\n"
+                    f"{self.format_selective_summary(result)}\n\n"
+                    "Professores que não estão no backup serão mantidos."
+                )
+                
+                if response:
+                    self.run_job(
+                        "Restauração seletiva",
+                        self.backup_manager.restore_selective,
+                        on_restored,
+                        "Erro ao restaurar seleção",
+                        backup_name,
+                        **options
+                    )
+            
+            # Primeiro calcula as diferenças sem alterar nada
+            self.run_job(
+                "Comparação com backup",
+                self.backup_manager.restore_selective,
+                on_preview,
+                "Erro ao comparar o backup com os dados atuais",
+                backup_name,
+                dry_run=True,
+                **options
+            )
+            
+        except Exception as e:
+            logging.error(f"Erro ao restaurar seleção: {e}")
+            messagebox.showerror("Erro", f"Erro ao restaurar seleção:\n{e}")
+    
+    def format_selective_summary(self, result):
+        """Resumo das diferenças de uma restauração seletiva"""
+        lines = [
+            f"Professores incluídos: {len(result['added'])}",
+            f"Professores alterados: {len(result['modified'])}",
+            f"Entradas de histórico: {result['history_entries']}"
+        ]
+        
+        # Mostra alguns campos alterados
+        for siape, changes in list(result['modified'].items())[:5]:
+            lines.append(f"  {siape}: {', '.join(changes)}")
+        if len(result['modified']) > 5:
+            lines.append(f"  ... e mais {len(result['modified']) - 5}")
+        
+        return "\n".join(lines)
+    
+    def verify_backup(self):
+        """Verifica a integridade do backup selecionado"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Aviso", "Selecione um backup para verificar")
+            return
+        
+        item = selection[0]
+        values = self.tree.item(item)['values']
+        
+        if not values:
+            return
+        
+        backup_name = values[0]
+        
+        def on_success(result):
+            if result.get('valid'):
+                messagebox.showinfo(
+                    "Verificação",
+                    f"Backup íntegro: {result['checked_files']} arquivos conferidos."
+                )
+            else:
+                errors = "\n".join(result['errors'][:10])
+                messagebox.showerror("Verificação", f"Backup com problemas:\n\n{errors}")
+            self.load_backups()
+        
+        self.run_job(
+            "Verificação de backup",
+            self.backup_manager.verify_backup,
+            on_success,
+            "Erro ao verificar backup",
+            backup_name
+        )
+    
+    def toggle_pinned(self):
+        """Fixa ou libera o backup selecionado (backups fixados não são removidos na limpeza)"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Aviso", "Selecione um backup")
+            return
+        
+        values = self.tree.item(selection[0])['values']
+        if not values:
+            return
+        
+        backup_info = self.backup_manager.get_backup_info(values[0])
+        if not backup_info:
+            return
+        
+        if self.backup_manager.set_backup_pinned(backup_info['name'], not backup_info.get('pinned')):
+            self.load_backups()
+        else:
+            messagebox.showerror("Erro", "Erro ao fixar backup")
+    
     def delete_backup(self):
         """Exclui um backup selecionado"""
         selection = self.tree.selection()
@@ -394,13 +632,14 @@ class BackupWindow:
             return
         
         try:
-            success = self.backup_manager.delete_backup(backup_name)
+            # Não trava a interface esperando um backup em andamento
+            success = self.backup_manager.delete_backup(backup_name, lock_timeout=5)
             
             if success:
                 messagebox.showinfo("Sucesso", "Backup excluído com sucesso!")
                 self.load_backups()
             else:
-                messagebox.showerror("Erro", "Erro ao excluir backup")
+                messagebox.showerror("Erro", "Erro ao excluir backup.\nSe houver um backup em andamento, tente novamente ao final.")
                 
         except Exception as e:
             logging.error(f"Erro ao excluir backup: {e}")
@@ -435,17 +674,80 @@ class BackupWindow:
             if not filename:
                 return
             
-            success = self.backup_manager.export_backup(backup_name, filename)
-            
-            if success:
+            def on_success(result):
                 messagebox.showinfo("Sucesso", f"Backup exportado para:\n{filename}")
-            else:
-                messagebox.showerror("Erro", "Erro ao exportar backup")
+            
+            self.run_job(
+                "Exportação de backup",
+                self.backup_manager.export_backup,
+                on_success,
+                "Erro ao exportar backup",
+                backup_name,
+                filename
+            )
                 
         except Exception as e:
             logging.error(f"Erro ao exportar backup: {e}")
             messagebox.showerror("Erro", f"Erro ao exportar backup:\n{e}")
     
+    def run_job(self, name, func, on_success, error_message, *args, on_error=None, **kwargs):
+        """Executa uma operação de backup em segundo plano
+        
+        on_error (opcional) recebe a tarefa com falha no lugar da mensagem
+        de erro padrão.
+        """
+        if self.current_job and not self.current_job.is_finished():
+            messagebox.showwarning("Aviso", "Aguarde a operação em andamento terminar")
+            return
+        
+        self.cancel_button.config(state=tk.NORMAL)
+        self.current_job = job_manager.submit(
+            name, func, *args,
+            widget=self.window,
+            on_progress=self.on_job_progress,
+            on_complete=lambda job: self.on_job_complete(job, on_success, error_message, on_error),
+            **kwargs
+        )
+    
+    def on_job_progress(self, job):
+        """Atualiza a barra de progresso (thread do Tk)"""
+        self.progress_var.set(job.get_fraction() * 100)
+        self.progress_text_var.set(job.get_progress_text())
+    
+    def on_job_complete(self, job, on_success, error_message, on_error=None):
+        """Trata o término de uma operação (thread do Tk)"""
+        self.cancel_button.config(state=tk.DISABLED)
+        
+        if job.status == 'done' and job.result:
+            on_success(job.result)
+        elif job.status == 'cancelled':
+            self.progress_var.set(0)
+            messagebox.showinfo("Cancelado", f"{job.name} cancelada")
+        elif on_error:
+            on_error(job)
+        else:
+            messagebox.showerror("Erro", error_message)
+    
+    def cancel_job(self):
+        """Solicita o cancelamento da operação em andamento"""
+        if self.current_job and not self.current_job.is_finished():
+            self.current_job.cancel()
+            self.progress_text_var.set(f"{self.current_job.name}: cancelando...")
+    
+    def on_close(self):
+        """Fecha a janela, cancelando a operação em andamento se confirmado"""
+        if self.current_job and not self.current_job.is_finished():
+            response = messagebox.askyesno(
+                "Operação em andamento",
+                f"{self.current_job.name} ainda está em andamento.\n\n"
+                "Deseja cancelá-la e fechar a janela?"
+            )
+            if not response:
+                return
+            self.current_job.cancel()
+        
+        self.window.destroy()
+    
     def toggle_auto_backup(self):
         """Alterna backup automático"""
         enabled = self.auto_backup_var.get()
@@ -565,3 +867,117 @@ class BackupCreateDialog:
         """Cancela criação"""
         self.result = None
         self.window.destroy()
+
+
+class SelectiveRestoreDialog:
+    """Diálogo para escolher a escola ou o professor a restaurar"""
+    
+    def __init__(self, parent, backup_name):
+        """Inicializa o diálogo"""
+        self.parent = parent
+        self.backup_name = backup_name
+        self.result = None
+        
+        # Cria a janela
+        self.window = tk.Toplevel(parent)
+        self.window.title("Restaurar Seleção")
+        self.window.geometry("400x320")
+        self.window.resizable(False, False)
+        
+        # Modal
+        self.window.grab_set()
+        self.window.focus_set()
+        
+        # Centraliza
+        self.center_window()
+        
+        # Cria a interface
+        self.create_widgets()
+    
+    def center_window(self):
+        """Centraliza a janela"""
+        self.window.update_idletasks()
+        
+        parent_x = self.parent.winfo_x()
+        parent_y = self.parent.winfo_y()
+        parent_width = self.parent.winfo_width()
+        parent_height = self.parent.winfo_height()
+        
+        width = 400
+        height = 320
+        
+        x = parent_x + (parent_width - width) // 2
+        y = parent_y + (parent_height - height) // 2
+        
+        self.window.geometry(f"{width}x{height}+{x}+{y}")
+    
+    def create_widgets(self):
+        """Cria os widgets do diálogo"""
+        main_frame = ttk.Frame(self.window, padding="20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Título
+        ttk.Label(
+            main_frame,
+            text="Restaurar Escola ou Professor",
+            font=("Arial", 14, "bold")
+        ).pack(pady=(0, 5))
+        
+        ttk.Label(main_frame, text=f"Backup: {self.backup_name}").pack(pady=(0, 15))
+        
+        # Escola
+        ttk.Label(main_frame, text="Escola:").pack(anchor=tk.W, pady=(0, 5))
+        self.school_var = tk.StringVar()
+        ttk.Combobox(
+            main_frame,
+            textvariable=self.school_var,
+            values=list(ESCOLAS.keys()),
+            state="readonly"
+        ).pack(fill=tk.X, pady=(0, 10))
+        
+        # SIAPE (opcional)
+        ttk.Label(main_frame, text="SIAPE (vazio para a escola inteira):").pack(anchor=tk.W, pady=(0, 5))
+        self.siape_var = tk.StringVar()
+        ttk.Entry(main_frame, textvariable=self.siape_var).pack(fill=tk.X, pady=(0, 10))
+        
+        self.include_history_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            main_frame,
+            text="Restaurar histórico de alterações",
+            variable=self.include_history_var
+        ).pack(anchor=tk.W)
+        
+        # Botões
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=15)
+        
+        ttk.Button(
+            button_frame,
+            text="Continuar",
+            command=self.confirm
+        ).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(
+            button_frame,
+            text="Cancelar",
+            command=self.cancel
+        ).pack(side=tk.LEFT, padx=5)
+    
+    def confirm(self):
+        """Confirma a seleção"""
+        school = self.school_var.get()
+        if not school:
+            messagebox.showwarning("Aviso", "Selecione uma escola", parent=self.window)
+            return
+        
+        self.result = {
+            'school': school,
+            'siape': self.siape_var.get().strip() or None,
+            'include_history': self.include_history_var.get()
+        }
+        self.window.destroy()
+    
+    def cancel(self):
+        """Cancela a restauração"""
+        self.result = None
+        self.window.destroy()
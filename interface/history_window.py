@@ -6,6 +6,7 @@ Janela de Histórico do Professor - Sistema DIRENS
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
+from itertools import chain, islice
 import logging
 
 from dados.history_manager import HistoryManager
@@ -13,12 +14,21 @@ from dados.history_manager import HistoryManager
 class HistoryWindow:
     """Janela para visualização do histórico de alterações"""
     
+    # Quantidade de entradas carregadas por página
+    PAGE_SIZE = 100
+    
     def __init__(self, parent, siape, school):
         """Inicializa a janela de histórico"""
         self.parent = parent
         self.siape = siape
         self.school = school
         self.history_manager = HistoryManager()
+        self.search_var = tk.StringVar()
+        self.search_scope_var = tk.StringVar(value="Este professor")
+        self.history_iterator = None
+        self.has_more_history = False
+        self.loaded_entries = 0
+        self.loading_page = False
         
         # Cria a janela
         self.window = tk.Toplevel(parent)
@@ -79,12 +89,42 @@ class HistoryWindow:
             command=self.load_history
         ).pack(side=tk.RIGHT)
         
+        # Busca textual no histórico
+        search_frame = ttk.Frame(main_frame)
+        search_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(search_frame, text="Buscar no histórico:").pack(side=tk.LEFT, padx=(0, 5))
+        
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=35)
+        search_entry.pack(side=tk.LEFT, padx=(0, 5))
+        search_entry.bind('<Return>', lambda e: self.search_history())
+        
+        ttk.Combobox(
+            search_frame,
+            textvariable=self.search_scope_var,
+            values=["Este professor", "Esta escola", "Todas as escolas"],
+            state="readonly",
+            width=16
+        ).pack(side=tk.LEFT, padx=(0, 5))
+        
+        ttk.Button(
+            search_frame,
+            text="Buscar",
+            command=self.search_history
+        ).pack(side=tk.LEFT, padx=2)
+        
+        ttk.Button(
+            search_frame,
+            text="Limpar",
+            command=self.clear_search
+        ).pack(side=tk.LEFT, padx=2)
+        
         # Frame da lista
         list_frame = ttk.Frame(main_frame)
         list_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
         # Treeview com scrollbars
-        columns = ("Data/Hora", "Ação", "Usuário", "Campo", "Valor Anterior", "Valor Novo")
+        columns = ("Data/Hora", "Ação", "Usuário", "Campo", "Valor Anterior", "Valor Novo", "Escola", "SIAPE")
         
         self.tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=15)
         
@@ -95,7 +135,9 @@ class HistoryWindow:
             "Usuário": 120,
             "Campo": 150,
             "Valor Anterior": 200,
-            "Valor Novo": 200
+            "Valor Novo": 200,
+            "Escola": 80,
+            "SIAPE": 80
         }
         
         for col in columns:
@@ -106,7 +148,8 @@ class HistoryWindow:
         v_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
         h_scrollbar = ttk.Scrollbar(list_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
         
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.v_scrollbar = v_scrollbar
+        self.tree.configure(yscrollcommand=self.on_tree_scroll, xscrollcommand=h_scrollbar.set)
         
         # Grid layout
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -155,75 +198,149 @@ class HistoryWindow:
         ).pack(side=tk.RIGHT, padx=5)
     
     def load_history(self):
-        """Carrega o histórico do professor"""
+        """Carrega o histórico do professor (primeira página, mais recente primeiro)"""
         try:
             # Limpa a lista
             for item in self.tree.get_children():
                 self.tree.delete(item)
             
-            # Carrega histórico
-            history = self.history_manager.get_teacher_history(self.siape, self.school)
+            # Páginas seguintes são lidas sob demanda ao rolar a lista
+            self.history_iterator = self.history_manager.iter_teacher_history(self.siape, self.school)
+            self.has_more_history = True
+            self.loaded_entries = 0
+            
+            self.load_next_page()
             
-            if not history:
+            if self.loaded_entries == 0:
                 # Adiciona mensagem se não há histórico
                 self.tree.insert('', tk.END, values=(
-                    "Nenhum histórico encontrado", "", "", "", "", ""
+                    "Nenhum histórico encontrado", "", "", "", "", "", "", ""
                 ))
                 self.stats_var.set("Nenhuma alteração registrada")
                 return
             
-            # Ordena por data (mais recente primeiro)
-            history.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+            # Atualiza estatísticas
+            self.update_statistics()
+            
+        except Exception as e:
+            logging.error(f"Erro ao carregar histórico: {e}")
+            messagebox.showerror("Erro", f"Erro ao carregar histórico:\n{e}")
+    
+    def load_next_page(self):
+        """Acrescenta a próxima página do histórico à lista"""
+        if not self.has_more_history or self.loading_page or self.history_iterator is None:
+            return
+        
+        self.loading_page = True
+        try:
+            page = list(islice(self.history_iterator, self.PAGE_SIZE))
+            self.has_more_history = len(page) == self.PAGE_SIZE
             
             # Adiciona itens à lista
-            for entry in history:
-                timestamp = entry.get('timestamp', '')
-                if timestamp:
-                    try:
-                        # Converte timestamp para formato legível
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        formatted_date = dt.strftime('%d/%m/%Y %H:%M')
-                    except:
-                        formatted_date = timestamp
-                else:
-                    formatted_date = ''
-                
+            for entry in page:
                 self.tree.insert('', tk.END, values=(
-                    formatted_date,
+                    self.format_timestamp(entry.get('timestamp', '')),
                     entry.get('action', ''),
                     entry.get('user', ''),
                     entry.get('field', ''),
                     entry.get('old_value', ''),
-                    entry.get('new_value', '')
+                    entry.get('new_value', ''),
+                    self.school,
+                    self.siape
                 ))
             
-            # Atualiza estatísticas
-            self.update_statistics(history)
+            self.loaded_entries += len(page)
             
         except Exception as e:
-            logging.error(f"Erro ao carregar histórico: {e}")
-            messagebox.showerror("Erro", f"Erro ao carregar histórico:\n{e}")
+            logging.error(f"Erro ao carregar página do histórico: {e}")
+            self.has_more_history = False
+        finally:
+            self.loading_page = False
     
-    def update_statistics(self, history):
-        """Atualiza as estatísticas do histórico"""
-        if not history:
-            self.stats_var.set("Nenhuma alteração registrada")
-            return
+    def on_tree_scroll(self, first, last):
+        """Atualiza a barra de rolagem e carrega mais entradas perto do fim"""
+        self.v_scrollbar.set(first, last)
         
-        # Conta ações
-        actions = {}
-        users = set()
+        if self.has_more_history and not self.loading_page and float(last) >= 0.95:
+            self.window.after_idle(self.load_next_page)
+    
+    def search_history(self):
+        """Busca textual no histórico (professor, escola ou todas as escolas)"""
+        text = self.search_var.get().strip()
+        if not text:
+            self.load_history()
+            return
         
-        for entry in history:
-            action = entry.get('action', 'Desconhecida')
-            user = entry.get('user', 'Desconhecido')
+        try:
+            filters = {}
+            scope = self.search_scope_var.get()
+            if scope == "Este professor":
+                filters = {'escola': self.school, 'siape': self.siape}
+            elif scope == "Esta escola":
+                filters = {'escola': self.school}
+            
+            results = self.history_manager.search(text, filters, limit=500)
+            
+            # Resultados da busca não são paginados
+            self.history_iterator = None
+            self.has_more_history = False
             
-            actions[action] = actions.get(action, 0) + 1
-            users.add(user)
+            # Limpa a lista
+            for item in self.tree.get_children():
+                self.tree.delete(item)
+            
+            if not results:
+                self.tree.insert('', tk.END, values=(
+                    "Nenhum resultado encontrado", "", "", "", "", "", "", ""
+                ))
+                self.stats_var.set(f"Busca por \"{text}\": nenhum resultado")
+                return
+            
+            for entry in results:
+                self.tree.insert('', tk.END, values=(
+                    self.format_timestamp(entry.get('timestamp', '')),
+                    entry.get('action', ''),
+                    entry.get('user', ''),
+                    entry.get('field', ''),
+                    entry.get('old_value', ''),
+                    entry.get('new_value', ''),
+                    entry.get('escola', ''),
+                    entry.get('siape', '')
+                ))
+            
+            self.stats_var.set(f"Busca por \"{text}\": {len(results)} resultado(s)")
+            
+        except Exception as e:
+            logging.error(f"Erro na busca do histórico: {e}")
+            messagebox.showerror("Erro", f"Erro na busca do histórico:\n{e}")
+    
+    def clear_search(self):
+        """Limpa a busca e volta ao histórico do professor"""
+        self.search_var.set("")
+        self.load_history()
+    
+    def format_timestamp(self, timestamp):
+        """Converte timestamp ISO para formato legível"""
+        if not timestamp:
+            return ''
+        
+        try:
+            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            return dt.strftime('%d/%m/%Y %H:%M')
+        except:
+            return timestamp
+    
+    def update_statistics(self):
+        """Atualiza as estatísticas do histórico a partir dos agregados"""
+        stats = self.history_manager.get_teacher_history_statistics(self.siape, self.school)
+        
+        if not stats or not stats.get('total_entries'):
+            self.stats_var.set("Nenhuma alteração registrada")
+            return
         
         # Primeira e última alteração
-        first_change = history[-1].get('timestamp', '')
-        last_change = history[0].get('timestamp', '')
+        first_change = stats.get('first_entry') or ''
+        last_change = stats.get('last_entry') or ''
         
         try:
             if first_change:
@@ -231,7 +348,7 @@ class HistoryWindow:
                 first_formatted = first_dt.strftime('%d/%m/%Y')
             else:
                 first_formatted = 'N/A'
-                
+            
             if last_change:
                 last_dt = datetime.fromisoformat(last_change.replace('Z', '+00:00'))
                 last_formatted = last_dt.strftime('%d/%m/%Y')
@@ -242,8 +359,8 @@ class HistoryWindow:
             last_formatted = 'N/A'
         
         # Monta string de estatísticas
-        stats_text = f"Total de alterações: {len(history)} | "
-        stats_text += f"Usuários envolvidos: {len(users)} | "
+        stats_text = f"Total de alterações: {stats['total_entries']} | "
+        stats_text += f"Usuários envolvidos: {len(stats.get('users_count', {}))} | "
         stats_text += f"Primeira alteração: {first_formatted} | "
         stats_text += f"Última alteração: {last_formatted}"
         
@@ -271,6 +388,9 @@ class HistoryWindow:
         details += f"Valor anterior: {values[4]}\n"
         details += f"Valor novo: {values[5]}"
         
+        if len(values) >= 8 and values[6]:
+            details += f"\nProfessor: {values[7]} - {values[6]}"
+        
         # Atualiza text widget
         self.details_text.delete(1.0, tk.END)
         self.details_text.insert(1.0, details)
@@ -291,10 +411,11 @@ class HistoryWindow:
             if not filename:
                 return
             
-            # Carrega dados
-            history = self.history_manager.get_teacher_history(self.siape, self.school)
+            # Lê o histórico do disco à medida que grava (mais antigo primeiro)
+            history = self.history_manager.iter_teacher_history(self.siape, self.school, newest_first=False)
+            first_entry = next(history, None)
             
-            if not history:
+            if first_entry is None:
                 messagebox.showwarning("Aviso", "Não há histórico para exportar")
                 return
             
@@ -311,7 +432,7 @@ class HistoryWindow:
                 ])
                 
                 # Dados
-                for entry in sorted(history, key=lambda x: x.get('timestamp', '')):
+                for entry in chain([first_entry], history):
                     timestamp = entry.get('timestamp', '')
                     if timestamp:
                         try:
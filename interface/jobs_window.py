@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Janela de Tarefas em Segundo Plano - Sistema DIRENS
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox
+import logging
+
+from core.jobs import job_manager
+
+# Intervalo (ms) entre atualizações da lista de tarefas
+REFRESH_INTERVAL_MS = 500
+
+STATUS_LABELS = {
+    'pending': "Aguardando",
+    'running': "Em execução",
+    'done': "Concluída",
+    'failed': "Erro",
+    'cancelled': "Cancelada"
+}
+
+
+class JobsWindow:
+    """Painel com as tarefas em execução e as já terminadas"""
+    
+    def __init__(self, parent):
+        """Inicializa a janela de tarefas"""
+        self.parent = parent
+        self.jobs = {}
+        self.refresh_id = None
+        
+        # Cria a janela (não modal: as tarefas continuam enquanto ela está aberta)
+        self.window = tk.Toplevel(parent)
+        self.window.title("Tarefas em Segundo Plano")
+        self.window.geometry("700x350")
+        self.window.resizable(True, True)
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        self.create_widgets()
+        self.refresh()
+    
+    def create_widgets(self):
+        """Cria os widgets da interface"""
+        main_frame = ttk.Frame(self.window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        columns = ("nome", "status", "progresso")
+        self.tree = ttk.Treeview(main_frame, columns=columns, show="headings", selectmode="browse")
+        self.tree.heading("nome", text="Nome")
+        self.tree.heading("status", text="Status")
+        self.tree.heading("progresso", text="Progresso")
+        self.tree.column("nome", width=180)
+        self.tree.column("status", width=100)
+        self.tree.column("progresso", width=380)
+        
+        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        button_frame = ttk.Frame(self.window, padding=(10, 0, 10, 10))
+        button_frame.pack(fill=tk.X)
+        
+        ttk.Button(button_frame, text="Cancelar Tarefa", command=self.cancel_selected).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="Limpar Concluídas", command=self.clear_finished).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Fechar", command=self.on_close).pack(side=tk.RIGHT)
+    
+    def refresh(self):
+        """Atualiza a lista com o estado atual das tarefas"""
+        try:
+            jobs = job_manager.get_jobs()
+            self.jobs = {str(id(job)): job for job in jobs}
+            
+            for item in self.tree.get_children():
+                if item not in self.jobs:
+                    self.tree.delete(item)
+            
+            for item, job in self.jobs.items():
+                values = (job.name, STATUS_LABELS.get(job.status, job.status), job.get_progress_text())
+                if self.tree.exists(item):
+                    self.tree.item(item, values=values)
+                else:
+                    self.tree.insert("", tk.END, iid=item, values=values)
+            
+            self.refresh_id = self.window.after(REFRESH_INTERVAL_MS, self.refresh)
+        except Exception as e:
+            logging.error(f"Erro ao atualizar tarefas: {e}")
+    
+    def cancel_selected(self):
+        """Cancela a tarefa selecionada"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("Aviso", "Selecione uma tarefa.", parent=self.window)
+            return
+        
+        job = self.jobs.get(selection[0])
+        if job is None or job.is_finished():
+            messagebox.showinfo("Informação", "A tarefa já terminou.", parent=self.window)
+            return
+        
+        if messagebox.askyesno("Cancelar", f"Cancelar a tarefa '{job.name}'?", parent=self.window):
+            job.cancel()
+    
+    def clear_finished(self):
+        """Remove da lista as tarefas terminadas"""
+        job_manager.clear_finished()
+        self.refresh_now()
+    
+    def refresh_now(self):
+        """Atualiza a lista imediatamente, reiniciando o agendamento"""
+        if self.refresh_id:
+            self.window.after_cancel(self.refresh_id)
+        self.refresh()
+    
+    def on_close(self):
+        """Fecha a janela (as tarefas continuam em execução)"""
+        if self.refresh_id:
+            self.window.after_cancel(self.refresh_id)
+            self.refresh_id = None
+        self.window.destroy()
@@ -4,7 +4,7 @@ Janela Principal do Sistema DIRENS
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import logging
 from datetime import datetime
 
@@ -16,9 +16,16 @@ from interface.statistics_window import StatisticsWindow
 from interface.discipline_form import DisciplineFormWindow
 from interface.schools_window import SchoolsWindow
 from interface.column_order_window import ColumnOrderWindow
+from interface.jobs_window import JobsWindow
 from core.teacher_manager import TeacherManager
 from core.export_manager import ExportManager
 from core.discipline_manager import DisciplineManager
+from core.backup_manager import BackupManager
+from core.batch_export import BatchExporter
+from core.delta_export import DeltaExporter
+from core.import_manager import ImportManager
+from core.consistency_scan import ConsistencyScanner
+from core.jobs import job_manager
 from recursos.constants import CARGAS_HORARIAS, CARREIRAS, POS_GRADUACAO
 
 class MainWindow:
@@ -74,6 +81,9 @@ class MainWindow:
         
         # Carrega dados iniciais (depois da criação da interface)
         self.refresh_data()
+        
+        # Backup automático em segundo plano (não bloqueia a interface)
+        self.root.after(5000, self.start_auto_backup)
     
     def get_teachers_data(self, include_deleted=False):
         """Obtém dados de professores - todos se DIRENS, ou apenas da escola atual"""
@@ -113,8 +123,13 @@ class MainWindow:
         menubar.add_cascade(label="Arquivo", menu=arquivo_menu)
         arquivo_menu.add_command(label="Novo Professor", command=self.new_teacher, accelerator="Ctrl+N")
         arquivo_menu.add_command(label="Nova Disciplina", command=self.new_discipline, accelerator="Ctrl+D")
+        arquivo_menu.add_command(label="Importar Professores...", command=self.import_teachers)
         arquivo_menu.add_separator()
         arquivo_menu.add_command(label="Exportar CSV", command=self.export_csv)
+        arquivo_menu.add_command(label="Exportar JSON Lines", command=self.export_jsonl)
+        arquivo_menu.add_command(label="Exportar Excel", command=self.export_excel)
+        arquivo_menu.add_command(label="Relatórios por Escola...", command=self.export_by_school)
+        arquivo_menu.add_command(label="Exportar Alterações...", command=self.export_delta)
         arquivo_menu.add_command(label="Exportar PDF", command=self.export_pdf)
         arquivo_menu.add_separator()
         arquivo_menu.add_command(label="Sair", command=self.on_close, accelerator="Ctrl+Q")
@@ -136,6 +151,8 @@ class MainWindow:
         tools_menu.add_separator()
         tools_menu.add_command(label="Estatísticas", command=self.show_statistics)
         tools_menu.add_command(label="Backups", command=self.show_backups)
+        tools_menu.add_command(label="Verificar Consistência", command=self.scan_consistency)
+        tools_menu.add_command(label="Tarefas em Segundo Plano", command=self.show_jobs)
         tools_menu.add_command(label="Atualizar", command=self.refresh_data, accelerator="F5")
         
         # Menu Ajuda
@@ -467,6 +484,10 @@ class MainWindow:
         
         ttk.Label(status_frame, textvariable=self.status_var).pack(side=tk.LEFT, padx=10, pady=5)
         
+        # Progresso das tarefas em segundo plano
+        self.job_status_var = tk.StringVar()
+        ttk.Label(status_frame, textvariable=self.job_status_var).pack(side=tk.LEFT, padx=10, pady=5)
+        
         # Data/hora atual
         self.datetime_var = tk.StringVar()
         ttk.Label(status_frame, textvariable=self.datetime_var).pack(side=tk.RIGHT, padx=10, pady=5)
@@ -480,6 +501,62 @@ class MainWindow:
         self.datetime_var.set(now.strftime("%d/%m/%Y %H:%M:%S"))
         self.root.after(1000, self.update_datetime)
     
+    def start_auto_backup(self):
+        """Inicia o backup automático em segundo plano, se necessário"""
+        try:
+            backup_manager = BackupManager()
+            already_running = any(job.name == "Backup automático" for job in job_manager.get_running_jobs())
+            
+            if not already_running and backup_manager.should_create_auto_backup():
+                job_manager.submit(
+                    "Backup automático",
+                    backup_manager.create_auto_backup_if_needed,
+                    widget=self.root,
+                    on_progress=lambda job: self.job_status_var.set(job.get_progress_text()),
+                    on_complete=self.on_auto_backup_complete
+                )
+            elif not already_running:
+                self.start_backup_verification()
+        except Exception as e:
+            logging.error(f"Erro ao iniciar backup automático: {e}")
+        
+        # Verifica novamente a cada hora (sessões longas)
+        self.root.after(3600 * 1000, self.start_auto_backup)
+    
+    def on_auto_backup_complete(self, job):
+        """Callback de término do backup automático (thread do Tk)"""
+        self.job_status_var.set(job.get_progress_text())
+        self.root.after(10000, lambda: self.job_status_var.set(""))
+    
+        # Verifica os backups pendentes logo após o backup automático
+        self.start_backup_verification()
+    
+    def start_backup_verification(self):
+        """Inicia a verificação periódica dos backups em segundo plano"""
+        try:
+            backup_manager = BackupManager()
+            busy = any(job.name in ("Backup automático", "Verificação de backups")
+                       for job in job_manager.get_running_jobs())
+            
+            if not busy and backup_manager.get_backups_to_verify():
+                job_manager.submit(
+                    "Verificação de backups",
+                    backup_manager.verify_backups,
+                    widget=self.root,
+                    on_complete=self.on_backup_verification_complete
+                )
+        except Exception as e:
+            logging.error(f"Erro ao iniciar verificação de backups: {e}")
+    
+    def on_backup_verification_complete(self, job):
+        """Avisa sobre backups com problemas (thread do Tk)"""
+        if job.status == 'done' and job.result:
+            self.job_status_var.set(f"Backups com problemas: {', '.join(job.result)}")
+            messagebox.showwarning(
+                "Backups",
+                "Os seguintes backups não passaram na verificação:\n\n" + "\n".join(job.result)
+            )
+    
     def refresh_data(self):
         """Atualiza a lista de professores"""
         try:
@@ -825,20 +902,203 @@ class MainWindow:
             raise e
     
     def export_csv(self):
-        """Exporta para CSV"""
+        """Exporta para CSV em segundo plano"""
+        # Gerador: os registros vão direto do arquivo para o CSV
+        professores = self.teacher_manager.iter_teachers(self.sistema.current_school)
+        self.run_export_job("Exportação CSV", self.export_manager.export_csv,
+                            professores, self.sistema.current_school)
+    
+    def run_export_job(self, name, export_method, *args, **kwargs):
+        """Executa uma exportação como tarefa com progresso e cancelamento
+        
+        O andamento (linhas processadas) aparece na barra de status e no
+        painel de tarefas; ao cancelar, o arquivo parcial é removido. Se os
+        dados não mudaram desde uma exportação igual, o arquivo é reaproveitado.
+        """
         try:
-            self.status_var.set("Exportando CSV...")
+            self.status_var.set(f"{name} em andamento...")
+            job_manager.submit(
+                name,
+                self.export_manager.export_cached,
+                export_method,
+                *args,
+                widget=self.root,
+                on_progress=lambda job: self.job_status_var.set(job.get_progress_text()),
+                on_complete=self.on_export_job_complete,
+                unit="linhas",
+                data_version=self.teacher_manager.data_manager.get_data_version(),
+                **kwargs
+            )
+        except Exception as e:
+            logging.error(f"Erro ao iniciar {name}: {e}")
+            self.status_var.set("Erro na exportação")
+            messagebox.showerror("Erro", f"Erro ao iniciar {name}:\n{e}")
             
-            professores = self.get_teachers_data()
-            filepath = self.export_manager.export_csv(professores, self.sistema.current_school)
+    def on_export_job_complete(self, job):
+        """Callback de término de uma exportação (thread do Tk)"""
+        self.job_status_var.set(job.get_progress_text())
+        self.root.after(10000, lambda: self.job_status_var.set(""))
             
-            self.status_var.set("CSV exportado com sucesso")
-            messagebox.showinfo("Sucesso", f"Dados exportados para:\n{filepath}")
+        if job.status == 'done':
+            self.status_var.set(f"{job.name} concluída")
+            messagebox.showinfo("Sucesso", f"Dados exportados para:\n{job.result}")
+        elif job.status == 'cancelled':
+            self.status_var.set(f"{job.name} cancelada")
+        else:
+            self.status_var.set("Erro na exportação")
+            messagebox.showerror("Erro", f"Erro na {job.name}:\n{job.error}")
+    
+    def export_excel(self):
+        """Exporta para Excel (uma planilha por escola opcional na visão DIRENS)"""
+        split_by_school = False
+        if self.sistema.current_school == "DIRENS":
+            split_by_school = messagebox.askyesno("Exportar Excel", "Gerar uma planilha por escola?")
             
+        professores = self.teacher_manager.iter_teachers(self.sistema.current_school)
+        self.run_export_job("Exportação Excel", self.export_manager.export_excel,
+                            professores, self.sistema.current_school, split_by_school=split_by_school)
+    
+    def import_teachers(self):
+        """Importa professores de um arquivo CSV/XLSX em segundo plano"""
+        filepath = filedialog.askopenfilename(
+            parent=self.root,
+            title="Importar Professores",
+            filetypes=[("Planilhas", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")]
+        )
+        if not filepath:
+            return
+        
+        try:
+            self.status_var.set("Importando professores...")
+            job_manager.submit(
+                "Importação de professores",
+                ImportManager(self.teacher_manager, self.export_manager.exports_dir).import_file,
+                filepath,
+                self.sistema.current_school,
+                self.sistema.current_user,
+                widget=self.root,
+                on_progress=lambda job: self.job_status_var.set(job.get_progress_text()),
+                on_complete=self.on_import_complete,
+                unit="linhas"
+            )
         except Exception as e:
-            logging.error(f"Erro ao exportar CSV: {e}")
-            self.status_var.set("Erro na exportação")
-            messagebox.showerror("Erro", f"Erro ao exportar CSV:\n{e}")
+            logging.error(f"Erro ao iniciar importação: {e}")
+            self.status_var.set("Erro na importação")
+            messagebox.showerror("Erro", f"Erro ao importar professores:\n{e}")
+    
+    def on_import_complete(self, job):
+        """Callback de término da importação (thread do Tk)"""
+        self.job_status_var.set(job.get_progress_text())
+        self.root.after(10000, lambda: self.job_status_var.set(""))
+        
+        if job.status == 'done':
+            result = job.result
+            self.status_var.set(f"{result['imported']} professores importados")
+            self.refresh_data()
+            
+            message = f"Professores importados: {result['imported']}\nLinhas rejeitadas: {result['rejected']}"
+            if result['error_report']:
+                message += f"\n\nRelatório de erros:\n{result['error_report']}"
+            if result['unknown_columns']:
+                message += f"\n\nColunas ignoradas: {', '.join(result['unknown_columns'])}"
+            messagebox.showinfo("Importação", message)
+        elif job.status == 'cancelled':
+            self.status_var.set("Importação cancelada")
+        else:
+            self.status_var.set("Erro na importação")
+            messagebox.showerror("Erro", f"Erro ao importar professores:\n{job.error}")
+    
+    def export_delta(self):
+        """Exporta em segundo plano só os professores alterados desde a última vez"""
+        school = self.sistema.current_school
+        
+        try:
+            delta_exporter = DeltaExporter(self.export_manager.exports_dir, teacher_manager=self.teacher_manager)
+            watermark = delta_exporter.get_watermark(school)
+            since_text = watermark[:19].replace('T', ' ') if watermark else "o início (exportação completa)"
+            
+            response = messagebox.askyesnocancel(
+                "Exportar Alterações",
+                f"Serão exportadas as alterações desde {since_text}.\n\n"
+                "Sim: CSV    Não: JSON Lines"
+            )
+            if response is None:
+                return
+            
+            job_manager.submit(
+                "Exportação de alterações",
+                delta_exporter.export,
+                school,
+                'csv' if response else 'jsonl',
+                widget=self.root,
+                on_progress=lambda job: self.job_status_var.set(job.get_progress_text()),
+                on_complete=self.on_export_delta_complete,
+                unit="linhas"
+            )
+        except Exception as e:
+            logging.error(f"Erro ao iniciar exportação de alterações: {e}")
+            messagebox.showerror("Erro", f"Erro ao exportar alterações:\n{e}")
+    
+    def on_export_delta_complete(self, job):
+        """Callback de término da exportação de alterações (thread do Tk)"""
+        self.job_status_var.set(job.get_progress_text())
+        self.root.after(10000, lambda: self.job_status_var.set(""))
+        
+        if job.status == 'done':
+            messagebox.showinfo(
+                "Sucesso",
+                f"{job.result['total']} professores alterados exportados para:\n{job.result['filepath']}"
+            )
+        elif job.status == 'failed':
+            messagebox.showerror("Erro", f"Erro ao exportar alterações:\n{job.error}")
+    
+    def export_by_school(self):
+        """Gera em segundo plano um relatório por escola, reunidos em um ZIP"""
+        if self.sistema.current_school != "DIRENS":
+            messagebox.showwarning("Aviso", "Relatórios por escola estão disponíveis apenas na visão DIRENS.")
+            return
+        
+        response = messagebox.askyesnocancel(
+            "Relatórios por Escola",
+            "Serão gerados os relatórios PDF de todas as escolas.\n\n"
+            "Incluir também as planilhas Excel?"
+        )
+        if response is None:
+            return
+        
+        formats = ('pdf', 'excel') if response else ('pdf',)
+        
+        try:
+            job_manager.submit(
+                "Relatórios por escola",
+                BatchExporter(self.export_manager.exports_dir).export_all,
+                formats,
+                widget=self.root,
+                on_progress=lambda job: self.job_status_var.set(job.get_progress_text()),
+                on_complete=self.on_export_by_school_complete
+            )
+        except Exception as e:
+            logging.error(f"Erro ao iniciar relatórios por escola: {e}")
+            messagebox.showerror("Erro", f"Erro ao gerar relatórios:\n{e}")
+    
+    def on_export_by_school_complete(self, job):
+        """Callback de término dos relatórios por escola (thread do Tk)"""
+        self.job_status_var.set(job.get_progress_text())
+        self.root.after(10000, lambda: self.job_status_var.set(""))
+        
+        if job.status == 'done' and job.result:
+            message = f"Relatórios exportados para:\n{job.result['filepath']}"
+            if job.result['errors']:
+                message += f"\n\nEscolas com erro: {', '.join(job.result['errors'])}"
+            messagebox.showinfo("Sucesso", message)
+        elif job.status == 'failed':
+            messagebox.showerror("Erro", f"Erro ao gerar relatórios:\n{job.error}")
+    
+    def export_jsonl(self):
+        """Exporta para JSON Lines em segundo plano"""
+        professores = self.teacher_manager.iter_teachers(self.sistema.current_school)
+        self.run_export_job("Exportação JSON Lines", self.export_manager.export_jsonl,
+                            professores, self.sistema.current_school)
     
     def export_pdf(self):
         """Abre janela de seleção de campos e exporta PDF"""
@@ -852,22 +1112,13 @@ class MainWindow:
             
             # Callback quando campos forem selecionados
             def on_fields_selected(selected_fields):
-                try:
-                    self.status_var.set("Exportando PDF...")
-                    
-                    filepath = self.export_manager.export_pdf_with_fields(
-                        professores, 
-                        self.sistema.current_school,
-                        selected_fields
-                    )
-                    
-                    self.status_var.set("PDF exportado com sucesso")
-                    messagebox.showinfo("Sucesso", f"Relatório exportado para:\n{filepath}")
-                    
-                except Exception as e:
-                    logging.error(f"Erro ao exportar PDF: {e}")
-                    self.status_var.set("Erro na exportação")
-                    messagebox.showerror("Erro", f"Erro ao exportar PDF:\n{e}")
+                self.run_export_job(
+                    "Exportação PDF",
+                    self.export_manager.export_pdf_with_fields,
+                    professores,
+                    self.sistema.current_school,
+                    selected_fields
+                )
             
             # Abre janela de seleção de campos
             field_selector = FieldSelectorWindow(self.root, on_fields_selected)
@@ -877,6 +1128,50 @@ class MainWindow:
             self.status_var.set("Erro na exportação")
             messagebox.showerror("Erro", f"Erro ao exportar PDF:\n{e}")
     
+    def scan_consistency(self):
+        """Verifica em segundo plano a consistência dos dados (DIRENS: todas as escolas)"""
+        school = self.sistema.current_school
+        schools = None if school == "DIRENS" else [school]
+        
+        try:
+            job_manager.submit(
+                "Verificação de consistência",
+                ConsistencyScanner(self.teacher_manager, self.export_manager.exports_dir).scan,
+                schools,
+                widget=self.root,
+                on_progress=lambda job: self.job_status_var.set(job.get_progress_text()),
+                on_complete=self.on_scan_consistency_complete,
+                unit="escolas"
+            )
+        except Exception as e:
+            logging.error(f"Erro ao iniciar verificação de consistência: {e}")
+            messagebox.showerror("Erro", f"Erro ao verificar consistência:\n{e}")
+    
+    def on_scan_consistency_complete(self, job):
+        """Callback de término da verificação de consistência (thread do Tk)"""
+        self.job_status_var.set(job.get_progress_text())
+        self.root.after(10000, lambda: self.job_status_var.set(""))
+        
+        if job.status == 'done':
+            result = job.result
+            lines = [f"{issue['descricao']}: {issue['total']}" for issue in result['issues'].values() if issue['total']]
+            message = (f"{result['total_teachers']} professores verificados.\n\n"
+                       + ("\n".join(lines) if lines else "Nenhum problema encontrado.")
+                       + f"\n\nRelatório:\n{result['filepath']}")
+            if result['errors']:
+                message += f"\n\nEscolas com erro: {', '.join(result['errors'])}"
+            messagebox.showinfo("Verificação de Consistência", message)
+        elif job.status == 'failed':
+            messagebox.showerror("Erro", f"Erro ao verificar consistência:\n{job.error}")
+    
+    def show_jobs(self):
+        """Mostra o painel de tarefas em segundo plano"""
+        try:
+            JobsWindow(self.root)
+        except Exception as e:
+            logging.error(f"Erro ao abrir tarefas: {e}")
+            messagebox.showerror("Erro", f"Erro ao abrir tarefas:\n{e}")
+    
     def show_about(self):
         """Mostra informações sobre o sistema"""
         about_text = """Sistema DIRENS - Controle de Professores
@@ -934,7 +1229,21 @@ Desenvolvido em 2024"""
     
     def on_close(self):
         """Fecha a aplicação"""
-        response = messagebox.askyesno("Sair", "Deseja realmente fechar o sistema?")
+        running_jobs = job_manager.get_running_jobs()
+        if running_jobs:
+            message = "Há tarefas em andamento que serão canceladas:\n\n"
+            message += "\n".join(job.name for job in running_jobs)
+            message += "\n\nDeseja realmente fechar o sistema?"
+        else:
+            message = "Deseja realmente fechar o sistema?"
+        
+        response = messagebox.askyesno("Sair", message)
         if response:
+            # Cancela as tarefas e aguarda a limpeza de arquivos parciais
+            for job in running_jobs:
+                job.cancel()
+            for job in running_jobs:
+                job.thread.join(timeout=10)
+            
             logging.info("Sistema encerrado pelo usuário")
             self.root.quit()
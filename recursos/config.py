@@ -35,7 +35,6 @@ class Config:
             "database": {
                 "auto_backup": True,
                 "backup_interval_hours": 24,
-                "max_backups": 30,
                 "data_validation": True
             },
             "ui": {
@@ -89,6 +88,12 @@ class Config:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     saved_config = json.load(f)
                 
+                # A quantidade de backups mantidos é definida pela política de
+                # retenção do BackupManager (backups/backup_config.json); a
+                # chave antiga sai só da memória e some na próxima gravação
+                if saved_config.get("database", {}).pop("max_backups", None) is not None:
+                    logging.info("Configuração database.max_backups ignorada: substituída pela retenção de backups")
+                
                 # Merge com configurações padrão
                 config = self.default_config.copy()
                 self._deep_merge(config, saved_config)
@@ -180,9 +185,6 @@ class Config:
             if self.get("security", "password_min_length", 6) < 4:
                 warnings.append("Tamanho mínimo da senha muito baixo")
             
-            if self.get("database", "max_backups", 30) < 5:
-                warnings.append("Número mínimo de backups muito baixo")
-            
             session_timeout = self.get("security", "session_timeout_minutes", 480)
             if session_timeout < 30:
                 warnings.append("Timeout de sessão muito baixo")
@@ -129,6 +129,9 @@ DDDS_BRASIL = [
     "91", "92", "93", "94", "95", "96", "97", "98", "99"
 ]
 
+# Consulta rápida de DDD nas validações
+DDDS_BRASIL_SET = frozenset(DDDS_BRASIL)
+
 # Áreas do conhecimento (CNPQ)
 AREAS_CONHECIMENTO = [
     "Ciências Exatas e da Terra",
@@ -197,7 +200,12 @@ REGEX_PATTERNS = {
     "siape": r"^\d{7}$",
     "telefone": r"^\(\d{2}\)\s\d{4,5}-\d{4}$",
     "cep": r"^\d{5}-\d{3}$",
-    "email": r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
+    "email": r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$",
+    "email_fab_nome": r"^[a-zA-Z0-9\.]+$",
+    "data": r"^\d{2}-\d{2}-\d{4}$",
+    "telefone_celular": r"^\d{2}-9-\d{4}-\d{4}$",
+    "telefone_fixo": r"^\d{2}-\d{4}-\d{4}$",
+    "numero_telefone": r"^\d{4}-\d{4}$"
 }
 
 # Configurações de interface
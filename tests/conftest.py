@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração dos testes - Sistema DIRENS
+"""
+
+import pytest
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Diretório de trabalho vazio (os gerenciadores usam caminhos relativos como data/)"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da comparação de backups - Sistema DIRENS
+"""
+
+from core.backup_diff import BackupDiff, LIVE_SOURCE, field_digests
+from core.backup_manager import BackupManager
+from core.teacher_manager import TeacherManager
+
+
+def teacher(**fields):
+    data = {'siape': '1234567', 'escola': 'AFA', 'nome': 'Maria da Silva', 'carga_horaria': '40',
+            'email': 'maria.silva@fab.mil.br', 'data_atualizacao': '2026-01-01T10:00:00'}
+    data.update(fields)
+    return data
+
+
+def test_field_digests_follow_identify_changes():
+    old = teacher(estado=None)
+    new = teacher(carga_horaria=40, estado='', data_atualizacao='2026-02-01T10:00:00', email='maria@fab.mil.br')
+    
+    digests_old = field_digests(old)
+    digests_new = field_digests(new)
+    changed = [field for field in digests_old if digests_old[field] != digests_new[field]]
+    
+    assert changed == list(TeacherManager.identify_changes(old, new)) == ['email']
+
+
+def test_diff_reports_only_monitored_changes(workdir):
+    data_manager = TeacherManager().data_manager
+    assert data_manager.save_teachers([teacher()])
+    backup_manager = BackupManager()
+    backup = backup_manager.create_backup("antes", mode='full')
+    
+    assert data_manager.save_teachers([teacher(carga_horaria=40, data_atualizacao='2026-02-01T10:00:00')])
+    result = BackupDiff(backup_manager).diff(backup['name'], LIVE_SOURCE)
+    assert result['totals'] == {'added': 0, 'removed': 0, 'modified': 0}
+    
+    assert data_manager.save_teachers([teacher(email='maria@fab.mil.br')])
+    result = BackupDiff(backup_manager).diff(backup['name'], LIVE_SOURCE)
+    assert result['schools']['AFA']['modified'] == {'1234567': ['email']}
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do gerenciador de backups - Sistema DIRENS
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from core.backup_manager import BackupManager
+from core.teacher_manager import TeacherManager
+from dados.data_manager import DataManager
+from dados.history_manager import HistoryManager
+
+
+def catalog(backup_type, count, step, start=datetime(2026, 6, 30, 12, 50)):
+    """Backups de um tipo, do mais novo para o mais antigo, a cada step"""
+    return [
+        {'name': f"{backup_type}_{number}", 'type': backup_type,
+         'timestamp': (start - step * number).isoformat()}
+        for number in range(count)
+    ]
+
+
+def kept_names(keep):
+    return {backup['name'] for backup in keep}
+
+
+def test_type_quota_is_a_floor_on_top_of_tiers(workdir):
+    backups = catalog('manual', 90, timedelta(days=1))
+    
+    keep, remove = BackupManager().plan_retention(backups)
+    
+    kept = kept_names(keep)
+    assert {f"manual_{number}" for number in range(10)} <= kept
+    reasons = {backup['name']: backup['retention_reasons'] for backup in keep}
+    assert reasons['manual_0'] == ['hourly', 'daily', 'weekly', 'monthly', 'manual']
+    assert reasons['manual_8'] == ['manual']
+    # Manuais antigos continuam cobertos pelas faixas (último de abril)
+    assert reasons['manual_61'] == ['monthly']
+    assert len(keep) + len(remove) == 90
+
+
+def test_quota_keeps_newest_of_type_outside_tiers(workdir):
+    backups = catalog('auto', 3, timedelta(minutes=10)) + catalog(
+        'pre_restore', 8, timedelta(minutes=1), start=datetime(2026, 6, 30, 12, 15))
+    
+    keep, remove = BackupManager().plan_retention(backups)
+    
+    assert kept_names(keep) == {'auto_0'} | {f"pre_restore_{number}" for number in range(5)}
+    assert kept_names(remove) == {'auto_1', 'auto_2', 'pre_restore_5', 'pre_restore_6', 'pre_restore_7'}
+
+
+def test_pinned_backup_is_kept(workdir):
+    backups = catalog('auto', 3, timedelta(minutes=10))
+    backups[2]['pinned'] = True
+    
+    keep, remove = BackupManager().plan_retention(backups)
+    
+    assert kept_names(keep) == {'auto_0', 'auto_2'}
+
+
+def valid_teacher(**fields):
+    data = {'siape': '1234567', 'escola': 'AFA', 'nome': 'Maria da Silva', 'data_nascimento': '10-05-1980',
+            'sexo': 'F', 'email': 'maria.silva@fab.mil.br', 'telefone_celular': '21-9-9876-5432',
+            'carga_horaria': '40H', 'carreira': 'EBTT', 'data_ingresso': '01-02-2010', 'pos_graduacao': 'MESTRADO'}
+    data.update(fields)
+    return data
+
+
+def backup_then_change_email(teacher_manager, backup_manager):
+    """Backup com o professor original; o e-mail muda depois do backup"""
+    assert teacher_manager.create_teacher(valid_teacher(), "admin")
+    backup = backup_manager.create_backup("antes", mode='full')
+    teacher_manager.history_manager.delete_teacher_history('1234567', 'AFA')
+    assert teacher_manager.update_teacher(valid_teacher(email='maria.souza@fab.mil.br'), 'AFA', "admin")
+    return backup['name']
+
+
+def record_calls(monkeypatch, calls, cls, name, result=None):
+    original = getattr(cls, name)
+    
+    def wrapper(self, *args, **kwargs):
+        calls.append(name)
+        return original(self, *args, **kwargs) if result is None else result
+    
+    monkeypatch.setattr(cls, name, wrapper)
+
+
+def test_restore_selective_saves_teachers_before_merging_history(workdir, monkeypatch):
+    backup_manager = BackupManager()
+    backup_name = backup_then_change_email(TeacherManager(), backup_manager)
+    calls = []
+    record_calls(monkeypatch, calls, DataManager, 'save_teachers')
+    record_calls(monkeypatch, calls, HistoryManager, 'merge_teacher_history')
+    
+    result = backup_manager.restore_selective(backup_name, 'AFA')
+    
+    assert result['success']
+    assert calls == ['save_teachers', 'merge_teacher_history']
+    assert result['history_entries'] == 1
+    assert list(result['modified']['1234567']) == ['email']
+    assert TeacherManager().get_teacher_by_siape('1234567', 'AFA')['email'] == 'maria.silva@fab.mil.br'
+
+
+def test_restore_selective_keeps_history_when_save_fails(workdir, monkeypatch):
+    backup_manager = BackupManager()
+    backup_name = backup_then_change_email(TeacherManager(), backup_manager)
+    calls = []
+    record_calls(monkeypatch, calls, DataManager, 'save_teachers', result=False)
+    record_calls(monkeypatch, calls, HistoryManager, 'merge_teacher_history')
+    
+    result = backup_manager.restore_selective(backup_name, 'AFA')
+    
+    assert not result['success']
+    assert calls == ['save_teachers']
+    assert result['history_entries'] == 0
+
+
+def test_max_backups_is_migrated_in_memory_only(workdir):
+    (workdir / "backups").mkdir()
+    with open(workdir / "backups" / "backup_config.json", 'w', encoding='utf-8') as f:
+        json.dump({"auto_backup": True, "max_backups": 15}, f)
+    
+    backup_manager = BackupManager()
+    
+    assert backup_manager.get_retention_policy()['daily'] == 15
+    assert backup_manager.config['backup_mode'] == 'full'
+    with open(workdir / "backups" / "backup_config.json", 'r', encoding='utf-8') as f:
+        assert json.load(f) == {"auto_backup": True, "max_backups": 15}
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do repositório de blobs dos backups incrementais - Sistema DIRENS
+"""
+
+import os
+import time
+
+from core.backup_store import BackupStore, STALE_TEMP_SECONDS
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+
+def blob_files(store):
+    return sorted(
+        blob.name for entry in os.scandir(store.blobs_dir) if entry.is_dir()
+        for blob in os.scandir(entry.path)
+    )
+
+
+def age(path, seconds):
+    """Recua a data de modificação (a coleta ignora blobs recém-gravados)"""
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_snapshots_share_blobs_and_gc_frees_unreferenced(tmp_path):
+    store = BackupStore(str(tmp_path / "backups"))
+    teachers = write(tmp_path / "data" / "teachers.json", b'{"teachers": {}}')
+    copy = write(tmp_path / "data" / "copia.json", b'{"teachers": {}}')
+    schools = write(tmp_path / "data" / "schools.json", b'{"AFA": {}}')
+    
+    first = store.create_snapshot("backup_1", [(teachers, "data/teachers.json"), (copy, "data/copia.json"),
+                                               (schools, "data/schools.json")])
+    assert len(blob_files(store)) == 2
+    
+    write(tmp_path / "data" / "schools.json", b'{"AFA": {"nome": "AFA"}}')
+    second = store.create_snapshot("backup_2", [(teachers, "data/teachers.json"), (schools, "data/schools.json")])
+    assert len(blob_files(store)) == 3
+    assert 0 < second['new_bytes'] < first['new_bytes']
+    
+    for blob in blob_files(store):
+        age(store.get_blob_path(blob.split('.')[0]), 60)
+    
+    assert store.collect_garbage()['removed_blobs'] == 0
+    
+    store.delete_manifest("backup_1")
+    assert store.collect_garbage()['removed_blobs'] == 1
+    
+    restored = tmp_path / "restaurado"
+    assert store.restore_manifest(store.load_manifest("backup_2"), str(restored)) == 2
+    assert (restored / "data" / "schools.json").read_bytes() == b'{"AFA": {"nome": "AFA"}}'
+    assert (restored / "data" / "teachers.json").read_bytes() == b'{"teachers": {}}'
+
+
+def test_gc_keeps_recent_blobs_and_temporaries(tmp_path):
+    store = BackupStore(str(tmp_path / "backups"))
+    orphan = write(tmp_path / "backups" / "blobs" / "ab" / ("ab" + "0" * 62 + ".gz"), b"orfao")
+    recent_temp = write(tmp_path / "backups" / "blobs" / "ab" / "ab1.gz.1.tmp", b"parcial")
+    stale_temp = write(tmp_path / "backups" / "blobs" / "ab" / "ab2.gz.1.tmp", b"parcial")
+    age(stale_temp, STALE_TEMP_SECONDS + 60)
+    
+    # Blob sem manifesto gravado durante a coleta pode ser de um backup em andamento
+    os.utime(orphan, (time.time() + 60, time.time() + 60))
+    assert store.collect_garbage()['removed_blobs'] == 1
+    assert os.path.exists(orphan) and os.path.exists(recent_temp)
+    assert not os.path.exists(stale_temp)
+    
+    age(orphan, 60)
+    assert store.collect_garbage()['removed_blobs'] == 1
+    assert not os.path.exists(orphan)
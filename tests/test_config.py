@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das configurações do sistema - Sistema DIRENS
+"""
+
+import json
+
+from recursos.config import Config
+
+
+def read_config(workdir):
+    with open(workdir / "data" / "config.json", 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_max_backups_is_dropped_in_memory_only(workdir):
+    (workdir / "data").mkdir()
+    with open(workdir / "data" / "config.json", 'w', encoding='utf-8') as f:
+        json.dump({"database": {"auto_backup": False, "max_backups": 30}}, f)
+    
+    config = Config()
+    
+    assert "max_backups" not in config.config["database"]
+    assert config.config["database"]["auto_backup"] is False
+    assert read_config(workdir)["database"]["max_backups"] == 30
+    
+    assert config.save_config()
+    
+    assert read_config(workdir)["database"] == {
+        "auto_backup": False, "backup_interval_hours": 24, "data_validation": True
+    }
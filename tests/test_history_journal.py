@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos documentos com diário de alterações - Sistema DIRENS
+"""
+
+import json
+import os
+
+import pytest
+from filelock import FileLock, Timeout
+
+import dados.history_journal
+from dados.history_journal import JournaledDocument
+from dados.history_manager import HistoryManager
+
+
+def apply_count(document, record):
+    """Soma o valor do registro ao contador do documento"""
+    document["count"] = document.get("count", 0) + record["value"]
+
+
+@pytest.fixture
+def document(tmp_path):
+    document = JournaledDocument(str(tmp_path / "contador.json"), apply_count, FileLock(str(tmp_path / "doc.lock")))
+    document.write({"count": 0})
+    return document
+
+
+def add(document, *values):
+    document.append([{"op": "add", "value": value} for value in values])
+
+
+def test_records_are_applied_once(document):
+    add(document, 1, 2)
+    add(document, 3)
+    
+    assert document.load()["count"] == 6
+
+
+def test_torn_line_is_skipped_and_next_append_starts_new_line(document):
+    add(document, 1)
+    with open(document.journal_file, 'a', encoding='utf-8') as f:
+        f.write('{"op": "add", "val')
+    
+    assert document.load()["count"] == 1
+    
+    add(document, 5)
+    
+    assert document.load()["count"] == 6
+
+
+def test_interrupted_compaction_does_not_apply_records_twice(document):
+    add(document, 1, 2, 3)
+    journal = open(document.journal_file, 'rb').read()
+    
+    # Compactação interrompida depois de gravar o consolidado, antes de reiniciar o diário
+    document.compact()
+    with open(document.journal_file, 'wb') as f:
+        f.write(journal)
+    
+    assert document.load()["count"] == 6
+    
+    add(document, 4)
+    
+    assert document.load()["count"] == 10
+    with open(document.journal_file, 'r', encoding='utf-8') as f:
+        assert json.loads(f.readlines()[-1])["seq"] == 4
+
+
+def test_compaction_at_threshold(document, monkeypatch):
+    monkeypatch.setattr(dados.history_journal, 'JOURNAL_COMPACT_THRESHOLD', 3)
+    
+    add(document, 1, 2)
+    add(document, 3)
+    
+    with open(document.filepath, 'r', encoding='utf-8') as f:
+        assert json.load(f)["count"] == 6
+    with open(document.journal_file, 'r', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{"op": "base", "seq": 3}]
+    assert document.load()["count"] == 6
+
+
+def test_rebuild_holds_write_lock(workdir, monkeypatch):
+    history_manager = HistoryManager()
+    lock_file = os.path.join(history_manager.history_dir, "history.lock")
+    
+    def iter_all_entries():
+        # Outro gravador não consegue o lock enquanto a reconstrução lê o histórico
+        with pytest.raises(Timeout):
+            FileLock(lock_file, timeout=0).acquire()
+        return iter([])
+    
+    monkeypatch.setattr(history_manager, 'iter_all_entries', iter_all_entries)
+    
+    assert history_manager.rebuild_history_rollups()['success']
+    assert history_manager.rebuild_search_index()['success']
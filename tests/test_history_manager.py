@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do gerenciador de histórico - Sistema DIRENS
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from dados.history_manager import HistoryManager
+
+
+@pytest.fixture
+def history_manager(workdir):
+    """Histórico de um professor: 3 meses arquivados e 10 entradas ativas"""
+    history_manager = HistoryManager()
+    now = datetime.now()
+    timestamps = [datetime(2024, month, day, 10, 0) for month in (1, 2, 3) for day in range(1, 6)]
+    timestamps += [now - timedelta(hours=hours) for hours in range(10)]
+    
+    history_manager.add_history_entries([
+        {'siape': '1234567', 'escola': 'AFA', 'action': 'UPDATE', 'user': 'admin', 'field': 'email',
+         'timestamp': timestamp.isoformat(), 'notes': f"Alteração {number}"}
+        for number, timestamp in enumerate(timestamps)
+    ])
+    assert history_manager.archive_old_history(days_to_keep=365) == 15
+    return history_manager
+
+
+def all_pages(history_manager, limit):
+    entries = []
+    has_more = True
+    while has_more:
+        page, has_more = history_manager.get_teacher_history_page('1234567', 'AFA', len(entries), limit)
+        entries.extend(page)
+    return entries
+
+
+def test_pages_cover_hot_and_archived_entries(history_manager):
+    expected = history_manager.get_teacher_history('1234567', 'AFA', include_archived=True)
+    
+    assert len(expected) == 25
+    assert all_pages(history_manager, 7) == expected
+    assert list(history_manager.iter_teacher_history('1234567', 'AFA', newest_first=False, offset=3)) == expected[::-1][3:]
+
+
+def test_offset_skips_archived_segments_without_reading_them(history_manager, monkeypatch):
+    loaded = []
+    load_archive_segment = history_manager.load_archive_segment
+    
+    def record_load(filepath, codec):
+        loaded.append(filepath)
+        return load_archive_segment(filepath, codec)
+    
+    monkeypatch.setattr(history_manager, 'load_archive_segment', record_load)
+    
+    page, has_more = history_manager.get_teacher_history_page('1234567', 'AFA', offset=21, limit=10)
+    
+    assert [entry['notes'] for entry in page] == [f"Alteração {number}" for number in (3, 2, 1, 0)]
+    assert not has_more
+    assert len(loaded) == 1 and '2024-01' in loaded[0]
+
+
+def test_hot_file_is_cached_until_it_changes(history_manager, monkeypatch):
+    history_manager.get_teacher_history_page('1234567', 'AFA')
+    loads = []
+    load_json = history_manager.load_json
+    monkeypatch.setattr(history_manager, 'load_json', lambda filepath: loads.append(filepath) or load_json(filepath))
+    
+    history_manager.get_teacher_history_page('1234567', 'AFA', offset=5)
+    assert history_manager.get_teacher_history_file('1234567', 'AFA') not in loads
+    
+    history_manager.add_history_entry({'siape': '1234567', 'escola': 'AFA', 'action': 'UPDATE', 'user': 'admin',
+                                       'field': 'nome', 'notes': "Nova alteração"})
+    page, has_more = history_manager.get_teacher_history_page('1234567', 'AFA', limit=1)
+    assert page[0]['notes'] == "Nova alteração"
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do índice de busca do histórico - Sistema DIRENS
+"""
+
+import os
+
+import pytest
+from filelock import FileLock
+
+import dados.history_journal
+from dados.history_search import HistorySearchIndex
+
+
+@pytest.fixture
+def search_index(tmp_path):
+    """Índice vazio em um diretório temporário (sem cache de outros testes)"""
+    HistorySearchIndex._cache.clear()
+    index = HistorySearchIndex(str(tmp_path), FileLock(str(tmp_path / "history.lock")))
+    index.rebuild([])
+    return index
+
+
+def entry(siape, notes, timestamp="2026-01-01T10:00:00"):
+    return {'escola': 'AFA', 'siape': siape, 'timestamp': timestamp, 'action': 'UPDATE',
+            'field': 'email', 'notes': notes}
+
+
+def reopen(index):
+    """Mesmo índice como visto por outro processo (sem cache)"""
+    HistorySearchIndex._cache.clear()
+    return HistorySearchIndex(index.history_dir, index.lock)
+
+
+def test_add_and_remove_entries(search_index):
+    search_index.add_entries([entry('1', "Email corrigido"), entry('2', "Telefone atualizado")])
+    assert [e['siape'] for e in search_index.search("corrig")] == ['1']
+    
+    search_index.remove_entries([entry('1', "Email corrigido")])
+    
+    assert search_index.search("corrig") == []
+    assert [e['siape'] for e in reopen(search_index).search("atualiz")] == ['2']
+
+
+def test_torn_journal_line_is_skipped(search_index):
+    search_index.add_entries([entry('1', "Email corrigido")])
+    with open(search_index.document.journal_file, 'a', encoding='utf-8') as f:
+        f.write('{"op": "add", "entry": {"notes": "incomp')
+    
+    index = reopen(search_index)
+    assert [e['siape'] for e in index.search("email")] == ['1']
+    
+    index.add_entries([entry('2', "Email novo", "2026-01-02T10:00:00")])
+    assert [e['siape'] for e in reopen(index).search("email")] == ['2', '1']
+
+
+def test_compaction_keeps_all_entries(search_index, monkeypatch):
+    monkeypatch.setattr(dados.history_journal, 'JOURNAL_COMPACT_THRESHOLD', 3)
+    
+    for number in range(5):
+        search_index.add_entries([entry(str(number), "Email corrigido", f"2026-01-0{number + 1}T10:00:00")])
+    
+    with open(search_index.document.journal_file, 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 3
+    assert len(reopen(search_index).search("email")) == 5
+
+
+def test_legacy_journal_requires_rebuild(search_index):
+    with open(search_index.legacy_journal_file, 'w', encoding='utf-8') as f:
+        f.write('{"op": "add", "entry": {"notes": "antigo"}}\n')
+    
+    assert not search_index.exists()
+    
+    search_index.rebuild([entry('1', "Email corrigido")])
+    
+    assert search_index.exists()
+    assert not os.path.exists(search_index.legacy_journal_file)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da importação de professores - Sistema DIRENS
+"""
+
+import csv
+
+from core.import_manager import ImportManager
+from core.teacher_manager import TeacherManager
+
+HEADER = ['siape', 'nome', 'data_nascimento', 'sexo', 'email', 'telefone_celular',
+          'carga_horaria', 'carreira', 'data_ingresso', 'pos_graduacao']
+
+
+def teacher_row(siape, nome="Maria da Silva"):
+    """Linha válida do arquivo de importação"""
+    return [siape, nome, '10-05-1980', 'F', 'maria.silva@fab.mil.br', '21-9-9876-5432',
+            '40H', 'EBTT', '01-02-2010', 'MESTRADO']
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+
+def read_report(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+def import_file(filepath, school, dry_run=False):
+    return ImportManager(TeacherManager()).import_file(filepath, school, "admin", dry_run=dry_run, workers=1)
+
+
+def test_direns_without_school_column_rejects_rows(workdir):
+    filepath = write_csv(workdir / "professores.csv", [['SIAPE', 'Nome'], ['1234567', 'Maria']])
+    
+    result = import_file(filepath, "DIRENS", dry_run=True)
+    
+    assert result['success']
+    assert result['total'] == 1
+    assert result['rejected'] == 1
+    report = read_report(result['error_report'])
+    assert report[0]['Linha'] == '2'
+    assert "Escola obrigatória na importação pela DIRENS" in report[0]['Erros']
+
+
+def test_duplicate_siape_in_file_is_rejected(workdir):
+    filepath = write_csv(workdir / "professores.csv",
+                         [HEADER, teacher_row('1234567'), teacher_row('1234567', "Maria Souza")])
+    
+    result = import_file(filepath, "AFA")
+    
+    assert result['imported'] == 1
+    assert result['rejected'] == 1
+    report = read_report(result['error_report'])
+    assert report[0]['Linha'] == '3'
+    assert report[0]['Erros'] == "SIAPE repetido no arquivo"
+
+
+def test_existing_siape_is_rejected(workdir):
+    filepath = write_csv(workdir / "professores.csv", [HEADER, teacher_row('1234567')])
+    assert import_file(filepath, "AFA")['imported'] == 1
+    
+    result = import_file(filepath, "AFA")
+    
+    assert result['imported'] == 0
+    assert read_report(result['error_report'])[0]['Erros'] == "SIAPE já cadastrado nesta escola"
+
+
+def test_invalid_rows_are_reported_and_valid_rows_saved(workdir):
+    invalid = teacher_row('7654321')
+    invalid[7] = 'XYZ'
+    filepath = write_csv(workdir / "professores.csv", [HEADER, teacher_row('1234567'), invalid])
+    
+    result = import_file(filepath, "AFA")
+    
+    assert (result['total'], result['imported'], result['rejected']) == (2, 1, 1)
+    assert "Carreira inválida: XYZ" in read_report(result['error_report'])[0]['Erros']
+    saved = list(TeacherManager().data_manager.iter_teachers())
+    assert [(t['escola'], t['siape']) for t in saved] == [('AFA', '1234567')]
+
+
+def test_dry_run_saves_nothing(workdir):
+    filepath = write_csv(workdir / "professores.csv", [HEADER, teacher_row('1234567')])
+    
+    result = import_file(filepath, "AFA", dry_run=True)
+    
+    assert result['success']
+    assert result['imported'] == 0
+    assert result['error_report'] is None
+    assert list(TeacherManager().data_manager.iter_teachers()) == []
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Testes das tarefas em segundo plano - Sistema DIRENS
+"""
+
+import threading
+
+from core.jobs import Job, JobCancelled, check_cancelled
+
+
+def run_job(func):
+    """Executa a tarefa na thread atual e a retorna"""
+    job = Job("teste", func)
+    job.run()
+    return job
+
+
+def test_job_done_with_result():
+    job = run_job(lambda progress_callback, cancel_event: 42)
+    
+    assert job.status == 'done'
+    assert job.result == 42
+
+
+def test_job_cancelled_when_function_raises_job_cancelled():
+    def func(progress_callback, cancel_event):
+        cancel_event.set()
+        check_cancelled(cancel_event)
+    
+    job = run_job(func)
+    
+    assert job.status == 'cancelled'
+    assert job.result is None
+
+
+def test_late_cancel_keeps_done_status():
+    """Cancelamento pedido depois do ponto sem volta não muda o resultado"""
+    def func(progress_callback, cancel_event):
+        cancel_event.set()
+        return True
+    
+    job = run_job(func)
+    
+    assert job.status == 'done'
+    assert job.result is True
+
+
+def test_job_failed_on_error():
+    def func(progress_callback, cancel_event):
+        raise ValueError("falha")
+    
+    job = run_job(func)
+    
+    assert job.status == 'failed'
+    assert isinstance(job.error, ValueError)
+
+
+def test_job_in_thread_cancelled():
+    started = threading.Event()
+    
+    def func(progress_callback, cancel_event):
+        started.set()
+        cancel_event.wait(5)
+        raise JobCancelled("Operação cancelada")
+    
+    job = Job("teste", func)
+    job.start()
+    started.wait(5)
+    job.cancel()
+    job.thread.join(5)
+    
+    assert job.status == 'cancelled'
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do motor de relatórios PDF - Sistema DIRENS
+"""
+
+from reportlab.platypus import Table
+
+from core.pdf_engine import PdfReport, get_list_table_style
+
+HEADER = ['SIAPE', 'Nome', 'Escola']
+
+
+def report_with_rows(filepath, total, progress_callback=None):
+    report = PdfReport(str(filepath), progress_callback=progress_callback)
+    report.add_paragraph("LISTA COMPLETA DE PROFESSORES", 'subtitle')
+    rows = ([str(number), f"Professor {number}", "AFA"] for number in range(total))
+    assert report.add_long_table(HEADER, rows, get_list_table_style()) == total
+    return report
+
+
+def test_long_table_repeats_header_once_per_page(tmp_path):
+    report = report_with_rows(tmp_path / "lista.pdf", 500)
+    pages = []
+    report.doc.afterFlowable = lambda flowable: isinstance(flowable, Table) and pages.append(report.doc.page)
+    
+    report.build()
+    
+    # Cada página recebe uma única parte da tabela (um único cabeçalho)
+    assert len(pages) > 1
+    assert pages == list(range(pages[0], pages[0] + len(pages)))
+
+
+def test_long_table_progress_counts_data_rows(tmp_path):
+    progress = []
+    report = report_with_rows(tmp_path / "lista.pdf", 500, lambda done, total, *args: progress.append((done, total)))
+    
+    report.build()
+    
+    assert progress[-1] == (500, 500)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do cache de resultados de validação - Sistema DIRENS
+"""
+
+import core.validation_cache
+from core.validation_cache import ValidationCache, validate_with_cache
+
+FIELDS = ('nome', 'email')
+
+
+def counting_validate(calls):
+    """Validação em lote que registra quantos registros recebeu"""
+    def validate(records):
+        calls.append(len(records))
+        return [[f"erro em {record['nome']}"] if not record.get('email') else [] for record in records]
+    return validate
+
+
+def run(records, entries, calls):
+    keys = [record['siape'] for record in records]
+    return validate_with_cache(records, keys, entries, FIELDS, counting_validate(calls))
+
+
+def test_only_changed_records_are_revalidated():
+    calls = []
+    records = [{'siape': '1', 'nome': 'Ana', 'email': ''}, {'siape': '2', 'nome': 'Bia', 'email': 'b@fab.mil.br'}]
+    results, entries, revalidated = run(records, {}, calls)
+    assert (results, revalidated) == ([["erro em Ana"], []], 2)
+    
+    results, entries, revalidated = run(records, entries, calls)
+    assert (results, revalidated) == ([["erro em Ana"], []], 0)
+    
+    # Campo não lido pelas regras não invalida o resultado
+    records[1]['telefone'] = '21-9-9876-5432'
+    assert run(records, entries, calls)[2] == 0
+    
+    records[0]['email'] = 'a@fab.mil.br'
+    results, entries, revalidated = run(records, entries, calls)
+    assert (results, revalidated) == ([[], []], 1)
+    assert calls == [2, 1]
+
+
+def test_none_and_empty_string_are_different_contents():
+    calls = []
+    results, entries, revalidated = run([{'siape': '1', 'nome': 'Ana', 'email': None}], {}, calls)
+    
+    assert run([{'siape': '1', 'nome': 'Ana', 'email': ''}], entries, calls)[2] == 1
+
+
+def test_removed_keys_are_dropped():
+    calls = []
+    records = [{'siape': '1', 'nome': 'Ana', 'email': ''}, {'siape': '2', 'nome': 'Bia', 'email': ''}]
+    results, entries, revalidated = run(records, {}, calls)
+    
+    results, entries, revalidated = run(records[1:], entries, calls)
+    
+    assert list(entries) == ['2']
+    assert revalidated == 0
+
+
+def test_cache_is_discarded_when_context_or_rules_change(tmp_path, monkeypatch):
+    cache_file = str(tmp_path / "cache" / "validation_cache.json")
+    ValidationCache('consistencia', '2026-10-19', cache_file).save_entries({'AFA': {'1': ['hash', []]}})
+    
+    assert ValidationCache('consistencia', '2026-10-19', cache_file).load_entries(['AFA']) == {'AFA': {'1': ['hash', []]}}
+    assert ValidationCache('consistencia', '2026-10-20', cache_file).load_entries(['AFA']) == {'AFA': {}}
+    assert ValidationCache('outra', '2026-10-19', cache_file).load_entries(['AFA']) == {'AFA': {}}
+    
+    monkeypatch.setattr(core.validation_cache, 'RULES_VERSION', 'nova')
+    assert ValidationCache('consistencia', '2026-10-19', cache_file).load_entries(['AFA']) == {'AFA': {}}
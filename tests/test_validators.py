@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos validadores - Sistema DIRENS
+"""
+
+import pytest
+
+from core.validators import ValidatorManager
+
+VALID = {
+    'siape': '1234567', 'nome': 'Maria da Silva', 'data_nascimento': '10-05-1980', 'sexo': 'F',
+    'email': 'maria.silva@fab.mil.br', 'telefone_celular': '21-9-9876-5432', 'carga_horaria': '40H',
+    'carreira': 'EBTT', 'data_ingresso': '01-02-2010', 'pos_graduacao': 'MESTRADO'
+}
+
+# Variações de um registro válido: uma regra violada (ou respeitada por pouco) em cada
+VARIANTS = [
+    {},
+    {'siape': '12a'},
+    {'siape': 1234567},
+    {'nome': 'Maria 2'},
+    {'nome': '   '},
+    {'data_nascimento': '1980-05-10'},
+    {'data_nascimento': '31-02-1980'},
+    {'data_nascimento': '10-05-2015'},
+    {'data_ingresso': '01-02-2999'},
+    {'data_ingresso': '01-02-1990'},
+    {'email': 'maria@example.com'},
+    {'email': 'maria_silva@fab.mil.br'},
+    {'telefone_celular': '21-8-9876-5432'},
+    {'telefone_celular': '00-9-9876-5432'},
+    {'telefone_fixo': '21-3333-4444'},
+    {'telefone_fixo': '2133334444'},
+    {'carga_horaria': 40},
+    {'carreira': 'XYZ'},
+    {'pos_graduacao': 'Mestrado'},
+    {'sexo': 'X'},
+    {'email': None},
+    {'sexo': '', 'carreira': ''},
+]
+
+
+def variant_records():
+    return [dict(VALID, **variant) for variant in VARIANTS]
+
+
+@pytest.mark.parametrize('records', [
+    [dict(VALID, siape=str(1000000 + number)) for number in range(5)],
+    variant_records(),
+    variant_records() * 3,
+], ids=['validos', 'variantes', 'repetidos'])
+def test_validate_batch_matches_validate_teacher_data(records):
+    validator = ValidatorManager()
+    
+    expected = [validator.validate_teacher_data(record)['field_errors'] for record in records]
+    
+    assert validator.validate_batch(records) == expected
+
+
+def test_validate_batch_only_complete_records():
+    """Sem campos obrigatórios ausentes o lote usa o caminho por colunas"""
+    validator = ValidatorManager()
+    records = [record for record in variant_records() if all(str(record.get(field) or '').strip() for field in VALID)]
+    
+    expected = [validator.validate_teacher_data(record)['field_errors'] for record in records]
+    
+    assert any(expected)
+    assert validator.validate_batch(records) == expected